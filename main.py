@@ -29,6 +29,8 @@ from modules.preprocess.data_preprocessor import get_preprocessed_data
 from modules.analytics.dashboard import ( generate_dashboard_materials, dashboard_config, generate_simulation_result_json)
 from modules.analytics.dashboard import generate_html_js_files
 from modules.analytics.dashboard import sync_to_npm
+from modules.analytics.trip_store import export_trip_json
+from modules.analytics.run_reader import RunReader
 # =========== CONFIGURATION ===========
 
 NUM_TAXIS = 950  # 시뮬레이션에 사용할 택시 수
@@ -51,6 +53,7 @@ simul_configs['time_range'] = [TIME_RANGE_START, TIME_RANGE_END] # data time ran
 simul_configs['matrix_mode'] = 'haversine_distance'
 simul_configs['add_board_time'] = 0.2
 simul_configs['add_disembark_time'] = 0.2
+simul_configs['results_catalog'] = 'catalog.sqlite' # index the run in simul_result/catalog.sqlite
 
 # =========== DATA LOADING ===========
 
@@ -75,13 +78,20 @@ simulator.run()
 # =========== RESULTS ===========
 
 save_path = simul_configs['save_path']
-passengers_j = pd.read_json(os.path.join(save_path, 'passenger_marker.json'))
-trip_j       = pd.read_json(os.path.join(save_path, 'trip.json'))
+run_j        = RunReader(save_path)
+passengers_j = run_j.frame('passengers', ['start_time', 'end_time'])
+trip_j       = run_j.frame('trips', ['vehicle_id', 'board', 'start_time', 'end_time'])
 records_csv  = pd.read_csv(os.path.join(save_path, 'record.csv'))
 
-result = generate_simulation_result_json(passengers_j, trip_j, records_csv)
+result = generate_simulation_result_json(passengers_j, trip_j, records_csv,
+                                         passenger_index=run_j.interval_index('passengers'),
+                                         trip_index=run_j.interval_index('trips'))
 result.to_json(os.path.join(save_path, 'result.json'), orient='records')
 
+# trip.json for the full-file viewer export of columnar-only trip output
+if simul_configs['trip_format'] == 'columnar' and not simul_configs['viewer_window']:
+    export_trip_json(save_path)
+
 # =========== DASHBOARD ===========
 
 simulation_name = os.path.basename(simul_configs['save_path'])
@@ -2,14 +2,14 @@ import os
 import json 
 import numpy as np
 import pandas as pd
-import geopandas as gpd
-import osmnx as ox
 import shutil
 
 from modules.engine.config_manager import base_configs
 from .service_charts import figure_1, figure_2, figure_3
 from .fleet_charts import figure_4, figure_5
-from .spatial_charts import figure_6_7_N_8_9, figure_10, figure_11
+from .run_reader import RunReader, simulation_folders
+from .interval_index import IntervalIndex
+from .viewer_export import export_viewer_chunks, remove_viewer_chunks
 
 
 # Dashboard configuration settings
@@ -60,7 +60,12 @@ def generate_vehicle_operation_figures(base_path, save_path, time_range, simulat
 
 
 # Generate spatial distribution figures
+# (geopandas and osmnx are only imported here, so the rest of the module works without them)
 def generate_spatial_distribution_figures(base_path, save_path, region_boundary_file_path, time_range, target_region_name, mapboxKey, simulation_name=None):
+    import geopandas as gpd
+    import osmnx as ox
+    from .spatial_charts import figure_6_7_N_8_9, figure_10, figure_11
+
     place_geometry = ox.geocode_to_gdf([target_region_name])
     region_boundary = gpd.read_file(region_boundary_file_path)
     region_boundary = region_boundary.loc[region_boundary['SGG_NM'].str.contains(target_region_name)].reset_index(drop=True)
@@ -80,31 +85,21 @@ def simulation_configuration_for_dashboard(base_path, save_path, simulation_name
         'vehicles_driven': []
     }
     
-    if simulation_name:
-        folders_to_process = [simulation_name]
-    else:
-        folders_to_process = [fd for fd in os.listdir(base_path) 
-                            if not fd.startswith('.') and 
-                            os.path.isdir(os.path.join(base_path, fd)) and 
-                            fd.startswith("simulation_")]
+    folders_to_process = simulation_folders(base_path, simulation_name)
     
     for fd_nm in folders_to_process: 
-        passengers = pd.read_json(base_path + fd_nm + '/passenger_marker.json')
-        passenger_number = len(set(passengers['passenger_id']))
+        run = RunReader(base_path + fd_nm)
+        passenger_number = len(np.unique(run.columns('passengers', ['passenger_id'])['passenger_id']))
         simul_result_inf['total_calls'].append(passenger_number)
         
-        records = pd.read_csv(base_path + fd_nm + '/record.csv')
-        records['operating_vehicle_cnt'] = records['empty_vehicle_cnt'] + records['driving_vehicle_cnt']
-        failed_calls_num = records['fail_passenger_cnt'].iloc[-1]
+        failed_calls_num = run.columns('records', ['fail_passenger_cnt'])['fail_passenger_cnt'][-1]
         failure_rate = round((failed_calls_num / passenger_number) * 100, 2)    
         simul_result_inf['failed_calls'].append(failed_calls_num)
         simul_result_inf['failure_rate'].append(failure_rate)
         
-        vehicles = pd.read_json(base_path + fd_nm + '/vehicle_marker.json')
-        vehicle_id_1 = set(vehicles['vehicle_id'])
-        trips = pd.read_json(base_path + fd_nm + '/trip.json')
-        vehicle_id_2 = set(trips['vehicle_id'])
-        vehicle_driven_num = len(vehicle_id_1 & vehicle_id_2)
+        vehicle_id_1 = run.columns('vehicles', ['vehicle_id'])['vehicle_id']
+        vehicle_id_2 = run.columns('trips', ['vehicle_id'])['vehicle_id']
+        vehicle_driven_num = len(np.intersect1d(vehicle_id_1, vehicle_id_2))
         simul_result_inf['vehicles_driven'].append(vehicle_driven_num)
 
     simul_result_inf = pd.DataFrame(simul_result_inf)
@@ -124,11 +119,24 @@ def simulation_configuration_for_dashboard(base_path, save_path, simulation_name
 
 
 # Generate detailed simulation result JSON
-def generate_simulation_result_json(passengers, trip, records, time_range=[0, 1440]):
-    trip['start_time'] = [ts[0] for ts in trip['timestamp']]
-    trip['end_time'] = [ts[-1] for ts in trip['timestamp']]
-    passengers['start_time'] = [ts[0] for ts in passengers['timestamp']]
-    passengers['end_time'] = [ts[-1] for ts in passengers['timestamp']]
+# passengers/trip need start_time and end_time (or timestamp lists); the interval
+# indexes of a RunReader can be passed in, otherwise they are built here.
+def generate_simulation_result_json(passengers, trip, records, time_range=[0, 1440],
+                                    passenger_index=None, trip_index=None):
+    if 'start_time' not in trip.columns:
+        trip['start_time'] = [ts[0] for ts in trip['timestamp']]
+        trip['end_time'] = [ts[-1] for ts in trip['timestamp']]
+    if 'start_time' not in passengers.columns:
+        passengers['start_time'] = [ts[0] for ts in passengers['timestamp']]
+        passengers['end_time'] = [ts[-1] for ts in passengers['timestamp']]
+
+    if trip_index is None:
+        trip_index = IntervalIndex(trip['start_time'].to_numpy(), trip['end_time'].to_numpy())
+    if passenger_index is None:
+        passenger_index = IntervalIndex(passengers['start_time'].to_numpy(), passengers['end_time'].to_numpy())
+    trip_vehicle_id = trip['vehicle_id'].to_numpy()
+    trip_board = trip['board'].to_numpy()
+    passenger_start_time = passengers['start_time'].to_numpy()
 
     # Initialize result lists
     driving_vehicle_num_lst = []
@@ -160,16 +168,16 @@ def generate_simulation_result_json(passengers, trip, records, time_range=[0, 14
             driving_vehicle_num = current_record['driving_vehicle_cnt'].iloc[0]
             fail_passenger_cumNum = current_record['fail_passenger_cnt'].iloc[0]
 
-            # Calculate active vehicle categories
-            operating_vehicle = trip.loc[(trip['start_time'] <= tm) & (trip['end_time'] >= tm)].drop_duplicates('vehicle_id')
-            dispatched_vehicle = operating_vehicle.loc[operating_vehicle['board'] == 0]
-            occupied_vehicle = operating_vehicle.loc[operating_vehicle['board'] == 1]
+            # Calculate active vehicle categories (first active trip of each vehicle)
+            operating_trips = trip_index.active_at(tm)
+            _, first_trip = np.unique(trip_vehicle_id[operating_trips], return_index=True)
+            operating_board = trip_board[operating_trips[first_trip]]
 
-            dispatched_vehicle_num = len(dispatched_vehicle)
-            occupied_vehicle_num = len(occupied_vehicle)
+            dispatched_vehicle_num = int(np.sum(operating_board == 0))
+            occupied_vehicle_num = int(np.sum(operating_board == 1))
 
             # Calculate waiting passenger statistics
-            waiting_passengers = passengers.loc[(passengers['start_time'] <= tm) & (passengers['end_time'] >= tm)].copy()
+            waiting_passengers = pd.DataFrame({'start_time': passenger_start_time[passenger_index.active_at(tm)]})
             waiting_passenger_num = len(waiting_passengers)
 
             if not waiting_passengers.empty:
@@ -215,19 +223,28 @@ def generate_simulation_result_json(passengers, trip, records, time_range=[0, 14
     return results
 
 # Sync simulation results to npm visualization
+# Trips and markers are exported in time-window chunks ('viewer_window' minutes) as
+# JSON or typed-array buffers ('viewer_format'); with viewer_window 0 the full JSON
+# files are copied instead (binary or polyline output then goes into a single chunk).
 def sync_to_npm(simul_configs):
     source_dir = simul_configs['save_path']
     target_dir = './visualization/simulation/public/data'
+    window = simul_configs.get('viewer_window', base_configs['viewer_window'])
+    view_format = simul_configs.get('viewer_format', base_configs['viewer_format'])
+    encoded_routes = simul_configs.get('route_geometry', base_configs['route_geometry']) == 'polyline'
     
     files_to_copy = [
-        'passenger_marker.json',
-        'vehicle_marker.json', 
-        'trip.json',
         'record.csv',
         'result.json'
     ]
     
     os.makedirs(target_dir, exist_ok=True)
+
+    if window or view_format == 'binary' or encoded_routes:
+        export_viewer_chunks(source_dir, target_dir, window or None, view_format)
+    else:
+        remove_viewer_chunks(target_dir)
+        files_to_copy += ['passenger_marker.json', 'vehicle_marker.json', 'trip.json']
     
     for file_name in files_to_copy:
         source_file = os.path.join(source_dir, file_name)
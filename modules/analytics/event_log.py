@@ -0,0 +1,260 @@
+"""
+Replay of the event log of a result folder (events.bin, written with 'event_log')
+
+The log holds one typed record per request, dispatch, pickup, drop-off, failure,
+shift start and shift end. The marker files, record.csv, result.json and the
+dashboard KPIs are derived from it alone; routes are not part of the log and stay
+in the trip store (trip.json / trip_columns/).
+
+Outputs go to the replay/ subfolder of each result folder unless --target-dir is
+given; --in-place overwrites the files the engine wrote into the result folder.
+
+Usage:
+    python -m modules.analytics.event_log ./simul_result/scenario_base/ --outputs record result --processes 4
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from multiprocess import Pool
+
+from modules.engine.clock import SimulationClock, TICK_EPSILON
+from modules.engine.result_writer import EVENT_LOG_FILE, EVENT_MANIFEST, EVENT_KINDS
+from .dashboard import generate_simulation_result_json
+from .run_reader import simulation_folders
+
+
+# Outputs that can be materialized from the log and their files
+DERIVED_OUTPUTS = {
+    'passenger_marker': 'passenger_marker.json',
+    'vehicle_marker': 'vehicle_marker.json',
+    'record': 'record.csv',
+    'result': 'result.json',
+}
+
+# Subfolder of a result folder that materialized outputs go to by default
+REPLAY_DIR = 'replay'
+
+
+# Read-only event log of a result folder (events are memory-mapped)
+# Besides the logged events, the replay only needs the manifest: the clock, the
+# drop-off delay after which a vehicle is free again and the last simulated tick.
+class EventLog:
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, EVENT_MANIFEST), 'r') as f:
+            self.manifest = json.load(f)
+        self.clock = SimulationClock(self.manifest['time_range'], self.manifest['tick_size'])
+
+        dtype = np.dtype([tuple(field) for field in self.manifest['dtype']])
+        count = self.manifest['count']
+        if count == 0:
+            self.events = np.zeros(0, dtype=dtype)
+        else:
+            self.events = np.memmap(os.path.join(folder, EVENT_LOG_FILE), dtype=dtype, mode='r', shape=(count,))
+
+    # Events of the given kinds, in log order
+    def of_kind(self, *kinds):
+        codes = [EVENT_KINDS.index(kind) for kind in kinds]
+        return self.events[np.isin(self.events['kind'], codes)]
+
+    # Tick at which events were logged
+    def ticks(self, events):
+        return np.rint((events['clock'] - self.clock.start) / self.clock.tick_size).astype('int64')
+
+    # passenger_marker.json records (failed and picked-up passengers in log order)
+    def passenger_markers(self):
+        events = self.of_kind('fail', 'pickup')
+        status = (events['kind'] == EVENT_KINDS.index('pickup')).astype('int64')
+        return [
+            {
+                'passenger_id': passenger_id,
+                'status': s,
+                'location': [lon, lat],
+                'timestamp': [start, end]
+            }
+            for passenger_id, s, lon, lat, start, end in zip(
+                events['passenger_id'].tolist(), status.tolist(), events['lon'].tolist(),
+                events['lat'].tolist(), events['since'].tolist(), events['time'].tolist()
+            )
+        ]
+
+    # vehicle_marker.json records (idle periods ended by a dispatch or a shift end)
+    def vehicle_markers(self):
+        events = self.of_kind('dispatch', 'shift_end')
+        events = events[(events['since'] != events['clock']) & ~np.isnan(events['since'])]
+        end_time = [self.clock.time(tick) for tick in self.ticks(events).tolist()]
+        keys = ['vehicle_id', 'cartype'] if self.manifest['has_cartype'] else ['vehicle_id']
+
+        markers = []
+        for values in zip(*[events[key].tolist() for key in keys], events['lon'].tolist(),
+                          events['lat'].tolist(), events['since'].tolist(), end_time):
+            marker = dict(zip(keys, values))
+            marker['location'] = list(values[-4:-2])
+            marker['timestamp'] = list(values[-2:])
+            markers.append(marker)
+        return markers
+
+    # Passenger intervals (request to pickup or failure) as in the passenger markers
+    def passengers(self):
+        events = self.of_kind('fail', 'pickup')
+        return pd.DataFrame({
+            'passenger_id': events['passenger_id'],
+            'status': (events['kind'] == EVENT_KINDS.index('pickup')).astype('int64'),
+            'lon': events['lon'], 'lat': events['lat'],
+            'start_time': events['since'], 'end_time': events['time'],
+        })
+
+    # Trip legs in trip record order (per dispatch: every pickup leg, then every drop-off leg)
+    # Leg ends are the vehicle and request locations, not the snapped route endpoints.
+    def trips(self):
+        dispatch, pickup, dropoff = self.of_kind('dispatch'), self.of_kind('pickup'), self.of_kind('dropoff')
+        legs = {
+            'vehicle_id': np.concatenate([dispatch['vehicle_id'], dropoff['vehicle_id']]),
+            'cartype': np.concatenate([dispatch['cartype'], dropoff['cartype']]),
+            'passenger_id': np.concatenate([dispatch['passenger_id'], dropoff['passenger_id']]),
+            'board': np.repeat([0, 1], len(dispatch)),
+            'start_time': np.concatenate([dispatch['time'], dropoff['since']]),
+            'end_time': np.concatenate([pickup['time'], dropoff['time']]),
+            'start_lon': np.concatenate([dispatch['lon'], pickup['lon']]),
+            'start_lat': np.concatenate([dispatch['lat'], pickup['lat']]),
+            'end_lon': np.concatenate([pickup['lon'], dropoff['lon']]),
+            'end_lat': np.concatenate([pickup['lat'], dropoff['lat']]),
+        }
+        order = np.lexsort((np.tile(np.arange(len(dispatch)), 2), legs['board'],
+                            np.concatenate([dispatch['clock'], dropoff['clock']])))
+        return pd.DataFrame({name: values[order] for name, values in legs.items()})
+
+    # record.csv rows: pool sizes after the last tick of every minute
+    def records(self):
+        clock, last_tick = self.clock, self.manifest['last_tick']
+
+        # Cumulative number of events of a kind up to each tick
+        def cumulative(ticks):
+            ticks = ticks[ticks <= last_tick]
+            return np.cumsum(np.bincount(ticks, minlength=last_tick + 1))
+
+        # Vehicles are free again at the first tick after drop-off and alighting
+        dropoff = self.of_kind('dropoff')
+        free_time = dropoff['time'] + self.manifest['add_disembark_time']
+        release = np.maximum(clock.ticks_at_or_after(free_time), self.ticks(dropoff) + 1)
+
+        counts = {kind: cumulative(self.ticks(self.of_kind(kind)))
+                  for kind in ['request', 'fail', 'dispatch', 'shift_start', 'shift_end']}
+        counts['release'] = cumulative(release)
+        pools = {
+            'waiting_passenger_cnt': counts['request'] - counts['fail'] - counts['dispatch'],
+            'fail_passenger_cnt': counts['fail'],
+            'empty_vehicle_cnt': counts['shift_start'] + counts['release'] - counts['dispatch'] - counts['shift_end'],
+            'driving_vehicle_cnt': counts['dispatch'] - counts['release'],
+        }
+
+        # Last tick of each minute (minutes without a tick are carried forward by the
+        # event-driven mode and stay empty in the time-step mode)
+        rows = self.manifest['record_rows']
+        tick_rows = np.floor(np.arange(last_tick + 1) * clock.tick_size + TICK_EPSILON).astype('int64')
+        last = np.searchsorted(tick_rows, np.arange(rows), side='right') - 1
+        last[(last < 0) | (tick_rows[np.maximum(last, 0)] != np.arange(rows))] = -1
+        if self.manifest['execution_mode'] == 'event_driven':
+            last = np.maximum.accumulate(last) if rows else last
+
+        record = pd.DataFrame({'time': np.arange(clock.start, clock.start + rows, dtype='int64')})
+        for name, values in pools.items():
+            record[name] = np.where(last >= 0, values[np.maximum(last, 0)], 0)
+        record['iter_time(second)'] = np.nan
+        return record
+
+    # result.json rows (see generate_simulation_result_json)
+    def result(self):
+        return generate_simulation_result_json(self.passengers(), self.trips(), self.records())
+
+    # Summary statistics (same definitions as the dashboard and the results catalog)
+    def summary(self):
+        passengers = self.passengers()
+        wait_times = (passengers['end_time'] - passengers['start_time'])[passengers['status'] == 1].tolist()
+        failed_calls = int(self.records()['fail_passenger_cnt'].iloc[-1])
+        total_calls = len(np.unique(passengers['passenger_id']))
+        vehicle_ids = np.intersect1d([marker['vehicle_id'] for marker in self.vehicle_markers()],
+                                     self.of_kind('dispatch')['vehicle_id'])
+
+        return {
+            'total_calls': total_calls,
+            'failed_calls': failed_calls,
+            'failure_rate': round(failed_calls / total_calls * 100, 2) if total_calls else 0.0,
+            'mean_wait': round(sum(wait_times) / len(wait_times), 2) if wait_times else 0.0,
+            'vehicles_driven': len(vehicle_ids),
+        }
+
+
+# Write outputs derived from the event log of a result folder (into target_dir,
+# by default its replay/ subfolder) and return their paths
+# Pass the folder itself as target_dir to overwrite the engine's files.
+def materialize(folder, outputs=None, target_dir=None):
+    log = EventLog(folder)
+    target_dir = os.path.join(folder, REPLAY_DIR) if target_dir is None else target_dir
+    os.makedirs(target_dir, exist_ok=True)
+
+    paths = []
+    for output in (outputs or list(DERIVED_OUTPUTS)):
+        file_path = os.path.join(target_dir, DERIVED_OUTPUTS[output])
+        if output == 'passenger_marker':
+            with open(file_path, 'w') as f:
+                json.dump(log.passenger_markers(), f)
+        elif output == 'vehicle_marker':
+            with open(file_path, 'w') as f:
+                json.dump(log.vehicle_markers(), f)
+        elif output == 'record':
+            log.records().to_csv(file_path, index=False)
+        elif output == 'result':
+            log.result().to_json(file_path, orient='records')
+        paths.append(file_path)
+    return paths
+
+
+def _materialize_job(job):
+    return materialize(*job)
+
+
+# Materialize the outputs of several result folders in parallel
+def materialize_runs(folders, outputs=None, target_dirs=None, processes=None):
+    target_dirs = target_dirs or [None] * len(folders)
+    jobs = [(folder, outputs, target_dir) for folder, target_dir in zip(folders, target_dirs)]
+    processes = processes or min(len(jobs), os.cpu_count() or 1)
+    if processes <= 1:
+        return [_materialize_job(job) for job in jobs]
+    with Pool(processes) as pool:
+        return pool.map(_materialize_job, jobs, chunksize=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Derive result files from event logs')
+    parser.add_argument('base_path', help='Result folder, or folder of simulation_* result folders')
+    parser.add_argument('--simulation', default=None, help='Only this simulation_* folder of base_path')
+    parser.add_argument('--outputs', nargs='+', choices=list(DERIVED_OUTPUTS), default=None)
+    parser.add_argument('--processes', type=int, default=None)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--target-dir', default=None,
+                        help=f'Output folder (one simulation_* subfolder per run; default: <run>/{REPLAY_DIR}/)')
+    target.add_argument('--in-place', action='store_true', help='Overwrite the result files of the run folders')
+    args = parser.parse_args(argv)
+
+    if os.path.isfile(os.path.join(args.base_path, EVENT_MANIFEST)):
+        folders = [args.base_path]
+        target_dirs = [args.target_dir]
+    else:
+        names = simulation_folders(args.base_path, args.simulation)
+        folders = [os.path.join(args.base_path, fd) for fd in names]
+        target_dirs = [os.path.join(args.target_dir, fd) if args.target_dir else None for fd in names]
+    if args.in_place:
+        target_dirs = folders
+
+    for paths in materialize_runs(folders, args.outputs, target_dirs, processes=args.processes):
+        print('\n'.join(paths))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,26 +4,21 @@ import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
 
+from .run_reader import RunReader, simulation_folders
+
 pio.renderers.default = "iframe"
 
 
 # Generate vehicle and passenger status over time
 def figure_4(base_path, time_range, time_single_labels, simulation_name=None, save_path=None):  
     # Determine folders to process
-    if simulation_name:
-        folders_to_process = [simulation_name]
-    else:
-        folders_to_process = [fd for fd in os.listdir(base_path) 
-                            if not fd.startswith('.') and 
-                            os.path.isdir(os.path.join(base_path, fd)) and 
-                            fd.startswith("simulation_")]
+    folders_to_process = simulation_folders(base_path, simulation_name)
 
     total_records = []
     for fd_nm in folders_to_process:
-        records_path = os.path.join(base_path, fd_nm, 'record.csv')
-        if os.path.exists(records_path):
-            records = pd.read_csv(records_path)
-            records = records[['time', 'waiting_passenger_cnt', 'empty_vehicle_cnt', 'driving_vehicle_cnt']]
+        run = RunReader(os.path.join(base_path, fd_nm))
+        if run.rows('records'):
+            records = run.frame('records', ['time', 'waiting_passenger_cnt', 'empty_vehicle_cnt', 'driving_vehicle_cnt'])
             total_records.append(records)
     
     if not total_records:
@@ -87,13 +82,7 @@ def figure_4(base_path, time_range, time_single_labels, simulation_name=None, sa
 # Generate hourly operating vehicle count bar chart
 def figure_5(base_path, time_bins, time_single_labels, simulation_name=None, save_path=None):  
     # Determine folders to process
-    if simulation_name:
-        folders_to_process = [simulation_name]
-    else:
-        folders_to_process = [fd for fd in os.listdir(base_path) 
-                            if not fd.startswith('.') and 
-                            os.path.isdir(os.path.join(base_path, fd)) and 
-                            fd.startswith("simulation_")]
+    folders_to_process = simulation_folders(base_path, simulation_name)
 
     total_operating_vh_cnt = []
     
@@ -101,9 +90,9 @@ def figure_5(base_path, time_bins, time_single_labels, simulation_name=None, sav
     time_bins_fixed = time_bins[:-1] + [time_bins[-2] + 60]
     
     for fd_nm in folders_to_process:
-        records_path = os.path.join(base_path, fd_nm, 'record.csv')
-        if os.path.exists(records_path):
-            records = pd.read_csv(records_path)
+        run = RunReader(os.path.join(base_path, fd_nm))
+        if run.rows('records'):
+            records = run.frame('records', ['time', 'empty_vehicle_cnt', 'driving_vehicle_cnt'])
             records['operating_vehicle_cnt'] = records['empty_vehicle_cnt'] + records['driving_vehicle_cnt']
             
             records['time_cat'] = pd.cut(records['time'], bins=time_bins_fixed, labels=time_single_labels, right=False)
@@ -0,0 +1,87 @@
+import os
+import json
+import numpy as np
+
+
+# Width of the lookup buckets (minutes)
+INDEX_BUCKET_MINUTES = 5
+
+# Files of a persisted index
+INDEX_MANIFEST = 'index.json'
+INDEX_ARRAYS = ['bucket_offsets', 'bucket_items']
+
+
+# Interval index over [start, end] rows (both ends inclusive)
+# Every row is listed, in row order, under each fixed-width time bucket it
+# overlaps (bucket_items, delimited by bucket_offsets). Queries only scan the
+# buckets of the requested time and filter those candidates exactly.
+class IntervalIndex:
+
+    def __init__(self, start, end, bucket_offsets=None, bucket_items=None, origin=None,
+                 bucket_size=INDEX_BUCKET_MINUTES):
+        self.start = np.asarray(start, dtype='float64')
+        self.end = np.asarray(end, dtype='float64')
+        self.bucket_size = bucket_size
+
+        if bucket_offsets is None:
+            self.origin, self.bucket_offsets, self.bucket_items = self._build()
+        else:
+            self.origin, self.bucket_offsets, self.bucket_items = origin, bucket_offsets, bucket_items
+
+    def _build(self):
+        if len(self.start) == 0:
+            return 0.0, np.zeros(1, dtype='int64'), np.zeros(0, dtype='int64')
+
+        origin = float(np.floor(self.start.min() / self.bucket_size) * self.bucket_size)
+        first = np.floor((self.start - origin) / self.bucket_size).astype('int64')
+        last = np.maximum(np.floor((self.end - origin) / self.bucket_size).astype('int64'), first)
+        counts = last - first + 1
+
+        # (bucket, row) pairs of every row, ordered by bucket then row
+        rows = np.repeat(np.arange(len(first)), counts)
+        steps = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        buckets = np.repeat(first, counts) + steps
+        order = np.lexsort((rows, buckets))
+
+        bucket_offsets = np.searchsorted(buckets[order], np.arange(last.max() + 2)).astype('int64')
+        return origin, bucket_offsets, rows[order].astype('int64')
+
+    # Bucket of a time
+    def _bucket(self, t):
+        return int(np.floor((t - self.origin) / self.bucket_size))
+
+    def _candidates(self, first, last):
+        first = max(int(first), 0)
+        last = min(int(last), len(self.bucket_offsets) - 2)
+        if first > last:
+            return np.zeros(0, dtype='int64')
+        return self.bucket_items[self.bucket_offsets[first]:self.bucket_offsets[last + 1]]
+
+    # Rows active at time t (start <= t <= end), in row order
+    def active_at(self, t):
+        rows = self._candidates(self._bucket(t), self._bucket(t))
+        return rows[(self.start[rows] <= t) & (self.end[rows] >= t)]
+
+    # Rows overlapping [t0, t1) (start < t1 and end >= t0), in row order
+    def overlapping(self, t0, t1):
+        last = int(np.ceil((t1 - self.origin) / self.bucket_size)) - 1
+        rows = np.unique(self._candidates(self._bucket(t0), last))
+        return rows[(self.start[rows] < t1) & (self.end[rows] >= t0)]
+
+    # Persist the lookup table in folder (start/end stay with their table)
+    def save(self, folder):
+        for name in INDEX_ARRAYS:
+            getattr(self, name).tofile(os.path.join(folder, f'{name}.bin'))
+        with open(os.path.join(folder, INDEX_MANIFEST), 'w') as f:
+            json.dump({'origin': self.origin, 'bucket_size': self.bucket_size,
+                       'buckets': len(self.bucket_offsets) - 1, 'items': len(self.bucket_items)}, f)
+
+    @classmethod
+    def load(cls, folder, start, end):
+        with open(os.path.join(folder, INDEX_MANIFEST), 'r') as f:
+            manifest = json.load(f)
+        lengths = {'bucket_offsets': manifest['buckets'] + 1, 'bucket_items': manifest['items']}
+        arrays = {name: np.fromfile(os.path.join(folder, f'{name}.bin'), dtype='int64', count=lengths[name])
+                  for name in INDEX_ARRAYS}
+        return cls(start, end, arrays['bucket_offsets'], arrays['bucket_items'],
+                   manifest['origin'], manifest['bucket_size'])
@@ -0,0 +1,261 @@
+"""
+Results catalog: one SQLite file indexing every finished run
+
+Each run is registered with its configs, a hash of its input data, summary KPIs
+and the locations of its result files, plus its per-minute record.csv rows, so
+runs can be compared with a query instead of re-reading their result folders.
+
+Usage:
+    python -m modules.analytics.results_catalog --scan --where "failure_rate < 5" --order-by mean_wait
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+from .run_reader import RunReader, RUN_ARRAYS_DIR, RUN_SOURCES, source_signature
+
+
+# Configs that do not change the simulation outcome (excluded from the hash);
+# total_requests is derived from the input data by the Simulator
+RUNTIME_KEYS = ['path', 'save_path', 'YMD', 'total_requests', 'view_operation_graph', 'checkpoint_interval', 'checkpoint_path',
+                'viewer_window', 'viewer_format', 'results_catalog', 'event_log',
+                'osrm_timeout', 'osrm_pool_size', 'osrm_concurrency', 'osrm_table_size',
+                'route_cache_mb', 'route_cache', 'route_prefetch', 'route_prefetch_window']
+
+# Catalog file used by sweeps, replications and main.py (relative to simul_result)
+CATALOG_FILE = 'catalog.sqlite'
+
+# Summary KPIs of a run (columns of the runs table)
+CATALOG_KPIS = ['total_calls', 'failed_calls', 'failure_rate', 'mean_wait', 'vehicles_driven', 'aborted']
+
+# record.csv columns stored in the records table
+CATALOG_RECORD_COLUMNS = {
+    'time': 'time',
+    'waiting_passenger_cnt': 'waiting_passenger_cnt',
+    'fail_passenger_cnt': 'fail_passenger_cnt',
+    'empty_vehicle_cnt': 'empty_vehicle_cnt',
+    'driving_vehicle_cnt': 'driving_vehicle_cnt',
+    'iter_time(second)': 'iter_time',
+}
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    save_path TEXT UNIQUE NOT NULL,
+    experiment TEXT,
+    name TEXT,
+    config_hash TEXT,
+    data_hash TEXT,
+    configs TEXT,
+    total_calls INTEGER,
+    failed_calls INTEGER,
+    failure_rate REAL,
+    mean_wait REAL,
+    vehicles_driven INTEGER,
+    aborted INTEGER,
+    files TEXT,
+    sources TEXT,
+    registered_at TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_experiment ON runs (experiment);
+CREATE INDEX IF NOT EXISTS runs_config_hash ON runs (config_hash);
+CREATE INDEX IF NOT EXISTS runs_data_hash ON runs (data_hash);
+CREATE INDEX IF NOT EXISTS runs_failure_rate ON runs (failure_rate);
+CREATE INDEX IF NOT EXISTS runs_mean_wait ON runs (mean_wait);
+CREATE TABLE IF NOT EXISTS records (
+    run_id INTEGER NOT NULL,
+    time REAL NOT NULL,
+    waiting_passenger_cnt INTEGER,
+    fail_passenger_cnt INTEGER,
+    empty_vehicle_cnt INTEGER,
+    driving_vehicle_cnt INTEGER,
+    iter_time REAL,
+    PRIMARY KEY (run_id, time)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS records_time ON records (time);
+"""
+
+
+# Fingerprint of the preprocessed inputs
+def data_fingerprint(passengers, vehicles):
+    digest = hashlib.sha1()
+    for data in (passengers, vehicles):
+        digest.update(','.join(map(str, data.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+# Hash of everything that determines a run's outcome
+def config_hash(configs, fingerprint):
+    relevant = {key: value for key, value in configs.items() if key not in RUNTIME_KEYS}
+    payload = json.dumps(relevant, sort_keys=True, default=str) + fingerprint
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+# Catalog file of a run (results_catalog is relative to simul_result; None disables it)
+def catalog_path(configs):
+    if not configs.get('results_catalog'):
+        return None
+    return os.path.join(os.getcwd(), 'simul_result', configs['results_catalog'])
+
+
+# Open (and create) a catalog
+def connect_catalog(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=60)
+    connection.executescript(CATALOG_SCHEMA)
+    return connection
+
+
+# Summary statistics of one result folder (same definitions as the dashboard)
+def run_summary(save_path):
+    run = RunReader(save_path)
+    passengers = run.columns('passengers', ['passenger_id', 'status', 'start_time', 'end_time'])
+    records = run.columns('records', ['fail_passenger_cnt'])
+
+    total_calls = len(np.unique(passengers['passenger_id']))
+    failed_calls = int(records['fail_passenger_cnt'][-1])
+    served = passengers['status'] == 1
+    wait_times = (passengers['end_time'][served] - passengers['start_time'][served]).tolist()
+
+    vehicle_ids = np.intersect1d(run.columns('vehicles', ['vehicle_id'])['vehicle_id'],
+                                 run.columns('trips', ['vehicle_id'])['vehicle_id'])
+
+    return {
+        'total_calls': total_calls,
+        'failed_calls': failed_calls,
+        'failure_rate': round(failed_calls / total_calls * 100, 2) if total_calls else 0.0,
+        'mean_wait': round(sum(wait_times) / len(wait_times), 2) if wait_times else 0.0,
+        'vehicles_driven': len(vehicle_ids),
+    }
+
+
+# Register (or refresh) a finished result folder with its KPIs and per-minute records
+# configs/fingerprint are None for folders found by scan_results.
+def register_run(path, save_path, configs=None, fingerprint=None, aborted=False):
+    save_path = os.path.abspath(save_path)
+    summary = run_summary(save_path)
+    records = RunReader(save_path).columns('records')
+
+    files = {name: os.path.join(save_path, name) for name in RUN_SOURCES + [RUN_ARRAYS_DIR]
+             if os.path.exists(os.path.join(save_path, name))}
+    row = {
+        'save_path': save_path,
+        'experiment': os.path.basename(os.path.dirname(save_path)),
+        'name': os.path.basename(save_path),
+        'config_hash': config_hash(configs, fingerprint) if configs is not None and fingerprint else None,
+        'data_hash': fingerprint,
+        'configs': json.dumps(configs, sort_keys=True, default=str) if configs is not None else None,
+        **summary,
+        'aborted': int(aborted),
+        'files': json.dumps(files),
+        'sources': json.dumps(source_signature(save_path)),
+        'registered_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+    connection = connect_catalog(path)
+    try:
+        with connection:
+            connection.execute('DELETE FROM records WHERE run_id IN (SELECT run_id FROM runs WHERE save_path = ?)', (save_path,))
+            connection.execute('DELETE FROM runs WHERE save_path = ?', (save_path,))
+            run_id = connection.execute(
+                f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", list(row.values())
+            ).lastrowid
+
+            names = [name for name in CATALOG_RECORD_COLUMNS if name in records]
+            values = zip(*[records[name].tolist() for name in names])
+            connection.executemany(
+                f"INSERT INTO records (run_id, {', '.join(CATALOG_RECORD_COLUMNS[name] for name in names)}) "
+                f"VALUES (?, {', '.join('?' * len(names))})",
+                ([run_id, *[None if v != v else v for v in value]] for value in values)
+            )
+    finally:
+        connection.close()
+    return run_id
+
+
+# Register every result folder (any folder with a record.csv) under result_root that
+# is missing from the catalog or changed since it was registered
+def scan_results(path, result_root):
+    connection = connect_catalog(path)
+    try:
+        registered = dict(connection.execute('SELECT save_path, sources FROM runs').fetchall())
+    finally:
+        connection.close()
+
+    updated = []
+    for folder, _, files in os.walk(os.path.abspath(result_root)):
+        if 'record.csv' not in files or RUN_ARRAYS_DIR in folder.split(os.sep):
+            continue
+        if registered.get(folder) != json.dumps(source_signature(folder)):
+            register_run(path, folder)
+            updated.append(folder)
+    return updated
+
+
+# Runs matching an SQL condition as a DataFrame
+# where: condition on the runs columns (configs can be filtered with
+#        json_extract(configs, '$.dispatch_mode')), with ? placeholders bound to params
+def query_runs(path, where=None, params=(), order_by=None, limit=None):
+    sql = 'SELECT * FROM runs'
+    if where:
+        sql += f' WHERE {where}'
+    if order_by:
+        sql += f' ORDER BY {order_by}'
+    if limit:
+        sql += f' LIMIT {int(limit)}'
+    connection = connect_catalog(path)
+    try:
+        return pd.read_sql_query(sql, connection, params=list(params))
+    finally:
+        connection.close()
+
+
+# Per-minute records of the given runs (all runs if None), ordered by run and time
+def query_records(path, run_ids=None, time_range=None):
+    conditions, params = [], []
+    if run_ids is not None:
+        run_ids = list(run_ids)
+        conditions.append(f"run_id IN ({', '.join('?' * len(run_ids))})")
+        params += run_ids
+    if time_range is not None:
+        conditions.append('time >= ? AND time < ?')
+        params += list(time_range)
+
+    sql = 'SELECT * FROM records'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    connection = connect_catalog(path)
+    try:
+        return pd.read_sql_query(sql + ' ORDER BY run_id, time', connection, params=params)
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the results catalog')
+    parser.add_argument('--catalog', default=os.path.join('./simul_result', CATALOG_FILE))
+    parser.add_argument('--scan', nargs='?', const='./simul_result', default=None,
+                        help='Register new or changed result folders under this folder first')
+    parser.add_argument('--where', default=None, help='SQL condition on the runs table')
+    parser.add_argument('--order-by', default='run_id')
+    parser.add_argument('--limit', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.scan is not None:
+        updated = scan_results(args.catalog, args.scan)
+        print(f"[Catalog] {len(updated)} result folders registered")
+
+    runs = query_runs(args.catalog, args.where, order_by=args.order_by, limit=args.limit)
+    print(runs[['run_id', 'experiment', 'name'] + CATALOG_KPIS].to_string(index=False))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from modules.engine.result_writer import TRIP_COLUMNS_DIR, TRIP_MANIFEST
+from modules.routing.route_geometry import decode_route
+from .trip_store import has_trip_columns, load_trip_columns
+from .interval_index import IntervalIndex, INDEX_MANIFEST
+
+
+# Folder of the fixed-width arrays of a result folder and its manifest
+RUN_ARRAYS_DIR = 'run_arrays'
+RUN_MANIFEST = 'arrays.json'
+
+# Columns of every table (one flat binary file per column)
+RUN_TABLE_COLUMNS = {
+    'passengers': ['passenger_id', 'status', 'lon', 'lat', 'start_time', 'end_time'],
+    'vehicles': ['vehicle_id', 'cartype', 'lon', 'lat', 'start_time', 'end_time'],
+    'trips': ['vehicle_id', 'cartype', 'passenger_id', 'board', 'start_time', 'end_time',
+              'start_lon', 'start_lat', 'end_lon', 'end_lat'],
+}
+
+# Tables with an interval index over [start_time, end_time] (stored in <table>/index/)
+INDEXED_TABLES = ['passengers', 'vehicles', 'trips']
+INDEX_DIR = 'index'
+
+# Result files the arrays are derived from (rebuilt when any of them changes)
+RUN_SOURCES = ['passenger_marker.json', 'vehicle_marker.json', 'trip.json',
+               f'{TRIP_COLUMNS_DIR}/{TRIP_MANIFEST}', 'record.csv']
+
+
+# simulation_* folders of base_path (or only simulation_name)
+def simulation_folders(base_path, simulation_name=None):
+    if simulation_name:
+        return [simulation_name]
+    return [fd for fd in os.listdir(base_path)
+            if not fd.startswith('.') and
+            os.path.isdir(os.path.join(base_path, fd)) and
+            fd.startswith("simulation_")]
+
+
+# Read-only access to the outputs of one result folder through memory-mapped arrays
+# Tables: passengers, vehicles, trips (see RUN_TABLE_COLUMNS) and records (record.csv).
+# The arrays are built on first access and rebuilt when the result files change;
+# columns() returns zero-copy views, frame() a DataFrame of the requested columns only
+# and interval_index() the persisted time-window index of a table.
+class RunReader:
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, RUN_ARRAYS_DIR)
+        self.manifest = build_run_arrays(folder)
+
+    def rows(self, table):
+        return self.manifest['tables'][table]['rows']
+
+    # Column arrays {name: np.memmap} of a table
+    def columns(self, table, names=None):
+        dtypes = self.manifest['tables'][table]['dtypes']
+        return {name: self._map(table, name, dtypes[name]) for name in (names or dtypes.keys())}
+
+    def frame(self, table, names=None):
+        return pd.DataFrame(self.columns(table, names))
+
+    # IntervalIndex over the start_time/end_time columns of a table
+    def interval_index(self, table):
+        columns = self.columns(table, ['start_time', 'end_time'])
+        index_path = os.path.join(self.path, table, INDEX_DIR)
+        if not os.path.isfile(os.path.join(index_path, INDEX_MANIFEST)):
+            # Arrays written before the table was indexed
+            os.makedirs(index_path, exist_ok=True)
+            IntervalIndex(columns['start_time'], columns['end_time']).save(index_path)
+        return IntervalIndex.load(index_path, columns['start_time'], columns['end_time'])
+
+    def _map(self, table, name, dtype):
+        rows = self.rows(table)
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, table, f'{name}.bin'), dtype=dtype, mode='r', shape=(rows,))
+
+
+# RunReader of every simulation_* folder of base_path (or only simulation_name)
+def iter_runs(base_path, simulation_name=None):
+    for fd_nm in simulation_folders(base_path, simulation_name):
+        yield RunReader(os.path.join(base_path, fd_nm))
+
+
+# Build (or reuse) the fixed-width arrays of a result folder and return their manifest
+def build_run_arrays(folder):
+    path = os.path.join(folder, RUN_ARRAYS_DIR)
+    sources = source_signature(folder)
+
+    manifest_path = os.path.join(path, RUN_MANIFEST)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest['sources'] == sources:
+            return manifest
+        shutil.rmtree(path)
+
+    tables = {
+        'passengers': _marker_table(os.path.join(folder, 'passenger_marker.json'), 'passenger_id', 'status'),
+        'vehicles': _marker_table(os.path.join(folder, 'vehicle_marker.json'), 'vehicle_id', 'cartype'),
+        'trips': _trip_table(folder),
+        'records': _record_table(os.path.join(folder, 'record.csv')),
+    }
+
+    # Write into a temporary folder and move it into place
+    tmp_path = tempfile.mkdtemp(prefix=RUN_ARRAYS_DIR + '.', dir=folder)
+    manifest = {'sources': sources, 'tables': {}}
+    for table, columns in tables.items():
+        os.makedirs(os.path.join(tmp_path, table))
+        rows = len(next(iter(columns.values()))) if columns else 0
+        manifest['tables'][table] = {'rows': rows, 'dtypes': {name: values.dtype.str for name, values in columns.items()}}
+        for name, values in columns.items():
+            values.tofile(os.path.join(tmp_path, table, f'{name}.bin'))
+        if table in INDEXED_TABLES:
+            os.makedirs(os.path.join(tmp_path, table, INDEX_DIR))
+            IntervalIndex(columns['start_time'], columns['end_time']).save(os.path.join(tmp_path, table, INDEX_DIR))
+    with open(os.path.join(tmp_path, RUN_MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Built concurrently by another reader
+        shutil.rmtree(tmp_path)
+    return manifest
+
+
+# Size and modification time of every existing source file
+def source_signature(folder):
+    sources = {}
+    for name in RUN_SOURCES:
+        file_path = os.path.join(folder, name)
+        if os.path.isfile(file_path):
+            stat = os.stat(file_path)
+            sources[name] = [stat.st_size, stat.st_mtime_ns]
+    return sources
+
+
+# Little-endian int64 / float64 array of JSON or CSV values
+def _fixed_width(values):
+    values = np.asarray(values)
+    if values.dtype.kind in 'iub':
+        return values.astype('<i8')
+    if values.dtype.kind == 'f' or len(values) == 0:
+        return values.astype('<f8')
+    raise ValueError(f"Cannot store {values.dtype} values as a fixed-width column")
+
+
+# Passenger or vehicle markers: id, status/cartype, location and first/last timestamp
+def _marker_table(file_path, id_key, value_key):
+    markers = []
+    if os.path.isfile(file_path):
+        with open(file_path, 'r') as f:
+            markers = json.load(f)
+
+    return {
+        id_key: _fixed_width([marker[id_key] for marker in markers]),
+        value_key: _fixed_width([marker[value_key] for marker in markers]),
+        'lon': _fixed_width([marker['location'][0] for marker in markers]),
+        'lat': _fixed_width([marker['location'][1] for marker in markers]),
+        'start_time': _fixed_width([marker['timestamp'][0] for marker in markers]),
+        'end_time': _fixed_width([marker['timestamp'][-1] for marker in markers]),
+    }
+
+
+# Trip scalars plus the first and last route point (from trip_columns/ or trip.json)
+def _trip_table(folder):
+    if has_trip_columns(folder):
+        data = load_trip_columns(folder, RUN_TABLE_COLUMNS['trips'][:6] + ['route_offsets', 'route_coords'])
+        first, last = data['route_offsets'][:-1], data['route_offsets'][1:] - 1
+        coords = data.pop('route_coords')
+        data.pop('route_offsets')
+        data.update({
+            'start_lon': coords[first, 0], 'start_lat': coords[first, 1],
+            'end_lon': coords[last, 0], 'end_lat': coords[last, 1],
+        })
+        return {name: _fixed_width(data[name]) for name in RUN_TABLE_COLUMNS['trips']}
+
+    trips = []
+    if os.path.isfile(os.path.join(folder, 'trip.json')):
+        with open(os.path.join(folder, 'trip.json'), 'r') as f:
+            trips = json.load(f)
+
+    routes = [decode_route(trip['trip']) for trip in trips]
+    table = {name: _fixed_width([trip[name] for trip in trips]) for name in RUN_TABLE_COLUMNS['trips'][:4]}
+    table.update({
+        'start_time': _fixed_width([trip['timestamp'][0] for trip in trips]),
+        'end_time': _fixed_width([trip['timestamp'][-1] for trip in trips]),
+        'start_lon': _fixed_width([route[0][0] for route in routes]),
+        'start_lat': _fixed_width([route[0][1] for route in routes]),
+        'end_lon': _fixed_width([route[-1][0] for route in routes]),
+        'end_lat': _fixed_width([route[-1][1] for route in routes]),
+    })
+    return table
+
+
+# Numeric columns of record.csv
+def _record_table(file_path):
+    if not os.path.isfile(file_path):
+        return {}
+    records = pd.read_csv(file_path)
+    return {name: _fixed_width(records[name].to_numpy()) for name in records.columns}
@@ -5,29 +5,22 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import plotly.io as pio
 
+from .run_reader import RunReader, simulation_folders
+
 pio.renderers.default = "iframe"
 
 
 # Generate hourly passenger request and failure trends
 def figure_1(base_path, time_range, time_bins, time_single_labels, simulation_name=None, save_path=None):
     # Determine folders to process
-    if simulation_name:
-        folders_to_process = [simulation_name]
-        file_num = 1
-    else:
-        folders_to_process = [fd for fd in os.listdir(base_path) 
-                            if not fd.startswith('.') and 
-                            os.path.isdir(os.path.join(base_path, fd)) and 
-                            fd.startswith("simulation_")]
-        file_num = len(folders_to_process)
+    folders_to_process = simulation_folders(base_path, simulation_name)
+    file_num = len(folders_to_process)
 
     total_request_cnt_inf = []
 
     # Process each simulation folder
     for fd_nm in folders_to_process:
-        passengers = pd.read_json(base_path + fd_nm + '/passenger_marker.json')
-        passengers['start_time'] = [tm[0] for tm in passengers['timestamp']]
-        passengers['end_time'] = [tm[-1] for tm in passengers['timestamp']]
+        passengers = RunReader(base_path + fd_nm).frame('passengers', ['status', 'start_time', 'end_time'])
         passengers['time_cat'] = pd.cut(passengers['start_time'], bins=time_bins, labels=time_single_labels, right=False)
 
         # Process failure passengers based on failure time
@@ -95,23 +88,14 @@ def figure_1(base_path, time_range, time_bins, time_single_labels, simulation_na
 # Generate service level analysis with request counts and failure ratios
 def figure_2(base_path, time_bins, time_single_labels, time_double_labels, simulation_name=None, save_path=None):
     # Determine folders to process
-    if simulation_name:
-        folders_to_process = [simulation_name]
-        file_num = 1
-    else:
-        folders_to_process = [fd for fd in os.listdir(base_path) 
-                            if not fd.startswith('.') and 
-                            os.path.isdir(os.path.join(base_path, fd)) and 
-                            fd.startswith("simulation_")]
-        file_num = len(folders_to_process)
+    folders_to_process = simulation_folders(base_path, simulation_name)
+    file_num = len(folders_to_process)
 
     total_service_level_inf = []
 
     # Process each simulation folder
     for fd_nm in folders_to_process:
-        passengers = pd.read_json(base_path + fd_nm + '/passenger_marker.json')
-        passengers['start_time'] = [tm[0] for tm in passengers['timestamp']]
-        passengers['end_time'] = [tm[-1] for tm in passengers['timestamp']]
+        passengers = RunReader(base_path + fd_nm).frame('passengers', ['status', 'start_time', 'end_time'])
         passengers['waiting_time'] = passengers['end_time'] - passengers['start_time']
         passengers['time_cat'] = pd.cut(passengers['start_time'], bins=time_bins, labels=time_single_labels, right=False) 
         
@@ -231,21 +215,13 @@ def figure_2(base_path, time_bins, time_single_labels, time_double_labels, simul
 # Generate waiting time distribution analysis
 def figure_3(base_path, time_range, time_bins, time_single_labels, simulation_name=None, save_path=None):
     # Determine folders to process
-    if simulation_name:
-        folders_to_process = [simulation_name]
-    else:
-        folders_to_process = [fd for fd in os.listdir(base_path) 
-                            if not fd.startswith('.') and 
-                            os.path.isdir(os.path.join(base_path, fd)) and 
-                            fd.startswith("simulation_")]
+    folders_to_process = simulation_folders(base_path, simulation_name)
 
     total_waiting_time_inf = []
     
     # Process each simulation folder
     for fd_nm in folders_to_process:
-        passengers = pd.read_json(base_path + fd_nm + '/passenger_marker.json')
-        passengers['start_time'] = [tm[0] for tm in passengers['timestamp']]
-        passengers['end_time'] = [tm[-1] for tm in passengers['timestamp']]
+        passengers = RunReader(base_path + fd_nm).frame('passengers', ['status', 'start_time', 'end_time'])
         passengers['waiting_time'] = passengers['end_time'] - passengers['start_time']
         passengers['time_cat'] = pd.cut(passengers['start_time'], bins=time_bins, labels=time_single_labels, right=False) 
         waiting_time_inf = passengers[['time_cat', 'waiting_time']]
@@ -0,0 +1,128 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from modules.engine.result_writer import JsonArrayWriter, TRIP_COLUMNS_DIR, TRIP_MANIFEST
+from modules.routing.route_geometry import decode_route
+
+
+# Columns derived from the first and last route point of each trip
+ROUTE_POINT_COLUMNS = ['start_lon', 'start_lat', 'end_lon', 'end_lat']
+
+# Rows per chunk when exporting trip.json
+EXPORT_CHUNK_ROWS = 10000
+
+
+# Columnar trip store of a result folder exists
+def has_trip_columns(folder):
+    return os.path.isfile(os.path.join(folder, TRIP_COLUMNS_DIR, TRIP_MANIFEST))
+
+
+# Read columns of the columnar trip store as arrays (route_coords as [points, 2])
+def load_trip_columns(folder, columns=None):
+    store = os.path.join(folder, TRIP_COLUMNS_DIR)
+    with open(os.path.join(store, TRIP_MANIFEST), 'r') as f:
+        manifest = json.load(f)
+
+    rows, points = manifest['rows'], manifest['points']
+    lengths = {'route_offsets': rows + 1, 'route_coords': points * 2, 'route_timestamps': points}
+
+    data = {}
+    for column in (columns or manifest['dtypes'].keys()):
+        data[column] = np.fromfile(os.path.join(store, f'{column}.bin'),
+                                   dtype=manifest['dtypes'][column],
+                                   count=lengths.get(column, rows))
+    if 'route_coords' in data:
+        data['route_coords'] = data['route_coords'].reshape(-1, 2)
+    return data
+
+
+# Trips of a result folder as a DataFrame with only the requested columns
+# Scalar columns: vehicle_id, cartype, passenger_id, board, start_time, end_time,
+# start_lon, start_lat, end_lon, end_lat; 'trip' and 'timestamp' rebuild the lists.
+# Reads the columnar store when present and trip.json otherwise.
+def load_trips(folder, columns):
+    if not has_trip_columns(folder):
+        return _trips_from_json(folder, columns)
+
+    scalar = [c for c in columns if c not in ROUTE_POINT_COLUMNS + ['trip', 'timestamp']]
+    needs_route = [c for c in columns if c not in scalar]
+
+    store_columns = list(scalar)
+    if needs_route:
+        store_columns.append('route_offsets')
+    if any(c in columns for c in ROUTE_POINT_COLUMNS + ['trip']):
+        store_columns.append('route_coords')
+    if 'timestamp' in columns:
+        store_columns.append('route_timestamps')
+    data = load_trip_columns(folder, store_columns)
+
+    trips = pd.DataFrame({column: data[column] for column in scalar})
+    if needs_route:
+        offsets = data['route_offsets']
+        first, last = offsets[:-1], offsets[1:] - 1
+        points = {'start_lon': (first, 0), 'start_lat': (first, 1), 'end_lon': (last, 0), 'end_lat': (last, 1)}
+        for column in columns:
+            if column in points:
+                idx, axis = points[column]
+                trips[column] = data['route_coords'][idx, axis]
+            elif column == 'trip':
+                trips[column] = [route.tolist() for route in np.split(data['route_coords'], offsets[1:-1])]
+            elif column == 'timestamp':
+                trips[column] = [ts.tolist() for ts in np.split(data['route_timestamps'], offsets[1:-1])]
+    return trips[list(columns)]
+
+
+def _trips_from_json(folder, columns):
+    trips = pd.read_json(os.path.join(folder, 'trip.json'))
+    if trips.empty:
+        return pd.DataFrame(columns=list(columns))
+
+    trips['start_time'] = [ts[0] for ts in trips['timestamp']]
+    trips['end_time'] = [ts[-1] for ts in trips['timestamp']]
+    trips['trip'] = [decode_route(tp) for tp in trips['trip']]
+    trips['start_lon'] = [tp[0][0] for tp in trips['trip']]
+    trips['start_lat'] = [tp[0][1] for tp in trips['trip']]
+    trips['end_lon'] = [tp[-1][0] for tp in trips['trip']]
+    trips['end_lat'] = [tp[-1][1] for tp in trips['trip']]
+    return trips[list(columns)]
+
+
+# Function returning the trip.json records of the given rows of a result folder with
+# decoded routes (built from the columnar store when present, otherwise read from trip.json)
+def trip_record_reader(folder):
+    if not has_trip_columns(folder):
+        with open(os.path.join(folder, 'trip.json'), 'r') as f:
+            trips = json.load(f)
+        return lambda rows: [dict(trips[row], trip=decode_route(trips[row]['trip'])) for row in rows]
+
+    data = load_trip_columns(folder)
+    offsets = data['route_offsets']
+
+    def read(rows):
+        rows = np.asarray(rows, dtype='int64')
+        scalars = {c: data[c][rows].tolist() for c in ['vehicle_id', 'cartype', 'passenger_id', 'board']}
+        return [
+            {
+                'vehicle_id': scalars['vehicle_id'][i],
+                'cartype': scalars['cartype'][i],
+                'passenger_id': scalars['passenger_id'][i],
+                'board': scalars['board'][i],
+                'trip': data['route_coords'][offsets[row]:offsets[row + 1]].tolist(),
+                'timestamp': data['route_timestamps'][offsets[row]:offsets[row + 1]].tolist()
+            }
+            for i, row in enumerate(rows.tolist())
+        ]
+    return read
+
+
+# Write trip.json (viewer export) from the columnar store
+def export_trip_json(folder):
+    read = trip_record_reader(folder)
+    rows = len(load_trip_columns(folder, ['route_offsets'])['route_offsets']) - 1
+    writer = JsonArrayWriter(os.path.join(folder, 'trip.json'))
+
+    for begin in range(0, rows, EXPORT_CHUNK_ROWS):
+        writer.write(read(range(begin, min(begin + EXPORT_CHUNK_ROWS, rows))))
+    writer.close()
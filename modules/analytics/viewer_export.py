@@ -0,0 +1,138 @@
+import os
+import json
+import shutil
+import numpy as np
+
+from .run_reader import RunReader
+from .trip_store import trip_record_reader
+
+
+# Chunk folder and manifest of the viewer export (inside the viewer's data folder)
+VIEWER_CHUNKS_DIR = 'chunks'
+VIEWER_MANIFEST = 'manifest.json'
+
+# Trail length of the viewer's TripsLayer in minutes (trips that ended this long
+# before a window are kept in it so their trails do not vanish at the boundary)
+VIEWER_TRAIL_MINUTES = 12
+
+# Chunked result files and their RunReader tables
+VIEWER_TABLES = {'trip': 'trips', 'vehicle_marker': 'vehicles', 'passenger_marker': 'passengers'}
+
+# Typed arrays of the binary format: numpy dtype -> JavaScript typed array
+VIEWER_TYPED_ARRAYS = {'float32': 'Float32Array', 'int32': 'Int32Array', 'uint32': 'Uint32Array', 'uint8': 'Uint8Array'}
+
+
+# Split the trips and markers of a result folder into fixed time windows for the viewer
+# Chunk k ('chunks/<file>_<k>.json') holds the records active in
+# [start + k * window, start + (k + 1) * window), found through the interval indexes;
+# manifest.json lists the windows so the viewer only loads the one being played.
+# view_format 'binary' writes 'chunks/<file>_<k>.bin' typed-array buffers instead
+# (see _trip_buffers/_marker_buffers; their layout is stored in the manifest).
+# window None writes a single chunk.
+def export_viewer_chunks(save_path, target_dir, window=10, view_format='json'):
+    run = RunReader(save_path)
+    indexes = {name: run.interval_index(table) for name, table in VIEWER_TABLES.items()}
+
+    spans = [(index.start.min(), index.end.max()) for index in indexes.values() if len(index.start)]
+    first = min(s for s, _ in spans) if spans else 0.0
+    end = float(max(e for _, e in spans)) if spans else 0.0
+    if window:
+        start = float(np.floor(first / window) * window)
+    else:
+        start = float(np.floor(first))
+        window = float(np.floor(end) - start + 1)
+    chunk_num = int((end - start) // window) + 1 if spans else 0
+
+    chunk_dir = os.path.join(target_dir, VIEWER_CHUNKS_DIR)
+    if os.path.isdir(chunk_dir):
+        shutil.rmtree(chunk_dir)
+    os.makedirs(chunk_dir)
+
+    records = {'trip': trip_record_reader(save_path) if run.rows('trips') else None}
+    for name in ([] if view_format == 'binary' else ['vehicle_marker', 'passenger_marker']):
+        markers = []
+        if os.path.isfile(os.path.join(save_path, f'{name}.json')):
+            with open(os.path.join(save_path, f'{name}.json'), 'r') as f:
+                markers = json.load(f)
+        records[name] = lambda rows, markers=markers: [markers[row] for row in rows]
+
+    chunks = []
+    for k in range(chunk_num):
+        window_start = start + k * window
+        chunk = {'start': window_start, 'end': window_start + window, 'counts': {}}
+        for name, index in indexes.items():
+            lookback = VIEWER_TRAIL_MINUTES if name == 'trip' else 0
+            rows = index.overlapping(window_start - lookback, window_start + window)
+            chunk['counts'][name] = len(rows)
+
+            if view_format == 'binary':
+                if name == 'trip':
+                    buffers = _trip_buffers(run, rows, records['trip'])
+                else:
+                    buffers = _marker_buffers(run, VIEWER_TABLES[name], rows)
+                chunk.setdefault('buffers', {})[name] = _write_buffers(os.path.join(chunk_dir, f'{name}_{k}.bin'), buffers)
+            else:
+                with open(os.path.join(chunk_dir, f'{name}_{k}.json'), 'w') as f:
+                    json.dump(records[name](rows) if len(rows) else [], f)
+        chunks.append(chunk)
+
+    manifest = {'format': view_format, 'start': start, 'end': end, 'window': window,
+                'trail': VIEWER_TRAIL_MINUTES, 'chunks': chunks}
+    with open(os.path.join(target_dir, VIEWER_MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+# Remove the chunked export (the viewer then loads the full files)
+def remove_viewer_chunks(target_dir):
+    if os.path.isdir(os.path.join(target_dir, VIEWER_CHUNKS_DIR)):
+        shutil.rmtree(os.path.join(target_dir, VIEWER_CHUNKS_DIR))
+    if os.path.isfile(os.path.join(target_dir, VIEWER_MANIFEST)):
+        os.remove(os.path.join(target_dir, VIEWER_MANIFEST))
+
+
+# Binary trip chunk in the layout of deck.gl's binary TripsLayer data
+# start_indices[i]:start_indices[i+1] are the points of trip i in positions
+# ([lon, lat] Float32) and timestamps (Float32 minutes); ids and board per trip.
+def _trip_buffers(run, rows, read):
+    trips = read(rows) if len(rows) else []
+    lengths = [len(trip['trip']) for trip in trips]
+    scalars = run.columns('trips', ['vehicle_id', 'passenger_id', 'cartype', 'board'])
+
+    return {
+        'start_indices': np.concatenate([[0], np.cumsum(lengths, dtype='int64')]).astype('uint32'),
+        'positions': np.asarray([point for trip in trips for point in trip['trip']], dtype='float32').reshape(-1),
+        'timestamps': np.asarray([t for trip in trips for t in trip['timestamp']], dtype='float32'),
+        'vehicle_id': _int_ids(scalars['vehicle_id'][rows]),
+        'passenger_id': _int_ids(scalars['passenger_id'][rows]),
+        'cartype': scalars['cartype'][rows].astype('uint8'),
+        'board': scalars['board'][rows].astype('uint8'),
+    }
+
+
+# Int32 ids (-1 for missing ids)
+def _int_ids(values):
+    return np.where(np.isfinite(values), values, -1).astype('int32')
+
+
+# Binary marker chunk: positions ([lon, lat] Float32) and Float32 start/end times
+def _marker_buffers(run, table, rows):
+    columns = run.columns(table, ['lon', 'lat', 'start_time', 'end_time'])
+    return {
+        'positions': np.stack([columns['lon'][rows], columns['lat'][rows]], axis=1).astype('float32').reshape(-1),
+        'start_time': columns['start_time'][rows].astype('float32'),
+        'end_time': columns['end_time'][rows].astype('float32'),
+    }
+
+
+# Write little-endian typed arrays back to back (4-byte aligned) and return their
+# layout {name: {'type', 'offset', 'length'}} for the viewer
+def _write_buffers(file_path, buffers):
+    layout = {}
+    with open(file_path, 'wb') as f:
+        for name, values in buffers.items():
+            padding = -f.tell() % 4
+            f.write(b'\0' * padding)
+            layout[name] = {'type': VIEWER_TYPED_ARRAYS[values.dtype.name], 'offset': f.tell(), 'length': len(values)}
+            f.write(values.astype(values.dtype.newbyteorder('<')).tobytes())
+    return layout
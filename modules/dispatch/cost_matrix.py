@@ -2,7 +2,7 @@ import numpy as np
 import pandas as pd 
 from multiprocess import Pool
 
-from modules.routing.osrm_client import osrm_routing_machine
+from modules.routing.osrm_client import routing_client
 from modules.utils.distance_utils import calculate_straight_distance
 
 
@@ -13,8 +13,8 @@ def cost_matrix_data_prepare(passenger, vehicle, simul_configs):
         pass
     else:
         # Extract coordinates for distance calculations
-        passenger = passenger[['ride_lat', 'ride_lon']].values.tolist()
-        vehicle = vehicle[['lat', 'lon']].values.tolist()
+        passenger = np.column_stack([passenger['ride_lat'], passenger['ride_lon']]).tolist()
+        vehicle = np.column_stack([vehicle['lat'], vehicle['lon']]).tolist()
     return passenger, vehicle
 
 
@@ -23,9 +23,9 @@ def eta_cost_matrix(active_passenger, empty_vehicle, time, simul_configs):
     YMD = simul_configs['YMD']
     eta_model = simul_configs['eta_model']
     
-    # Extract time features
-    target_minute = time % 60
-    target_hour = time // 60
+    # Extract time features (sub-minute ticks use the current minute)
+    target_minute = int(time) % 60
+    target_hour = int(time) // 60
     target_weekday = YMD.weekday()
     target_holiday = 1 if target_weekday >= 5 else 0
 
@@ -72,11 +72,10 @@ def eta_cost_matrix(active_passenger, empty_vehicle, time, simul_configs):
     )
     
     # Get OSRM distances
-    osrm_rs = [
-        osrm_routing_machine([row['ride_lat'], row['ride_lon'], 
-                            row['alight_lat'], row['alight_lon']])
-        for _, row in eta_inputData_for_cost_matrix.iterrows()
-    ]
+    client = routing_client(simul_configs)
+    osrm_rs = client.route_many(
+        eta_inputData_for_cost_matrix[['ride_lat', 'ride_lon', 'alight_lat', 'alight_lon']].values.tolist()
+    )
     
     eta_inputData_for_cost_matrix['osrm_distance'] = [
         rs['distance'] / 1000 if rs is not None else 0.5 
@@ -96,6 +95,13 @@ def eta_cost_matrix(active_passenger, empty_vehicle, time, simul_configs):
     return eta_model_cost_matrix
 
 
+# Street distance matrix in km (passengers x vehicles) from the OSRM table service,
+# routed from each vehicle to each passenger
+def street_distance_table(active_passenger, empty_vehicle, client, simul_configs):
+    distances = client.table(empty_vehicle, active_passenger, simul_configs.get('osrm_table_size', 100))
+    return distances.T / 1000
+
+
 # Calculate dispatch cost matrix based on configuration
 def dispatch_cost_matrix(active_passenger, empty_vehicle, time, simul_configs):
     
@@ -111,6 +117,7 @@ def dispatch_cost_matrix(active_passenger, empty_vehicle, time, simul_configs):
         
     matrix_mode = simul_configs['matrix_mode']
     dispatch_mode = simul_configs['dispatch_mode']
+    client = routing_client(simul_configs)
     
     # Prepare data
     active_passenger, empty_vehicle = cost_matrix_data_prepare(
@@ -127,6 +134,12 @@ def dispatch_cost_matrix(active_passenger, empty_vehicle, time, simul_configs):
             else:
                 cost_matrix = haversine_distance_cost_matrix(empty_vehicle, active_passenger)
         
+        elif matrix_mode == 'street_distance' and simul_configs.get('street_matrix') == 'table':
+            # One table request per dispatch (vehicles to passengers), larger set first
+            cost_matrix = street_distance_table(active_passenger, empty_vehicle, client, simul_configs)
+            if len(active_passenger) < len(empty_vehicle):
+                cost_matrix = cost_matrix.T
+
         elif matrix_mode == 'street_distance':
             # Create all possible combinations
             if len(active_passenger) >= len(empty_vehicle):
@@ -137,8 +150,8 @@ def dispatch_cost_matrix(active_passenger, empty_vehicle, time, simul_configs):
             costs_shape = costs.shape
             costs = costs.reshape(costs_shape[0] * costs_shape[1], costs_shape[2])
             
-            # Sequential processing (Pool removed)
-            cost_matrix = [osrm_routing_machine(cost)['distance'] for cost in costs]
+            # Concurrent routing over the shared client
+            cost_matrix = [rs['distance'] for rs in client.route_many(costs.tolist())]
             
             cost_matrix = np.array(cost_matrix).reshape(costs_shape[0], costs_shape[1])
             cost_matrix = cost_matrix / 1000  # Convert to km
@@ -159,12 +172,15 @@ def dispatch_cost_matrix(active_passenger, empty_vehicle, time, simul_configs):
                 costs[:, 0], costs[:, 1], costs[:, 2], costs[:, 3]
             )
             
+        elif matrix_mode == 'street_distance' and simul_configs.get('street_matrix') == 'table':
+            cost_matrix = street_distance_table(active_passenger[:1], empty_vehicle, client, simul_configs)[0]
+
         elif matrix_mode == 'street_distance':
             active_passenger = active_passenger[0]
             costs = [active_passenger + vehicle for vehicle in empty_vehicle]
             
-            # Sequential processing (Pool removed)
-            cost_matrix = [osrm_routing_machine(cost)['distance'] for cost in costs]
+            # Concurrent routing over the shared client
+            cost_matrix = [rs['distance'] for rs in client.route_many(costs)]
             cost_matrix = np.array(cost_matrix) / 1000  # Convert to km
             
         elif matrix_mode == 'ETA':
@@ -2,13 +2,13 @@ import numpy as np
 import pandas as pd
 import itertools
 from itertools import repeat
-from ortools.linear_solver import pywraplp
 
 from .cost_matrix import dispatch_cost_matrix
 
 
 # Optimization-based dispatch using OR-Tools
 def ortools_dispatch(active_passenger, empty_vehicle, cost_matrix):
+    from ortools.linear_solver import pywraplp  # heavy, imported on use
     
     # Assign larger set as A, smaller as B for optimization
     if len(active_passenger) >= len(empty_vehicle):
@@ -77,32 +77,32 @@ def ortools_dispatch(active_passenger, empty_vehicle, cost_matrix):
 
 # Sequential first-come-first-served dispatch
 def in_order_dispatch(active_ps, empty_vh, time, simul_configs):
-    
-    active_passengers = active_ps.copy()
-    empty_vehicles = empty_vh.copy()
+
+    # Positions (within empty_vh) of vehicles still available
+    remaining_vehicles = np.arange(len(empty_vh))
 
     vehicle_iloc = []
     passenger_iloc = []
     iloc_distance = []
 
     # Process passengers in order
-    for idx, row in active_passengers.iterrows():
-        if len(empty_vehicles) != 0:
+    for idx in range(len(active_ps)):
+        if len(remaining_vehicles) != 0:
             # Prepare single passenger data
-            P_geo = pd.DataFrame(row).T.reset_index(drop=True)
-            V_geo = empty_vehicles
+            P_geo = active_ps.take([idx])
+            V_geo = empty_vh.take(remaining_vehicles)
             
             # Calculate cost matrix for current passenger
             cost_matrix = dispatch_cost_matrix(P_geo, V_geo, time, simul_configs)
             
             # Find closest vehicle
             cost_min_idx = np.argmin(cost_matrix)
-            vehicle_idx = empty_vehicles.iloc[[cost_min_idx]].index[0]
+            vehicle_idx = remaining_vehicles[cost_min_idx]
             
             match_distance = cost_matrix[cost_min_idx]
 
             # Remove matched vehicle from available pool
-            empty_vehicles = empty_vehicles.loc[(empty_vehicles.index != vehicle_idx)]
+            remaining_vehicles = np.delete(remaining_vehicles, cost_min_idx)
             
             # Record match
             vehicle_iloc.append(vehicle_idx)
@@ -113,4 +113,4 @@ def in_order_dispatch(active_ps, empty_vh, time, simul_configs):
         
     dispatch_inf = {'vehicle': vehicle_iloc, 'passenger': passenger_iloc, 'distance': iloc_distance} 
     
-    return dispatch_inf
\ No newline at end of file
+    return dispatch_inf
@@ -4,9 +4,11 @@ import pandas as pd
 import numpy as np 
 from multiprocess import Pool
 
-from modules.routing.osrm_client import osrm_routing_machine
+from modules.routing.osrm_client import routing_client
+from modules.routing.route_geometry import route_output
+from modules.routing.route_prefetch import route_prefetch
 from modules.utils.distance_utils import calculate_straight_distance
-from modules.engine.io_manager import save_json_data
+from modules.engine.io_manager import save_json_data, save_events, vehicle_markers
 from modules.dispatch.cost_matrix import dispatch_cost_matrix
 from modules.dispatch.dispatch_algorithms import in_order_dispatch, ortools_dispatch
 
@@ -16,9 +18,9 @@ def change_travel_time_to_eta_result(data, time, simul_configs):
     YMD = simul_configs['YMD']
     eta_model = simul_configs['eta_model']
 
-    # Extract time features
-    target_minute = time % 60
-    target_hour = time // 60
+    # Extract time features (sub-minute ticks use the current minute)
+    target_minute = int(time) % 60
+    target_hour = int(time) // 60
 
     target_weekday = YMD.weekday()
     target_holiday = 1 if target_weekday >= 5 else 0
@@ -55,11 +57,8 @@ def change_travel_time_to_eta_result(data, time, simul_configs):
         eta_inputData['alight_lon'].values
     )
         
-        osrm_rs = [
-            osrm_routing_machine([row['ride_lat'], row['ride_lon'], 
-                                 row['alight_lat'], row['alight_lon']])
-            for _, row in eta_inputData.iterrows()
-        ]
+        client = routing_client(simul_configs)
+        osrm_rs = client.route_many(eta_inputData[['ride_lat', 'ride_lon', 'alight_lat', 'alight_lon']].values.tolist())
         
         eta_inputData['osrm_distance'] = [
             rs['distance'] / 1000 if rs is not None else 0.5 
@@ -75,14 +74,23 @@ def change_travel_time_to_eta_result(data, time, simul_configs):
 
 
 # Process active vehicles and save trip/marker information
-def address_current_active_vehicle(current_active_vehicle, time, save_path, simul_configs):
+def address_current_active_vehicle(state, vehicle_slots, time, save_path, simul_configs):
+    current_active_vehicle = state.vehicles.view(vehicle_slots)
+
     # Extract origin and destination coordinates
-    O = current_active_vehicle[['lat', 'lon', 'P_ride_lat', 'P_ride_lon']].values
-    D = current_active_vehicle[['P_ride_lat', 'P_ride_lon', 'P_alight_lat', 'P_alight_lon']].values
+    O = np.column_stack([current_active_vehicle[col] for col in ['lat', 'lon', 'P_ride_lat', 'P_ride_lon']])
+    D = np.column_stack([current_active_vehicle[col] for col in ['P_ride_lat', 'P_ride_lon', 'P_alight_lat', 'P_alight_lon']])
     
-    # Get OSRM routing results (sequential processing)
-    routing_result_O = [osrm_routing_machine(o) for o in O]
-    routing_result_D = [osrm_routing_machine(d) for d in D]
+    # Get OSRM routing results (O legs and the D legs that were not prefetched,
+    # concurrently over the shared client)
+    client = routing_client(simul_configs)
+    prefetch = route_prefetch(save_path)
+    routing_result_D = prefetch.take(current_active_vehicle['P_ID'].tolist(), D.tolist()) if prefetch else [None] * len(D)
+    missing = [idx for idx, d in enumerate(routing_result_D) if d is None]
+    routing_result = client.route_many(O.tolist() + D[missing].tolist())
+    routing_result_O = routing_result[:len(O)]
+    for idx, d in zip(missing, routing_result[len(O):]):
+        routing_result_D[idx] = d
 
     # Apply ETA model if available
     if simul_configs['eta_model'] is not None: 
@@ -107,88 +115,89 @@ def address_current_active_vehicle(current_active_vehicle, time, save_path, simu
         ).tolist()
     
     # Update disembark time
-    current_active_vehicle['P_disembark_time'] = [
+    disembark_time = np.array([
         time + o['timestamp'][-1] + d['timestamp'][-1] 
         for o, d in zip(routing_result_O, routing_result_D)
-    ]
-    current_active_vehicle['P_disembark_time'] += simul_configs['add_disembark_time']
+    ])
+    state.vehicles['P_disembark_time'][vehicle_slots] = disembark_time + simul_configs['add_disembark_time']
     
-    # Save vehicle marker data
-    vehicle_marker_inf = current_active_vehicle[
-        current_active_vehicle['temporary_stopTime'] != time
-    ]
-    vehicle_marker_inf = vehicle_marker_inf[
-        ~vehicle_marker_inf['temporary_stopTime'].isna()
-    ].reset_index(drop=True)
+    # Save vehicle marker data (idle period that ends with this dispatch)
+    stop_time = current_active_vehicle['temporary_stopTime']
+    marker_slots = current_active_vehicle.slots[(stop_time != time) & ~np.isnan(stop_time)]
     
-    if len(vehicle_marker_inf) >= 1:
-        vehicle_marker_inf = [
-            {
-                'vehicle_id': row['vehicle_id'], 
-                'cartype': row['cartype'],
-                'location': [row['lon'], row['lat']], 
-                'timestamp': [row['temporary_stopTime'], time]
-            }
-            for _, row in vehicle_marker_inf.iterrows()
-        ]
-        save_json_data(vehicle_marker_inf, save_path=save_path, file_name='vehicle_marker')
-    del vehicle_marker_inf
+    if len(marker_slots) >= 1:
+        save_json_data(vehicle_markers(state, marker_slots, time), save_path=save_path, file_name='vehicle_marker')
 
     # Save passenger marker data
-    passenger_marker_inf = current_active_vehicle[['P_ID', 'P_ride_lat', 'P_ride_lon', 'P_request_time']]
-    passenger_marker_inf['P_ride_time'] = [o['timestamp'][-1] + time for o in routing_result_O]
-    
-    if len(passenger_marker_inf) >= 1:
-        passenger_marker_inf = [
-            {
-                'passenger_id': row['P_ID'], 
-                'status': 1,
-                'location': [row['P_ride_lon'], row['P_ride_lat']],
-                'timestamp': [row['P_request_time'], row['P_ride_time']]
-            }
-            for _, row in passenger_marker_inf.iterrows()
-        ]
-        save_json_data(passenger_marker_inf, save_path=save_path, file_name='passenger_marker')
+    passenger_marker_inf = [
+        {
+            'passenger_id': p_id, 
+            'status': 1,
+            'location': [ride_lon, ride_lat],
+            'timestamp': [request_time, o['timestamp'][-1] + time]
+        }
+        for p_id, ride_lon, ride_lat, request_time, o in zip(
+            current_active_vehicle['P_ID'].astype(float).tolist(),
+            current_active_vehicle['P_ride_lon'].tolist(),
+            current_active_vehicle['P_ride_lat'].tolist(),
+            current_active_vehicle['P_request_time'].astype(float).tolist(),
+            routing_result_O
+        )
+    ]
+    save_json_data(passenger_marker_inf, save_path=save_path, file_name='passenger_marker')
     del passenger_marker_inf
 
     # Save trip data
-    O_route = [o['route'] for o in routing_result_O]
-    D_route = [d['route'] for d in routing_result_D]
     O_timestamp = [list(np.array(o['timestamp']) + time) for o in routing_result_O]
     D_timestamp = [
         list(np.array(d['timestamp']) + o_timestamp[-1]) 
         for d, o_timestamp in zip(routing_result_D, O_timestamp)
     ]
 
-    trip_inf = current_active_vehicle[['vehicle_id', 'P_ID', 'cartype']]
-    trip_inf['O_route'] = O_route
-    trip_inf['D_route'] = D_route
-    trip_inf['O_timestamp'] = O_timestamp
-    trip_inf['D_timestamp'] = D_timestamp
+    # Log the dispatch with its pickup and drop-off (legs as in the trip records)
+    ids = {'vehicle_id': current_active_vehicle['vehicle_id'], 'cartype': current_active_vehicle['cartype'],
+           'passenger_id': current_active_vehicle['P_ID']}
+    save_events(simul_configs, 'dispatch', time, time=[ts[0] for ts in O_timestamp], since=stop_time,
+                lon=current_active_vehicle['lon'], lat=current_active_vehicle['lat'], **ids)
+    save_events(simul_configs, 'pickup', time, time=[ts[-1] for ts in O_timestamp],
+                since=current_active_vehicle['P_request_time'],
+                lon=current_active_vehicle['P_ride_lon'], lat=current_active_vehicle['P_ride_lat'], **ids)
+    save_events(simul_configs, 'dropoff', time, time=[ts[-1] for ts in D_timestamp], since=[ts[0] for ts in D_timestamp],
+                lon=current_active_vehicle['P_alight_lon'], lat=current_active_vehicle['P_alight_lat'], **ids)
+
+    trip_keys = list(zip(
+        current_active_vehicle['vehicle_id'].tolist(),
+        current_active_vehicle['cartype'].tolist(),
+        current_active_vehicle['P_ID'].tolist()
+    ))
+
+    # Routes in the configured output geometry (full, simplified or polyline)
+    O_output = [route_output(o['route'], o_timestamp, simul_configs) for o, o_timestamp in zip(routing_result_O, O_timestamp)]
+    D_output = [route_output(d['route'], d_timestamp, simul_configs) for d, d_timestamp in zip(routing_result_D, D_timestamp)]
 
     # Create separate trip records for origin and destination
     trip_inf_O = [
         {
-            'vehicle_id': row['vehicle_id'], 
-            'cartype': row['cartype'], 
-            'passenger_id': row['P_ID'], 
+            'vehicle_id': vehicle_id, 
+            'cartype': cartype, 
+            'passenger_id': p_id, 
             'board': 0,
-            'trip': row['O_route'], 
-            'timestamp': row['O_timestamp']
+            'trip': o_route, 
+            'timestamp': o_timestamp
         }
-        for _, row in trip_inf.iterrows()
+        for (vehicle_id, cartype, p_id), (o_route, o_timestamp) in zip(trip_keys, O_output)
     ]
     
     trip_inf_D = [
         {
-            'vehicle_id': row['vehicle_id'], 
-            'cartype': row['cartype'],
-            'passenger_id': row['P_ID'], 
+            'vehicle_id': vehicle_id, 
+            'cartype': cartype,
+            'passenger_id': p_id, 
             'board': 1,
-            'trip': row['D_route'], 
-            'timestamp': row['D_timestamp']
+            'trip': d_route, 
+            'timestamp': d_timestamp
         }
-        for _, row in trip_inf.iterrows()
+        for (vehicle_id, cartype, p_id), (d_route, d_timestamp) in zip(trip_keys, D_output)
     ]
 
     trip_inf = []
@@ -197,12 +206,16 @@ def address_current_active_vehicle(current_active_vehicle, time, save_path, simu
 
     save_json_data(trip_inf, save_path=save_path, file_name='trip')
     del trip_inf, trip_inf_O, trip_inf_D
-    
-    return current_active_vehicle
 
 
 # Select dispatch method and match passengers with vehicles
-def select_dispatch_method(requested_passenger, empty_vehicle, simul_configs, time):
+def select_dispatch_method(state, simul_configs, time):
+    passenger_slots = state.waiting.slots()
+    vehicle_slots = state.idle.slots()
+
+    requested_passenger = state.passengers.view(passenger_slots)
+    empty_vehicle = state.vehicles.view(vehicle_slots)
+
     # Use optimization or in-order dispatch based on configuration
     if simul_configs['dispatch_mode'] == 'optimization':
         cost_matrix = dispatch_cost_matrix(
@@ -222,59 +235,24 @@ def select_dispatch_method(requested_passenger, empty_vehicle, simul_configs, ti
             simul_configs
         )
 
-    # Extract matched vehicles and passengers
-    dispatch_result_vehicle = empty_vehicle.iloc[dispatch_result['vehicle']][
-        ['vehicle_id', 'cartype', 'work_end', 'temporary_stopTime', 'lat', 'lon']
-    ].reset_index(drop=True)
-    
-    dispatch_result_passenger = requested_passenger.iloc[dispatch_result['passenger']][
-        ['ID', 'ride_lat', 'ride_lon', 'alight_lat', 'alight_lon', 'ride_time', 'dispatch_time']
-    ].reset_index(drop=True)
-
-    # Merge matched data
-    current_active_vehicle = pd.concat([dispatch_result_vehicle, dispatch_result_passenger], axis=1)
-    current_active_vehicle = current_active_vehicle.rename(columns={
-        'ID': 'P_ID', 
-        'ride_lat': 'P_ride_lat',
-        'ride_lon': 'P_ride_lon',
-        'alight_lat': 'P_alight_lat', 
-        'alight_lon': 'P_alight_lon', 
-        'ride_time': 'P_request_time'
-    })
-    current_active_vehicle['P_disembark_time'] = 0
-
-    # Update remaining unmatched vehicles and passengers
-    empty_vehicle = empty_vehicle.iloc[
-        list(set(empty_vehicle.index) - set(dispatch_result['vehicle']))
-    ].reset_index(drop=True)
-    
-    requested_passenger = requested_passenger.iloc[
-        list(set(requested_passenger.index) - set(dispatch_result['passenger']))
-    ].reset_index(drop=True)
+    # Map matched positions back to state slots
+    matched_passenger = passenger_slots[np.asarray(dispatch_result['passenger'], dtype=np.int64)]
+    matched_vehicle = vehicle_slots[np.asarray(dispatch_result['vehicle'], dtype=np.int64)]
 
-    return requested_passenger, empty_vehicle, current_active_vehicle        
+    return matched_passenger, matched_vehicle
 
 
 # Main dispatch coordination function
-def dispatch_main(requested_passenger, active_vehicle, empty_vehicle, simul_configs, time):
+def dispatch_main(state, simul_configs, time):
     save_path = simul_configs['save_path']
-    
-    # Reset indices for clean processing
-    requested_passenger = requested_passenger.reset_index(drop=True)
-    empty_vehicle = empty_vehicle.reset_index(drop=True)
 
     # Perform dispatch when both passengers and vehicles are available
-    if (len(requested_passenger) > 0) and (len(empty_vehicle) > 0):
-        requested_passenger, empty_vehicle, current_active_vehicle = select_dispatch_method(
-            requested_passenger, empty_vehicle, simul_configs, time
-        )
+    if (len(state.waiting) > 0) and (len(state.idle) > 0):
+        matched_passenger, matched_vehicle = select_dispatch_method(state, simul_configs, time)
 
         # Process matched vehicles and save trip data
-        if len(current_active_vehicle) >= 1:
-            current_active_vehicle = address_current_active_vehicle(
-                current_active_vehicle, time, save_path, simul_configs
-            )
-            active_vehicle = pd.concat([active_vehicle, current_active_vehicle])
-        
-    active_vehicle = active_vehicle.reset_index(drop=True)
-    return requested_passenger, active_vehicle, empty_vehicle
\ No newline at end of file
+        if len(matched_vehicle) >= 1:
+            tick = state.clock.tick(time)
+            state.assign(matched_passenger, matched_vehicle, tick)
+            address_current_active_vehicle(state, matched_vehicle, time, save_path, simul_configs)
+            state.schedule_dropoff(matched_vehicle, tick)
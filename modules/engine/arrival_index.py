@@ -0,0 +1,42 @@
+import numpy as np
+
+
+# Tick-indexed arrival index over static agent data
+# Rows are sorted once by their arrival tick; each tick's arrivals are a
+# contiguous slice [starts[tick], ends[tick]) of the sorted column arrays.
+# A row arrives at the first tick at or after its arrival time.
+class ArrivalIndex:
+
+    def __init__(self, data, time_column, columns, clock):
+        self.clock = clock
+
+        arrival_tick = clock.ticks_at_or_after(data[time_column].to_numpy(dtype=np.float64))
+        order = np.argsort(arrival_tick, kind='stable')
+        self.arrival_tick = arrival_tick[order]
+        self.columns = {name: data[name].to_numpy()[order] for name in columns if name in data.columns}
+
+        ticks = np.arange(clock.n_ticks)
+        self.starts = np.searchsorted(self.arrival_tick, ticks, side='left')
+        self.ends = np.searchsorted(self.arrival_tick, ticks, side='right')
+
+        # Ticks that have at least one arrival
+        self.arrival_ticks = np.flatnonzero(self.ends > self.starts)
+
+    def __len__(self):
+        return len(self.arrival_tick)
+
+    # Number of rows arriving at the given tick
+    def count(self, tick):
+        return int(self.ends[tick] - self.starts[tick])
+
+    # Column slices (views) of rows arriving at the given tick
+    def arrivals(self, tick):
+        rows = slice(self.starts[tick], self.ends[tick])
+        return {name: column[rows] for name, column in self.columns.items()}
+
+    # First tick at or after the given tick with arrivals (None if there is none)
+    def next_arrival(self, tick):
+        idx = np.searchsorted(self.arrival_ticks, tick, side='left')
+        if idx == len(self.arrival_ticks):
+            return None
+        return int(self.arrival_ticks[idx])
@@ -0,0 +1,259 @@
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from .clock import SimulationClock
+from .state_store import WAITING, IDLE, ACTIVE
+from .io_manager import generate_path_to_save
+from ..preprocess.data_preprocessor import perturb_data, has_jitter
+from ..utils.distance_utils import calculate_straight_distance
+
+
+# Agent status codes of the batch engine (WAITING, IDLE and ACTIVE as in the state store)
+PENDING = 0   # not arrived yet (or outside the time range)
+SERVED = 4
+FAILED = 5
+RETIRED = 6
+
+# Ordering keys of the idle pool: vehicles joining in a tick are ordered by
+# (tick, starters before drop-offs, data row or dispatch order)
+KEY_SHIFT = np.int64(1) << 40
+
+
+# R independent replications advanced in lockstep (in_order dispatch, haversine mode)
+# Every agent array carries a leading replication axis, so arrivals, timeouts,
+# drop-offs, shift ends and nearest-vehicle matching are batched NumPy operations.
+# Replication r draws its inputs like run_replications with seed random_seed + r
+# (demand, shift and placement jitter, at least one of which must be set for more
+# than one replication). Routes are straight lines driven at 'straight_line_speed'
+# km/h instead of OSRM routes, so no routing server is involved; the tick order
+# follows Simulator.step.
+class BatchSimulator:
+
+    def __init__(self, passengers, vehicles, configs, n_replications, seeds=None):
+        if configs['dispatch_mode'] != 'in_order' or configs['matrix_mode'] != 'haversine_distance':
+            raise ValueError("BatchSimulator supports dispatch_mode 'in_order' with matrix_mode 'haversine_distance'")
+        if n_replications > 1 and not has_jitter(configs):
+            raise ValueError("Please set 'demand_jitter', 'shift_jitter' or 'placement_jitter' (replications would be identical)")
+
+        self.configs = configs
+        if seeds is None:
+            base_seed = configs.get('random_seed') or 0
+            seeds = [base_seed + r for r in range(n_replications)]
+        if len(seeds) != n_replications:
+            raise ValueError("Please input one seed per replication")
+        self.seeds = list(seeds)
+        self.R = n_replications
+
+        self.clock = SimulationClock(configs['time_range'], configs.get('tick_size', 1))
+        self.configs['save_path'] = generate_path_to_save(configs['path'], configs['additional_path'])
+
+        self._load_passengers(passengers, vehicles)
+        self._load_vehicles()
+
+        n_minutes = self.clock.end - self.clock.start
+        self.record = {
+            name: np.zeros((self.R, n_minutes), dtype=np.int64)
+            for name in ['waiting_passenger_cnt', 'fail_passenger_cnt', 'empty_vehicle_cnt', 'driving_vehicle_cnt']
+        }
+        self.fail_count = np.zeros(self.R, dtype=np.int64)
+        self.served_count = np.zeros(self.R, dtype=np.int64)
+        self.wait_sum = np.zeros(self.R, dtype=np.float64)
+
+    # Per-replication inputs stacked along the replication axis
+    def _load_passengers(self, passengers, vehicles):
+        clock, fail_time = self.clock, self.configs['fail_time']
+
+        ride_time, vehicle_inputs = [], []
+        for seed in self.seeds:
+            p, v = perturb_data(passengers, vehicles, self.configs, seed)
+            ride_time.append(p['ride_time'].to_numpy(dtype=np.float64))
+            vehicle_inputs.append(v)
+        ride_time = np.stack(ride_time)
+        self._vehicle_inputs = vehicle_inputs
+
+        # Keep the rows requested inside the time range in at least one replication
+        in_range = (ride_time >= clock.start) & (ride_time < clock.end)
+        rows = np.flatnonzero(in_range.any(axis=0))
+        ride_time, in_range = ride_time[:, rows], in_range[:, rows]
+        data = passengers.iloc[rows]
+
+        self.p_ride_lat = data['ride_lat'].to_numpy(dtype=np.float64)
+        self.p_ride_lon = data['ride_lon'].to_numpy(dtype=np.float64)
+        self.p_alight_lat = data['alight_lat'].to_numpy(dtype=np.float64)
+        self.p_alight_lon = data['alight_lon'].to_numpy(dtype=np.float64)
+        self.p_ride_time = ride_time
+
+        # Arrival tick (n_ticks: never arrives) and timeout tick
+        self.p_arrival = np.where(in_range, clock.ticks_at_or_after(ride_time), clock.n_ticks)
+        fail_at = ride_time + fail_time - data['dispatch_time'].to_numpy(dtype=np.float64)
+        self.p_timeout = np.maximum(clock.ticks_at_or_after(fail_at), self.p_arrival + 1)
+
+        # Request order of each replication (arrival tick, then data row)
+        self.p_order = np.argsort(self.p_arrival, axis=1, kind='stable')
+        self.p_status = np.full(self.p_arrival.shape, PENDING, dtype=np.int8)
+
+    def _load_vehicles(self):
+        clock = self.clock
+        work_start = np.stack([v['work_start'].to_numpy(dtype=np.float64) for v in self._vehicle_inputs])
+        work_end = np.stack([v['work_end'].to_numpy(dtype=np.float64) for v in self._vehicle_inputs])
+        self.v_lat = np.stack([v['lat'].to_numpy(dtype=np.float64) for v in self._vehicle_inputs])
+        self.v_lon = np.stack([v['lon'].to_numpy(dtype=np.float64) for v in self._vehicle_inputs])
+        del self._vehicle_inputs
+
+        # Same cropping as crop_data_by_timerange
+        working = work_end > clock.start
+        work_start = np.maximum(work_start, clock.start)
+        work_end = np.minimum(work_end, clock.end)
+
+        self.v_start = np.where(working, clock.ticks_at_or_after(work_start), clock.n_ticks)
+        self.v_end_base = clock.ticks_after(work_end - 5)
+        self.v_shift_end = np.zeros_like(self.v_start)
+        self.v_dropoff = np.zeros_like(self.v_start)
+        self.v_alight_lat = np.zeros_like(self.v_lat)
+        self.v_alight_lon = np.zeros_like(self.v_lon)
+        self.v_status = np.full(self.v_start.shape, PENDING, dtype=np.int8)
+        self.v_idle_key = np.zeros(self.v_start.shape, dtype=np.int64)
+        self.v_dispatch_seq = np.zeros(self.v_start.shape, dtype=np.int64)
+        self.v_trips = np.zeros(self.v_start.shape, dtype=np.int64)
+        self.dispatch_count = np.zeros(self.R, dtype=np.int64)
+
+    # Advance every replication by one tick
+    def step(self, tick):
+        time = self.clock.time(tick)
+
+        # Passengers: timeouts, then new requests
+        timed_out = (self.p_status == WAITING) & (self.p_timeout <= tick)
+        self.p_status[timed_out] = FAILED
+        self.fail_count += timed_out.sum(axis=1)
+        self.p_status[(self.p_status == PENDING) & (self.p_arrival == tick)] = WAITING
+
+        # Vehicles: shift starts, drop-offs, then shift ends of idle vehicles
+        starting = (self.v_status == PENDING) & (self.v_start == tick)
+        self._make_idle(starting, tick, np.arange(self.v_start.shape[1]), phase=0)
+
+        dropped = (self.v_status == ACTIVE) & (self.v_dropoff <= tick)
+        self.v_lat[dropped] = self.v_alight_lat[dropped]
+        self.v_lon[dropped] = self.v_alight_lon[dropped]
+        self._make_idle(dropped, tick, self.v_dispatch_seq, phase=1)
+
+        ending = (self.v_status == IDLE) & (self.v_shift_end <= tick)
+        self.v_status[ending] = RETIRED
+
+        self.dispatch(tick, time)
+
+        # Record (last tick of each minute wins)
+        row = self.clock.minute(tick) - self.clock.start
+        self.record['waiting_passenger_cnt'][:, row] = (self.p_status == WAITING).sum(axis=1)
+        self.record['fail_passenger_cnt'][:, row] = self.fail_count
+        self.record['empty_vehicle_cnt'][:, row] = (self.v_status == IDLE).sum(axis=1)
+        self.record['driving_vehicle_cnt'][:, row] = (self.v_status == ACTIVE).sum(axis=1)
+
+    # Move vehicles to the idle pool, ordered after every vehicle that joined before
+    def _make_idle(self, mask, tick, order, phase):
+        if not mask.any():
+            return
+        self.v_status[mask] = IDLE
+        self.v_idle_key[mask] = (np.int64(tick) * 2 + phase) * KEY_SHIFT + np.broadcast_to(order, mask.shape)[mask]
+        self.v_shift_end[mask] = np.maximum(self.v_end_base[mask], tick)
+
+    # Sequential first-come-first-served dispatch, batched over replications
+    def dispatch(self, tick, time):
+        waiting = self.p_status == WAITING
+        idle = self.v_status == IDLE
+        matches = np.minimum(waiting.sum(axis=1), idle.sum(axis=1))
+        max_matches = int(matches.max())
+        if max_matches == 0:
+            return
+
+        # Waiting passengers of each replication in request order
+        in_order = np.take_along_axis(waiting, self.p_order, axis=1)
+        queue = np.take_along_axis(self.p_order, np.argsort(~in_order, axis=1, kind='stable'), axis=1)
+
+        available = idle.copy()
+        for k in range(max_matches):
+            reps = np.flatnonzero(matches > k)
+            p_idx = queue[reps, k]
+
+            # Closest available vehicle (earliest idle vehicle on ties)
+            distance = calculate_straight_distance(
+                self.p_ride_lat[p_idx][:, None], self.p_ride_lon[p_idx][:, None],
+                self.v_lat[reps], self.v_lon[reps]
+            )
+            distance[~available[reps]] = np.inf
+            nearest = distance == distance.min(axis=1, keepdims=True)
+            v_idx = np.where(nearest, self.v_idle_key[reps], np.iinfo(np.int64).max).argmin(axis=1)
+            available[reps, v_idx] = False
+
+            self._assign(reps, p_idx, v_idx, tick, time)
+
+    # Drive matched vehicles to their passenger and on to the destination
+    def _assign(self, reps, p_idx, v_idx, tick, time):
+        speed = self.configs['straight_line_speed'] * 1000 / 60  # m/min
+        to_pickup = calculate_straight_distance(
+            self.v_lat[reps, v_idx], self.v_lon[reps, v_idx], self.p_ride_lat[p_idx], self.p_ride_lon[p_idx]
+        ) * 1000 / speed
+        to_alight = calculate_straight_distance(
+            self.p_ride_lat[p_idx], self.p_ride_lon[p_idx], self.p_alight_lat[p_idx], self.p_alight_lon[p_idx]
+        ) * 1000 / speed
+
+        disembark_time = (time + to_pickup + to_alight
+                          + self.configs['add_board_time'] + self.configs['add_disembark_time'])
+
+        self.p_status[reps, p_idx] = SERVED
+        self.served_count[reps] += 1
+        self.wait_sum[reps] += time + to_pickup - self.p_ride_time[reps, p_idx]
+
+        self.v_status[reps, v_idx] = ACTIVE
+        self.v_dispatch_seq[reps, v_idx] = self.dispatch_count[reps]
+        self.dispatch_count[reps] += 1
+        self.v_trips[reps, v_idx] += 1
+        self.v_alight_lat[reps, v_idx] = self.p_alight_lat[p_idx]
+        self.v_alight_lon[reps, v_idx] = self.p_alight_lon[p_idx]
+        self.v_dropoff[reps, v_idx] = np.maximum(self.clock.ticks_at_or_after(disembark_time), tick + 1)
+
+    # Per-minute records of every replication (long format)
+    def records(self):
+        minutes = np.arange(self.clock.start, self.clock.end)
+        frames = []
+        for r, seed in enumerate(self.seeds):
+            frame = pd.DataFrame({'time': minutes, **{name: values[r] for name, values in self.record.items()}})
+            frame.insert(0, 'seed', seed)
+            frame.insert(0, 'replication', r)
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    # Summary statistics of every replication (columns of the sweep summary)
+    def summary(self):
+        total_calls = self.served_count + self.fail_count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            failure_rate = np.where(total_calls > 0, self.fail_count / total_calls * 100, 0.0)
+            mean_wait = np.where(self.served_count > 0, self.wait_sum / self.served_count, 0.0)
+
+        return pd.DataFrame({
+            'replication': np.arange(self.R),
+            'seed': self.seeds,
+            'total_calls': total_calls,
+            'failed_calls': self.fail_count,
+            'failure_rate': np.round(failure_rate, 2),
+            'mean_wait': np.round(mean_wait, 2),
+            'vehicles_driven': (self.v_trips > 0).sum(axis=1),
+        })
+
+    # Run every replication over the time range and save records and summary
+    def run(self):
+        save_path = self.configs['save_path']
+        print(f"[Data]  replications={self.R} passengers={self.p_arrival.shape[1]} load completed")
+
+        with tqdm(total=self.clock.end - self.clock.start,
+                  desc="시뮬레이션",
+                  unit="분",
+                  ncols=80) as pbar:
+            for tick in range(self.clock.n_ticks):
+                self.step(tick)
+                pbar.update(self.clock.tick_size)
+
+        self.records().to_csv(f'{save_path}/batch_record.csv', index=False)
+        summary = self.summary()
+        summary.to_csv(f'{save_path}/batch_summary.csv', index=False)
+        return summary
@@ -0,0 +1,72 @@
+import os
+import pickle
+
+from .io_manager import result_offsets
+
+
+# Checkpoints are pickles of the live engine objects: the SimulationState (numpy
+# agent tables, slot pools, timer wheels, clock and record buffer), the configs
+# (which may hold objects such as the ETA model) and the pending agent rows. They
+# restore the run exactly, but only load with the same state class definitions, so
+# they are meant for resuming and forking runs of the same code, not for archiving.
+# Bump the version whenever one of those classes changes its attributes.
+CHECKPOINT_VERSION = 2
+
+
+# Default folder for checkpoints of a run
+def checkpoint_dir(configs):
+    if configs.get('checkpoint_path'):
+        return configs['checkpoint_path']
+    return os.path.join(configs['save_path'], 'checkpoints')
+
+
+# Write a pickled snapshot of the simulator state taken before next_tick
+def save_checkpoint(simulator, next_tick, file_path=None):
+    if file_path is None:
+        folder = checkpoint_dir(simulator.configs)
+        os.makedirs(folder, exist_ok=True)
+        file_path = os.path.join(folder, f'checkpoint_{next_tick:06d}.pkl')
+
+    clock = simulator.clock
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'next_tick': next_tick,
+        'configs': simulator.configs,
+        'state': simulator.state,
+        # Pending pools: requests and shifts that have not arrived yet
+        'passengers': pending_rows(simulator.passengers, 'ride_time', clock, next_tick),
+        'vehicles': pending_rows(simulator.vehicles, 'work_start', clock, next_tick),
+        # Records and bytes already written to each result file
+        'writer_offsets': result_offsets(simulator.configs['save_path']),
+    }
+
+    # Write atomically so that a crash never leaves a truncated checkpoint
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+# Read a checkpoint written by save_checkpoint
+def load_checkpoint(file_path):
+    with open(file_path, 'rb') as f:
+        checkpoint = pickle.load(f)
+
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {checkpoint.get('version')}")
+    return checkpoint
+
+
+# Most recent checkpoint in a folder (None if there is none)
+def latest_checkpoint(folder):
+    if not os.path.isdir(folder):
+        return None
+    files = sorted(fn for fn in os.listdir(folder) if fn.startswith('checkpoint_') and fn.endswith('.pkl'))
+    return os.path.join(folder, files[-1]) if files else None
+
+
+# Rows of agent data arriving at or after the given tick
+def pending_rows(data, time_column, clock, tick):
+    arrival_tick = clock.ticks_at_or_after(data[time_column].to_numpy(dtype=float))
+    return data[arrival_tick >= tick].reset_index(drop=True)
@@ -0,0 +1,49 @@
+import math
+import numpy as np
+
+
+# Tolerance for placing floating point times on the tick grid
+TICK_EPSILON = 1e-9
+
+
+# Simulation clock on a fixed tick grid (tick_size in minutes)
+# Tick j corresponds to time_range[0] + j * tick_size; ticks are the integer
+# keys used by the arrival index and the timer wheels.
+class SimulationClock:
+
+    def __init__(self, time_range, tick_size=1):
+        self.start, self.end = time_range[0], time_range[1]
+        self.tick_size = tick_size
+        self.integer_ticks = float(tick_size).is_integer()
+        if self.integer_ticks:
+            self.tick_size = int(tick_size)
+        self.n_ticks = int(math.ceil((self.end - self.start) / self.tick_size - TICK_EPSILON))
+
+    # Simulation time (minutes) of a tick
+    def time(self, tick):
+        return self.start + tick * self.tick_size
+
+    # Tick index of a simulation time on the grid
+    def tick(self, time):
+        return int(round((time - self.start) / self.tick_size))
+
+    # Simulation minute (record row) that contains a tick
+    def minute(self, tick):
+        return self.start + int(math.floor(tick * self.tick_size + TICK_EPSILON))
+
+    # First tick whose time is at or after each value
+    def ticks_at_or_after(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        ticks = np.ceil((values - self.start) / self.tick_size - TICK_EPSILON).astype(np.int64)
+        ticks += self._time_array(ticks) < values
+        return ticks
+
+    # First tick whose time is strictly after each value
+    def ticks_after(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        ticks = np.floor((values - self.start) / self.tick_size + TICK_EPSILON).astype(np.int64) + 1
+        ticks -= self._time_array(ticks - 1) > values
+        return ticks
+
+    def _time_array(self, ticks):
+        return self.start + ticks * self.tick_size
@@ -1,5 +1,7 @@
 from modules.preprocess.data_preprocessor import extract_main
 from modules.dispatch.dispatch_flow import dispatch_main
+from modules.routing.osrm_client import OSRM_BASE_URL, OSRM_POOL_SIZE, OSRM_CONCURRENCY
+from modules.routing.route_cache import ROUTE_CACHE_MB
 
 
 # Base configuration template with default values
@@ -14,11 +16,41 @@ base_configs = {
     'add_board_time': 0.2,              # Boarding additional time in minutes
     'add_disembark_time': 0.2,          # Alighting additional time in minutes
     'matrix_mode': 'street_distance',    # Distance calculation method
+    'street_matrix': 'route',            # street_distance costs: 'route' (one route per pair) or 'table' (OSRM table service)
+    'osrm_table_size': 100,              # Coordinates per OSRM table request (larger matrices are split)
+    'osrm_url': OSRM_BASE_URL,           # OSRM server of the routing client
+    'osrm_timeout': None,                # OSRM request timeout in seconds or [connect, read] (None waits indefinitely)
+    'osrm_pool_size': OSRM_POOL_SIZE,    # Keep-alive connections of the routing client
+    'osrm_concurrency': OSRM_CONCURRENCY, # Route requests in flight at once (1 routes sequentially)
+    'route_cache_mb': ROUTE_CACHE_MB,    # Memory bound of the in-memory route cache in MB (0 keeps no routes in memory)
+    'route_cache': None,                 # Persistent route cache file in simul_result (e.g. 'route_cache.sqlite'; None for memory only)
+    'route_cache_precision': None,       # Decimals OD coordinates are snapped to for caching and routing (None for exact)
+    'route_prefetch': False,             # Route passengers' ride-to-alight legs ahead of the simulation clock
+    'route_prefetch_window': 30,         # Prefetch lookahead in minutes
     'dispatch_mode': 'in_order',         # Dispatch algorithm mode
     'eta_model': None,                   # ETA prediction model (None if unavailable)
     'corp_priv_split': (0.55, 0.45),    # Corporate:Private taxi ratio
     'filter_out_of_region': False,       # Filter out-of-region data
-    'view_operation_graph': True         # Display operation graph
+    'view_operation_graph': True,        # Display operation graph
+    'execution_mode': 'time_step',       # 'time_step' (every tick) or 'event_driven' (skip quiet ticks)
+    'tick_size': 1,                      # Engine time resolution in minutes (e.g. 1/6 for 10 seconds)
+    'checkpoint_interval': None,         # Checkpoint every N simulated minutes (None to disable)
+    'checkpoint_path': None,             # Checkpoint folder (None for save_path/checkpoints)
+    'random_seed': None,                 # Seed for input perturbation of replications
+    'demand_jitter': 0,                  # Request time perturbation in minutes (+-N, 0 to disable)
+    'shift_jitter': 0,                   # Vehicle shift perturbation in minutes (+-N, 0 to disable)
+    'placement_jitter': 0,               # Vehicle start position perturbation in meters (+-N, 0 to disable)
+    'straight_line_speed': 30,           # Travel speed in km/h of the batch engine (straight-line routes)
+    'background_writer': True,           # Write result files on a write-behind thread
+    'writer_queue_size': 64,             # Pending result writes before the engine waits for the writer
+    'trip_format': 'json',               # Trip output: 'json' (trip.json), 'columnar' (trip_columns/) or 'both'
+    'route_geometry': 'full',            # Trip routes: 'full', 'simplified' (within route_tolerance) or 'polyline' (encoded)
+    'route_tolerance': 5,                # Route simplification tolerance in meters
+    'viewer_window': 10,                 # Viewer export window in minutes (0 copies the full result files)
+    'viewer_format': 'json',             # Viewer chunk format: 'json' or 'binary' (Float32 typed-array buffers)
+    'results_catalog': None,             # Results catalog file in simul_result (e.g. 'catalog.sqlite'; None to disable)
+    'event_log': False,                  # Also write the typed event log events.bin (replayable by modules.analytics.event_log)
+    'max_failure_rate': None             # Abort the run once failures exceed this % of requests (None to disable)
 }
 
 
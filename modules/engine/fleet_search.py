@@ -0,0 +1,115 @@
+"""
+Fleet-size search
+
+Finds the smallest number of taxis whose failure rate stays at or under a
+target. Each round runs `processes` fleet sizes inside the current bracket
+(plain bisection with one process). Runs abort as soon as their failures make
+the target unreachable ('max_failure_rate'), and finished runs are reused
+through the sweep's config-hash folders.
+
+Usage:
+    python -m modules.engine.fleet_search --target 20 --time-range 1380 1440
+"""
+
+import os
+import sys
+import json
+import argparse
+import pandas as pd
+
+from .config_manager import base_configs
+from .sweep import FLEET_SIZE_KEY, sweep_jobs, sweep_pool, run_jobs
+from ..preprocess.data_preprocessor import get_preprocessed_data
+
+
+# Run meets the target failure rate (%)
+def is_feasible(summary, target_failure_rate):
+    return (not summary['aborted']) and summary['failure_rate'] <= target_failure_rate
+
+
+# Search the smallest fleet size in [min_size, max_size] meeting target_failure_rate (%)
+# Assumes the failure rate does not increase with fleet size. Returns (fleet size or
+# None when even max_size misses the target, table of evaluated runs).
+def search_fleet_size(passengers, vehicles, configs, target_failure_rate,
+                      min_size=1, max_size=None, tolerance=1, processes=None,
+                      summary_file='fleet_search.csv'):
+    max_size = min(max_size or len(vehicles), len(vehicles))
+    processes = processes or (os.cpu_count() or 1)
+
+    configs = dict(configs)
+    configs['max_failure_rate'] = target_failure_rate
+    evaluated = {}
+
+    def evaluate(sizes):
+        base_path, jobs = sweep_jobs(configs, [{FLEET_SIZE_KEY: size} for size in sizes], passengers, vehicles)
+        for size, (_, folder_path), summary in zip(sizes, jobs, run_jobs(jobs, pool)):
+            evaluated[size] = dict(summary, folder=os.path.basename(folder_path))
+            print(f"[Search] {FLEET_SIZE_KEY}={size} failure_rate={summary['failure_rate']} "
+                  f"{'aborted' if summary['aborted'] else 'finished'}")
+        return base_path
+
+    pool = sweep_pool(passengers, vehicles, processes)
+    try:
+        base_path = evaluate([max_size])
+        best = max_size if is_feasible(evaluated[max_size], target_failure_rate) else None
+
+        # low: largest size known to miss the target, high: smallest size known to meet it
+        low, high = min_size - 1, max_size
+        while best is not None and high - low > tolerance:
+            count = min(processes, high - low - 1)
+            sizes = sorted({low + (high - low) * (i + 1) // (count + 1) for i in range(count)})
+            evaluate(sizes)
+
+            feasible = [size for size in sizes if is_feasible(evaluated[size], target_failure_rate)]
+            high = min(feasible + [high])
+            low = max([size for size in sizes if size < high] + [low])
+            best = high
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    summary_table = pd.DataFrame([
+        {FLEET_SIZE_KEY: size, **summary, 'feasible': is_feasible(summary, target_failure_rate)}
+        for size, summary in sorted(evaluated.items())
+    ])
+    if summary_file is not None:
+        summary_table.to_csv(os.path.join(base_path, summary_file), index=False)
+    return best, summary_table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Smallest fleet size meeting a failure rate target')
+    parser.add_argument('--target', type=float, required=True, help='Target failure rate in %%')
+    parser.add_argument('--configs', default='{}', help='JSON overrides applied to every run')
+    parser.add_argument('--time-range', nargs=2, type=int, default=None, metavar=('START', 'END'))
+    parser.add_argument('--min-size', type=int, default=1)
+    parser.add_argument('--max-size', type=int, default=None)
+    parser.add_argument('--tolerance', type=int, default=1, help='Width of the final bracket')
+    parser.add_argument('--additional-path', default='fleet_search', help='Folder under simul_result')
+    parser.add_argument('--passengers', default='./data/agents/passenger/passenger_data.csv')
+    parser.add_argument('--vehicles', default='./data/agents/vehicle/vehicle_data.csv')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    configs = base_configs.copy()
+    configs.update(json.loads(args.configs))
+    configs['additional_path'] = args.additional_path
+    if args.time_range is not None:
+        configs['time_range'] = args.time_range
+
+    # Read and preprocess the inputs once for every run
+    passengers = pd.read_csv(args.passengers)
+    vehicles = pd.read_csv(args.vehicles)
+    passengers, vehicles = get_preprocessed_data(passengers, vehicles, configs)
+
+    best, summary_table = search_fleet_size(
+        passengers, vehicles, configs, args.target,
+        args.min_size, args.max_size, args.tolerance, args.processes
+    )
+    print(summary_table.to_string(index=False))
+    print(f"Smallest fleet size: {best}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,104 +1,235 @@
 import os
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-from IPython.display import clear_output
+import numpy as np
+
+from .result_writer import ResultWriters, BackgroundResultWriters, EVENT_LOG, EVENT_LOG_FILE, EVENT_MANIFEST, EVENT_KINDS, EVENT_DTYPE
 
 
 # Generate directory path for saving simulation results
 def generate_path_to_save(result_folder_name=None, additional_path=None):
-    # Create base directory
+    # Create base directory (safe when several runs start at once)
     base_path = os.path.join(os.getcwd(), "simul_result") 
-    if not os.path.isdir(base_path):
-        os.mkdir(base_path)
+    os.makedirs(base_path, exist_ok=True)
         
     # Add additional path if specified
     if additional_path is not None:
         base_path = os.path.join(base_path, additional_path)
-        if not os.path.isdir(base_path):
-            os.mkdir(base_path)
+        os.makedirs(base_path, exist_ok=True)
     
     # Create result folder with unique name
     if result_folder_name is not None:
-        if result_folder_name not in os.listdir(base_path):
-            base_path = os.path.join(base_path, result_folder_name)
-            os.mkdir(base_path)
-        else:
-            # Generate unique folder name if exists
-            result_folder_name = f"simulation_{len(os.listdir(base_path)) + 1}"
-            base_path = os.path.join(base_path, result_folder_name)
-            os.mkdir(base_path)
-    else:
-        # Auto-generate folder name
-        result_folder_name = f"simulation_{len(os.listdir(base_path)) + 1}"
-        base_path = os.path.join(base_path, result_folder_name)
-        os.mkdir(base_path)
-        
-    return base_path
+        try:
+            os.mkdir(os.path.join(base_path, result_folder_name))
+            return os.path.join(base_path, result_folder_name)
+        except FileExistsError:
+            pass
+
+    # Auto-generate folder name: os.mkdir fails if another run claimed the number first
+    # (files such as the results catalog are not counted)
+    folder_number = len([fd for fd in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, fd))]) + 1
+    while True:
+        result_folder_path = os.path.join(base_path, f"simulation_{folder_number}")
+        try:
+            os.mkdir(result_folder_path)
+            return result_folder_path
+        except FileExistsError:
+            folder_number += 1
+
+
+# Open result writers of each result folder
+_result_writers = {}
 
 
-# Save data to JSON file (append if exists)
+def result_writers(save_path):
+    if save_path not in _result_writers:
+        _result_writers[save_path] = ResultWriters(save_path)
+    return _result_writers[save_path]
+
+
+# Open the result writers of a run (background: write-behind thread with a bounded queue)
+def open_result_files(save_path, background=True, max_pending=64, trip_format='json'):
+    if save_path in _result_writers:
+        return _result_writers[save_path]
+    writers = ResultWriters(save_path, trip_format)
+    if background:
+        writers = BackgroundResultWriters(writers, max_pending)
+    _result_writers[save_path] = writers
+    return writers
+
+
+# Save data to JSON file (streamed append; the file is finished by close_result_files)
 def save_json_data(current_data, save_path, file_name):
-    file_path = f'{save_path}/{file_name}.json'
-    
-    if os.path.isfile(file_path): 
-        # Append to existing file
-        with open(file_path, 'r') as f:
-            prior_data = json.load(f)
-        
-        prior_data.extend(current_data)
-        
-        with open(file_path, 'w') as f:
-            json.dump(prior_data, f)
-    else:
-        # Create new file
-        with open(file_path, 'w') as f:
-            json.dump(current_data, f)    
+    result_writers(save_path).write(file_name, current_data)
 
 
-# Track and visualize simulation progress
-def checking_progress(simulation_record, current_time, requested_passenger, 
-                     fail_passenger, empty_vehicle, active_vehicle, inform):
-    
-    time_range = inform['time_range']
-    save_path = inform['save_path']
+# Append events of one kind to the event log (only when 'event_log' is enabled)
+# fields: values (arrays or scalars) of the EVENT_DTYPE fields, missing fields are NaN
+def save_events(simul_configs, kind, clock, **fields):
+    if not simul_configs.get('event_log'):
+        return
+    count = max(np.size(values) for values in fields.values())
+    if count == 0:
+        return
+
+    events = np.empty(count, dtype=EVENT_DTYPE)
+    events['kind'] = EVENT_KINDS.index(kind)
+    events['clock'] = clock
+    for name in EVENT_DTYPE.names[2:]:
+        events[name] = fields.get(name, np.nan)
+    result_writers(simul_configs['save_path']).write(EVENT_LOG, events)
+
+
+# Write the event log manifest of a finished (or aborted) run
+# Holds what replaying the log needs besides the events: the clock, the drop-off
+# delay after which a vehicle is free again and the last tick that was simulated.
+def save_event_manifest(state, simul_configs, last_tick):
+    save_path = simul_configs['save_path']
+    log_path = os.path.join(save_path, EVENT_LOG_FILE)
+    manifest = {
+        'dtype': EVENT_DTYPE.descr,
+        'kinds': EVENT_KINDS,
+        'count': os.path.getsize(log_path) // EVENT_DTYPE.itemsize if os.path.isfile(log_path) else 0,
+        'time_range': list(simul_configs['time_range']),
+        'tick_size': simul_configs.get('tick_size', 1),
+        'execution_mode': simul_configs.get('execution_mode', 'time_step'),
+        'add_disembark_time': simul_configs['add_disembark_time'],
+        'has_cartype': 'cartype' in state.vehicles,
+        'last_tick': last_tick,
+        'record_rows': len(state.record),
+    }
+    with open(os.path.join(save_path, EVENT_MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+
+# Finish the result files of a run (waits for every queued write)
+def close_result_files(save_path):
+    writers = _result_writers.pop(save_path, None)
+    if writers is not None:
+        writers.close()
+
 
-    # Record current simulation state
-    current_record = pd.DataFrame({
-        'time': [current_time],
-        'waiting_passenger_cnt': [len(requested_passenger)],
-        'fail_passenger_cnt': [len(fail_passenger)],
-        'empty_vehicle_cnt': [len(empty_vehicle)],
-        'driving_vehicle_cnt': [len(active_vehicle)]
-    })
+# Record counts and byte offsets written to each result file so far
+def result_offsets(save_path):
+    return result_writers(save_path).offsets()
 
-    simulation_record = pd.concat([simulation_record, current_record]).reset_index(drop=True)
+
+# Cut result files back to the given offsets (copied from source_path when forking)
+def restore_result_files(offsets, save_path, source_path=None):
+    result_writers(save_path).restore(offsets, source_path)
+
+
+# Track and visualize simulation progress
+def checking_progress(state, current_time, inform):
+
+    # Record current simulation state (row of the minute containing current_time)
+    current_tick = state.clock.tick(current_time)
+    state.record.append(
+        state.clock.minute(current_tick),
+        len(state.waiting),
+        state.fail_count,
+        len(state.idle),
+        len(state.active)
+    )
+    simulation_record = state.record
 
     # Display operation graph
     if inform.get('view_operation_graph', True):
+        import matplotlib.pyplot as plt  # heavy, imported on use
+        from IPython.display import clear_output
+
         clear_output(True)
         plt.figure(figsize=(18, 10))
         plt.rcParams['axes.grid'] = True 
         
-        plt.plot(simulation_record['time'].values, 
-                simulation_record['waiting_passenger_cnt'].values, 
-                label=f"Waiting passengers ({len(requested_passenger)})", 
+        plt.plot(simulation_record['time'], 
+                simulation_record['waiting_passenger_cnt'], 
+                label=f"Waiting passengers ({len(state.waiting)})", 
                 color='royalblue')
         
-        plt.plot(simulation_record['time'].values, 
-                simulation_record['empty_vehicle_cnt'].values, 
-                label=f"Idle vehicles ({len(empty_vehicle)})", 
+        plt.plot(simulation_record['time'], 
+                simulation_record['empty_vehicle_cnt'], 
+                label=f"Idle vehicles ({len(state.idle)})", 
                 color='darkorange')
         
-        plt.plot(simulation_record['time'].values, 
-                simulation_record['driving_vehicle_cnt'].values, 
-                label=f"In-service vehicles ({len(active_vehicle)})", 
+        plt.plot(simulation_record['time'], 
+                simulation_record['driving_vehicle_cnt'], 
+                label=f"In-service vehicles ({len(state.active)})", 
                 color='limegreen')
         
         plt.legend()
 
     # Save final simulation record
-    if current_time == (time_range[-1] - 1):
-        simulation_record.to_csv(f'{save_path}/record.csv', index=False)
-    
-    return simulation_record
\ No newline at end of file
+    if current_tick == state.clock.n_ticks - 1:
+        save_simulation_record(state, inform)
+
+
+# Fill record rows for quiet minutes skipped by the event-driven mode
+def carry_progress(state, next_tick, inform):
+    # Counts do not change between events
+    if next_tick >= state.clock.n_ticks:
+        state.record.carry_forward(state.clock.end)
+    else:
+        state.record.carry_forward(state.clock.minute(next_tick))
+
+    # Save final simulation record
+    if next_tick >= state.clock.n_ticks:
+        save_simulation_record(state, inform)
+
+
+# Save the simulation record (minute rows so far) as record.csv
+def save_simulation_record(state, inform):
+    record = state.record.to_frame()
+    result_writers(inform['save_path']).submit(record.to_csv, f"{inform['save_path']}/record.csv", index=False)
+
+
+# Build failed passenger marker records
+def fail_passenger_markers(state, slots):
+    passengers = state.passengers.view(slots)
+    ride_time = passengers['ride_time'].astype(float)
+    fail_time = ride_time + passengers['dispatch_time']
+
+    return [
+        {
+            'passenger_id': passenger_id,
+            'status': 0,
+            'location': [ride_lon, ride_lat],
+            'timestamp': [start, end]
+        }
+        for passenger_id, ride_lon, ride_lat, start, end in zip(
+            passengers['ID'].astype(float).tolist(),
+            passengers['ride_lon'].tolist(),
+            passengers['ride_lat'].tolist(),
+            ride_time.tolist(),
+            fail_time.tolist()
+        )
+    ]
+
+
+# Build idle vehicle marker records (idle from temporary_stopTime until time)
+def vehicle_markers(state, slots, time):
+    vehicles = state.vehicles.view(slots)
+    location = zip(vehicles['lon'].tolist(), vehicles['lat'].tolist())
+    stop_time = vehicles['temporary_stopTime'].tolist()
+    vehicle_id = vehicles['vehicle_id'].astype(float).tolist()
+
+    if 'cartype' in state.vehicles:
+        return [
+            {
+                'vehicle_id': v_id,
+                'cartype': cartype,
+                'location': [lon, lat],
+                'timestamp': [stop, time]
+            }
+            for v_id, cartype, (lon, lat), stop in zip(
+                vehicle_id, vehicles['cartype'].astype(float).tolist(), location, stop_time
+            )
+        ]
+
+    return [
+        {
+            'vehicle_id': v_id,
+            'location': [lon, lat],
+            'timestamp': [stop, time]
+        }
+        for v_id, (lon, lat), stop in zip(vehicle_id, location, stop_time)
+    ]
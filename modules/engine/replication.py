@@ -0,0 +1,57 @@
+import os
+from multiprocess import Pool
+
+from .simulator import Simulator
+from ..preprocess.data_preprocessor import perturb_data, has_jitter
+from ..analytics.results_catalog import CATALOG_FILE
+
+
+# Preprocessed inputs shared by every replication of a worker process
+_shared_data = {}
+
+
+def _init_worker(passengers, vehicles):
+    _shared_data['passengers'] = passengers
+    _shared_data['vehicles'] = vehicles
+
+
+# Run one seeded replication and return its result folder
+def _run_replication(configs):
+    passengers, vehicles = perturb_data(_shared_data['passengers'], _shared_data['vehicles'], configs)
+    simulator = Simulator(passengers=passengers, vehicles=vehicles, configs=configs)
+    simulator.run()
+    return configs['save_path']
+
+
+# Run seeded replications of one scenario in parallel
+# Inputs are preprocessed once (get_preprocessed_data) and shipped to each worker once;
+# each replication gets its own simulation_N folder under configs['additional_path'].
+# Replications differ only through 'demand_jitter' / 'shift_jitter' / 'placement_jitter'
+# and their seeds, so several replications need at least one of them.
+def run_replications(passengers, vehicles, configs, n_replications, processes=None, seeds=None):
+    if n_replications > 1 and not has_jitter(configs):
+        raise ValueError("Please set 'demand_jitter', 'shift_jitter' or 'placement_jitter' (replications would be identical)")
+    if seeds is None:
+        base_seed = configs.get('random_seed') or 0
+        seeds = [base_seed + r for r in range(n_replications)]
+    if len(seeds) != n_replications:
+        raise ValueError("Please input one seed per replication")
+
+    replication_configs = []
+    for seed in seeds:
+        replication = dict(configs)
+        replication['random_seed'] = seed
+        replication['path'] = None  # auto-numbered simulation_N folders
+        replication['view_operation_graph'] = False
+        replication['results_catalog'] = replication.get('results_catalog') or CATALOG_FILE
+        replication_configs.append(replication)
+
+    processes = processes or min(n_replications, os.cpu_count() or 1)
+    print(f"[Replication] {n_replications} runs on {processes} processes")
+
+    if processes == 1:
+        _init_worker(passengers, vehicles)
+        return [_run_replication(c) for c in replication_configs]
+
+    with Pool(processes, initializer=_init_worker, initargs=(passengers, vehicles)) as pool:
+        return pool.map(_run_replication, replication_configs, chunksize=1)
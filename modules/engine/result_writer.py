@@ -0,0 +1,415 @@
+import os
+import json
+import queue
+import threading
+import numpy as np
+
+from ..routing.route_geometry import decode_route
+
+
+# Result files that are appended to while the simulation runs
+RESULT_FILES = ['passenger_marker', 'vehicle_marker', 'trip']
+
+# Suffix of result files that are still being written
+PART_SUFFIX = '.part'
+
+# Folder of the columnar trip store and its manifest
+TRIP_COLUMNS_DIR = 'trip_columns'
+TRIP_MANIFEST = 'columns.json'
+
+# Scalar trip columns (fixed dtype, or int64/float64 chosen from the first records)
+TRIP_SCALAR_COLUMNS = ['vehicle_id', 'cartype', 'passenger_id', 'board', 'start_time', 'end_time']
+TRIP_FIXED_DTYPES = {'board': 'int8', 'start_time': 'float64', 'end_time': 'float64'}
+
+# Ragged route columns: row i owns points route_offsets[i]:route_offsets[i+1]
+TRIP_ROUTE_DTYPES = {'route_offsets': 'int64', 'route_coords': 'float64', 'route_timestamps': 'float64'}
+
+# Append-only event log (fixed-size little-endian records) and its manifest
+EVENT_LOG = 'events'
+EVENT_LOG_FILE = 'events.bin'
+EVENT_MANIFEST = 'events.json'
+
+# Event kinds (the kind field holds the position in this list)
+EVENT_KINDS = ['request', 'dispatch', 'pickup', 'dropoff', 'fail', 'shift_start', 'shift_end']
+
+# Event record: clock is the engine time the event was logged at, time the time of
+# the event itself and since the start of the interval it closes (NaN if none)
+EVENT_DTYPE = np.dtype([
+    ('kind', 'u1'), ('clock', '<f8'), ('time', '<f8'), ('since', '<f8'),
+    ('passenger_id', '<f8'), ('vehicle_id', '<f8'), ('cartype', '<f8'), ('lon', '<f8'), ('lat', '<f8'),
+])
+
+
+# Append-only writer of one JSON array result file
+# Records are streamed into '<file>.json.part' as they arrive; close() writes the
+# closing bracket and renames the file, giving the same text as json.dump(list).
+# Nothing is kept in memory and every record is written exactly once.
+class JsonArrayWriter:
+
+    def __init__(self, file_path, count=0, offset=None):
+        self.file_path = file_path
+        self.part_path = file_path + PART_SUFFIX
+        self.count = count
+
+        if offset is None:
+            self.file = open(self.part_path, 'w')
+            self.file.write('[')
+        else:
+            # Continue a truncated part file
+            self.file = open(self.part_path, 'r+')
+            self.file.seek(offset)
+            self.file.truncate()
+
+    # Append records (list of dicts)
+    def write(self, records):
+        if not records:
+            return
+        separator = ', ' if self.count > 0 else ''
+        self.file.write(separator + ', '.join(json.dumps(record) for record in records))
+        self.count += len(records)
+
+    # Number of records and byte length of the part file so far
+    def tell(self):
+        self.file.flush()
+        return {'count': self.count, 'offset': self.file.tell()}
+
+    def flush(self):
+        self.file.flush()
+
+    # Finish the JSON array and move it into place
+    def close(self):
+        self.file.write(']')
+        self.file.close()
+        os.replace(self.part_path, self.file_path)
+
+
+# Append-only columnar writer of trip records
+# Each column is a flat little-endian binary file '<column>.bin' in trip_columns/:
+# typed scalar columns, route coordinates ([lon, lat] pairs) and timestamps as flat
+# buffers, and route_offsets delimiting the points of each trip. columns.json holds
+# the dtypes and, once closed, the row and point counts.
+class ColumnarTripWriter:
+
+    def __init__(self, folder, count=0, points=0, restore=False):
+        self.folder = folder
+        self.count = count
+        self.points = points
+        self.files = {}
+        self.dtypes = None
+        os.makedirs(folder, exist_ok=True)
+
+        if restore:
+            # Continue truncated column files
+            with open(os.path.join(folder, TRIP_MANIFEST), 'r') as f:
+                self.dtypes = json.load(f)['dtypes']
+            for column, length in _trip_column_lengths(count, points).items():
+                self.files[column] = open(os.path.join(folder, f'{column}.bin'), 'r+b')
+                self.files[column].truncate(length * np.dtype(self.dtypes[column]).itemsize)
+                self.files[column].seek(0, os.SEEK_END)
+
+    # Create the column files (dtypes of id columns follow the first records)
+    def _open(self, columns):
+        self.dtypes = dict(TRIP_ROUTE_DTYPES)
+        for column, values in columns.items():
+            if column in TRIP_FIXED_DTYPES:
+                self.dtypes[column] = TRIP_FIXED_DTYPES[column]
+            elif values.dtype.kind in 'iub':
+                self.dtypes[column] = 'int64'
+            elif values.dtype.kind == 'f':
+                self.dtypes[column] = 'float64'
+            else:
+                raise ValueError(f"Columnar trip output needs numeric '{column}' values")
+
+        for column in self.dtypes:
+            self.files[column] = open(os.path.join(self.folder, f'{column}.bin'), 'wb')
+        self.files['route_offsets'].write(np.zeros(1, dtype='int64').tobytes())
+        self._write_manifest()
+
+    def _write_manifest(self):
+        with open(os.path.join(self.folder, TRIP_MANIFEST), 'w') as f:
+            json.dump({'rows': self.count, 'points': self.points, 'dtypes': self.dtypes}, f)
+
+    # Append trip records (dicts with the trip.json keys)
+    def write(self, records):
+        if not records:
+            return
+        columns = {column: np.asarray([record[column] for record in records])
+                   for column in TRIP_SCALAR_COLUMNS if column not in ('start_time', 'end_time')}
+        columns['start_time'] = np.asarray([record['timestamp'][0] for record in records])
+        columns['end_time'] = np.asarray([record['timestamp'][-1] for record in records])
+        if self.dtypes is None:
+            self._open(columns)
+
+        routes = [decode_route(record['trip']) for record in records]
+        lengths = np.asarray([len(route) for route in routes], dtype='int64')
+        if any(len(record['timestamp']) != length for record, length in zip(records, lengths.tolist())):
+            raise ValueError("Every route point needs a timestamp")
+
+        columns['route_offsets'] = self.points + np.cumsum(lengths)
+        columns['route_coords'] = np.asarray([point for route in routes for point in route]).reshape(-1)
+        columns['route_timestamps'] = np.asarray([t for record in records for t in record['timestamp']])
+
+        for column, values in columns.items():
+            self.files[column].write(values.astype(self.dtypes[column]).tobytes())
+        self.count += len(records)
+        self.points += int(lengths.sum())
+
+    def tell(self):
+        self.flush()
+        return {'count': self.count, 'points': self.points}
+
+    def flush(self):
+        for file in self.files.values():
+            file.flush()
+
+    # Close the column files and record the final counts
+    def close(self, finalize=True):
+        for file in self.files.values():
+            file.close()
+        if finalize and self.dtypes is not None:
+            self._write_manifest()
+
+
+# Append-only writer of the event log (EVENT_DTYPE records)
+class EventLogWriter:
+
+    def __init__(self, file_path, count=0, restore=False):
+        self.file_path = file_path
+        self.count = count
+        if restore:
+            # Continue a truncated log
+            self.file = open(file_path, 'r+b')
+            self.file.truncate(count * EVENT_DTYPE.itemsize)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(file_path, 'wb')
+
+    # Append events (EVENT_DTYPE array)
+    def write(self, events):
+        self.file.write(events.tobytes())
+        self.count += len(events)
+
+    def tell(self):
+        self.flush()
+        return {'count': self.count}
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# Result writers of one result folder (opened on first write)
+# trip_format: 'json' (trip.json), 'columnar' (trip_columns/) or 'both'
+class ResultWriters:
+
+    def __init__(self, save_path, trip_format='json'):
+        self.save_path = save_path
+        self.trip_format = trip_format
+        self.writers = {}
+
+    def _writer(self, name):
+        if name not in self.writers:
+            if name == TRIP_COLUMNS_DIR:
+                self.writers[name] = ColumnarTripWriter(f'{self.save_path}/{name}')
+            elif name == EVENT_LOG:
+                self.writers[name] = EventLogWriter(f'{self.save_path}/{EVENT_LOG_FILE}')
+            else:
+                self.writers[name] = JsonArrayWriter(f'{self.save_path}/{name}.json')
+        return self.writers[name]
+
+    def write(self, file_name, records):
+        if len(records) == 0:
+            return
+        if file_name == 'trip' and self.trip_format != 'json':
+            self._writer(TRIP_COLUMNS_DIR).write(records)
+            if self.trip_format == 'columnar':
+                return
+        self._writer(file_name).write(records)
+
+    # Run any other write (immediately)
+    def submit(self, function, *args, **kwargs):
+        function(*args, **kwargs)
+
+    # Record count and byte offset of every open file
+    def offsets(self):
+        return {file_name: writer.tell() for file_name, writer in self.writers.items()}
+
+    # Reopen files cut back to the given offsets, copying from source_path when forking
+    # (the source may be a part file or a closed JSON file: both share the same prefix)
+    def restore(self, offsets, source_path=None):
+        self.close(finalize=False)
+        source_path = self.save_path if source_path is None else source_path
+
+        for file_name in RESULT_FILES:
+            target_file = f'{self.save_path}/{file_name}.json'
+            source_file = f'{source_path}/{file_name}.json'
+            if os.path.isfile(source_file + PART_SUFFIX):
+                source_file += PART_SUFFIX
+
+            if file_name not in offsets:
+                # Nothing was written before the checkpoint
+                for path in (target_file, target_file + PART_SUFFIX):
+                    if os.path.isfile(path):
+                        os.remove(path)
+                continue
+
+            count, offset = offsets[file_name]['count'], offsets[file_name]['offset']
+            if os.path.getsize(source_file) < offset:
+                raise ValueError(f"{source_file} is shorter than the checkpoint offset {offset}")
+
+            if source_path == self.save_path:
+                os.replace(source_file, target_file + PART_SUFFIX)
+            else:
+                with open(source_file, 'rb') as src, open(target_file + PART_SUFFIX, 'wb') as dst:
+                    _copy_prefix(src, dst, offset)
+
+            self.writers[file_name] = JsonArrayWriter(target_file, count, offset)
+
+        self._restore_columns(offsets, source_path)
+        self._restore_events(offsets, source_path)
+
+    # Columnar trip store: truncate in place or copy the column prefixes when forking
+    def _restore_columns(self, offsets, source_path):
+        target_dir = f'{self.save_path}/{TRIP_COLUMNS_DIR}'
+        source_dir = f'{source_path}/{TRIP_COLUMNS_DIR}'
+
+        if TRIP_COLUMNS_DIR not in offsets:
+            if os.path.isdir(target_dir):
+                for fn in os.listdir(target_dir):
+                    os.remove(os.path.join(target_dir, fn))
+                os.rmdir(target_dir)
+            return
+
+        count, points = offsets[TRIP_COLUMNS_DIR]['count'], offsets[TRIP_COLUMNS_DIR]['points']
+        if source_dir != target_dir:
+            os.makedirs(target_dir, exist_ok=True)
+            with open(os.path.join(source_dir, TRIP_MANIFEST), 'r') as f:
+                manifest = json.load(f)
+            sizes = _trip_column_lengths(count, points)
+            for column, dtype in manifest['dtypes'].items():
+                with open(os.path.join(source_dir, f'{column}.bin'), 'rb') as src, \
+                     open(os.path.join(target_dir, f'{column}.bin'), 'wb') as dst:
+                    _copy_prefix(src, dst, sizes[column] * np.dtype(dtype).itemsize)
+            with open(os.path.join(target_dir, TRIP_MANIFEST), 'w') as f:
+                json.dump(dict(manifest, rows=count, points=points), f)
+
+        self.writers[TRIP_COLUMNS_DIR] = ColumnarTripWriter(target_dir, count, points, restore=True)
+
+    # Event log: truncate in place or copy its prefix when forking
+    def _restore_events(self, offsets, source_path):
+        target_file = f'{self.save_path}/{EVENT_LOG_FILE}'
+        source_file = f'{source_path}/{EVENT_LOG_FILE}'
+
+        if EVENT_LOG not in offsets:
+            if os.path.isfile(target_file):
+                os.remove(target_file)
+            return
+
+        count = offsets[EVENT_LOG]['count']
+        if source_file != target_file:
+            with open(source_file, 'rb') as src, open(target_file, 'wb') as dst:
+                _copy_prefix(src, dst, count * EVENT_DTYPE.itemsize)
+        self.writers[EVENT_LOG] = EventLogWriter(target_file, count, restore=True)
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    # Close every file (finalize=False leaves the part files for a restore)
+    def close(self, finalize=True):
+        for writer in self.writers.values():
+            if isinstance(writer, ColumnarTripWriter):
+                writer.close(finalize)
+            elif finalize:
+                writer.close()
+            else:
+                writer.file.close()
+        self.writers = {}
+
+
+# Write-behind wrapper of ResultWriters: writes are queued and run on a dedicated
+# thread so that JSON encoding and disk latency overlap the simulation. The queue
+# is bounded (the engine blocks once max_pending writes are waiting) and every
+# read of writer state (offsets, restore, close) first waits for the queue to drain.
+class BackgroundResultWriters:
+
+    def __init__(self, writers, max_pending=64):
+        self.writers = writers
+        self.save_path = writers.save_path
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self._drain, name='result-writer', daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    return
+                function, args, kwargs = task
+                if self.error is None:
+                    function(*args, **kwargs)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    # Re-raise a failure of the writer thread in the engine
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError(f"Result writer failed for {self.save_path}") from self.error
+
+    # Queue any write (blocks while the queue is full)
+    def submit(self, function, *args, **kwargs):
+        self._check()
+        self.queue.put((function, args, kwargs))
+
+    def write(self, file_name, records):
+        if len(records) > 0:
+            self.submit(self.writers.write, file_name, records)
+
+    # Wait until every queued write is done
+    def barrier(self):
+        self.queue.join()
+        self._check()
+
+    def offsets(self):
+        self.barrier()
+        return self.writers.offsets()
+
+    def restore(self, offsets, source_path=None):
+        self.barrier()
+        self.writers.restore(offsets, source_path)
+
+    def flush(self):
+        self.barrier()
+        self.writers.flush()
+
+    # The thread and files are released before a writer failure is re-raised
+    def close(self, finalize=True):
+        self.queue.join()
+        self.queue.put(None)
+        self.thread.join()
+        self.writers.close(finalize)
+        self._check()
+
+
+# Number of values of every trip column for the given row and point counts
+def _trip_column_lengths(count, points):
+    lengths = {column: count for column in TRIP_SCALAR_COLUMNS}
+    lengths.update({'route_offsets': count + 1, 'route_coords': points * 2, 'route_timestamps': points})
+    return lengths
+
+
+# Copy the first length bytes of a file
+def _copy_prefix(src, dst, length):
+    remaining = length
+    while remaining > 0:
+        chunk = src.read(min(remaining, 1 << 20))
+        if not chunk:
+            break
+        dst.write(chunk)
+        remaining -= len(chunk)
@@ -1,31 +1,19 @@
 import pandas as pd 
 from tqdm import tqdm
 
-from .config_manager import extract_selector, dispatch_selector, base_configs
+from .config_manager import extract_selector, dispatch_selector
 from .state_updater import update_passenger, update_vehicle
-from .io_manager import generate_path_to_save, save_json_data, checking_progress
-from ..preprocess.data_preprocessor import crop_data_by_timerange, get_preprocessed_data
-
-
-# Initialize simulation base dataframes
-def base_data():
-    active_vehicle = pd.DataFrame()
-    empty_vehicle = pd.DataFrame()
-    requested_passenger = pd.DataFrame()
-    fail_passenger = pd.DataFrame()
-    
-    simulation_record = pd.DataFrame(
-                                columns=[
-                                    'time',
-                                    'waiting_passenger_cnt',
-                                    'fail_passenger_cnt', 
-                                    'empty_vehicle_cnt',
-                                    'driving_vehicle_cnt', 
-                                    'iter_time(second)'
-                                ]
-                            )
-    
-    return active_vehicle, empty_vehicle, requested_passenger, fail_passenger, simulation_record
+from .state_store import SimulationState
+from .arrival_index import ArrivalIndex
+from .io_manager import (
+    generate_path_to_save, checking_progress, carry_progress, save_simulation_record, save_event_manifest,
+    open_result_files, restore_result_files, close_result_files
+)
+from .checkpoint import save_checkpoint, load_checkpoint
+from ..preprocess.data_preprocessor import crop_data_by_timerange
+from ..analytics.results_catalog import catalog_path, register_run, data_fingerprint
+from ..routing.osrm_client import routing_client
+from ..routing.route_prefetch import start_route_prefetch, stop_route_prefetch
 
 
 class Simulator:
@@ -59,59 +47,240 @@ class Simulator:
         else:
             self.configs['YMD'] = pd.Timestamp('2019-04-09 00:00:00')
         
+        # Inputs as given (fingerprinted for the results catalog)
+        self.input_data = (self.passengers, self.vehicles)
+
         # Crop data to simulation time range
         self.passengers, self.vehicles = crop_data_by_timerange(
             self.passengers, self.vehicles, self.configs
         )
+        self.configs['total_requests'] = len(self.passengers)
             
-        # Initialize simulation state variables
-        (self.active_vehicle, self.empty_vehicle, self.requested_passenger, 
-         self.fail_passenger, self.simulation_record) = base_data()
+        # Initialize simulation state store
+        self.state = SimulationState(
+            self.passengers, self.vehicles, self.configs['time_range'], self.configs.get('tick_size', 1)
+        )
+        self.clock = self.state.clock
+
+        # Index passenger requests and vehicle shift starts by tick (built once)
+        self.passenger_arrivals = ArrivalIndex(
+            self.passengers, 'ride_time', self.state.passengers.schema, self.clock
+        )
+        self.vehicle_arrivals = ArrivalIndex(
+            self.vehicles, 'work_start', self.state.vehicles.schema, self.clock
+        )
+        self.start_tick = 0
+        self.aborted = False
+
+        # Open the result writers last (released by run() or close())
+        open_result_files(
+            path_to_save_data,
+            self.configs.get('background_writer', True),
+            self.configs.get('writer_queue_size', 64),
+            self.configs.get('trip_format', 'json')
+        )
+
+    # Resume from a checkpoint, or fork a what-if variant of it into a new result folder
+    # configs: overrides applied on top of the checkpointed configs
+    # vehicles: additional (preprocessed) vehicles joining the fleet from the checkpoint onward
+    @classmethod
+    def from_checkpoint(cls, file_path, configs=None, vehicles=None, fork=False):
+        checkpoint = load_checkpoint(file_path)
+        simulator = cls.__new__(cls)
+
+        # Configs (the clock is part of the state and cannot change)
+        simulator.configs = dict(checkpoint['configs'])
+        for key, value in (configs or {}).items():
+            if key in ('time_range', 'tick_size') and value != simulator.configs.get(key):
+                raise ValueError(f"'{key}' cannot be changed when resuming from a checkpoint")
+            simulator.configs[key] = value
+
+        simulator.extract_main = extract_selector(simulator.configs["problem"])
+        simulator.dispatch_main = dispatch_selector(simulator.configs["problem"])
+        simulator.raw_data = None
+
+        # Result files: cut back to the checkpoint (copied to a new folder when forking)
+        source_path = checkpoint['configs']['save_path']
+        if fork:
+            simulator.configs['save_path'] = generate_path_to_save(
+                simulator.configs['path'],
+                simulator.configs['additional_path']
+            )
+        open_result_files(
+            simulator.configs['save_path'],
+            simulator.configs.get('background_writer', True),
+            simulator.configs.get('writer_queue_size', 64),
+            simulator.configs.get('trip_format', 'json')
+        )
+        restore_result_files(checkpoint['writer_offsets'], simulator.configs['save_path'], source_path)
+
+        simulator.state = checkpoint['state']
+        simulator.clock = simulator.state.clock
+        simulator.start_tick = checkpoint['next_tick']
+        simulator.aborted = False
+        simulator.passengers = checkpoint['passengers']
+        simulator.vehicles = checkpoint['vehicles']
+
+        # Additional vehicles start working at the checkpoint at the earliest
+        if vehicles is not None:
+            resume_time = simulator.clock.time(simulator.start_tick)
+            vehicles = vehicles[vehicles['work_end'] > resume_time].copy()
+            vehicles.loc[vehicles['work_start'] < resume_time, 'work_start'] = resume_time
+            vehicles.loc[vehicles['work_end'] > simulator.clock.end, 'work_end'] = simulator.clock.end
+            simulator.vehicles = pd.concat([simulator.vehicles, vehicles], ignore_index=True)
+        simulator.input_data = (simulator.passengers, simulator.vehicles)
+
+        simulator.passenger_arrivals = ArrivalIndex(
+            simulator.passengers, 'ride_time', simulator.state.passengers.schema, simulator.clock
+        )
+        simulator.vehicle_arrivals = ArrivalIndex(
+            simulator.vehicles, 'work_start', simulator.state.vehicles.schema, simulator.clock
+        )
+        return simulator
+
+    # Stop the route prefetch and release the result writers of a simulator that is
+    # not run (or not run to the end)
+    def close(self):
+        stop_route_prefetch(self.configs['save_path'])
+        close_result_files(self.configs['save_path'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Snapshot the simulation state taken before next_tick
+    def save_checkpoint(self, next_tick, file_path=None):
+        return save_checkpoint(self, next_tick, file_path)
+
+    # DataFrame snapshots of the state pools
+    @property
+    def requested_passenger(self):
+        return self.state.pool_frame(self.state.waiting)
+
+    @property
+    def empty_vehicle(self):
+        return self.state.pool_frame(self.state.idle)
+
+    @property
+    def active_vehicle(self):
+        return self.state.pool_frame(self.state.active)
+
+    @property
+    def simulation_record(self):
+        return self.state.record.to_frame()
     
+    # Advance the simulation by one tick
+    def step(self, tick):
+        time = self.clock.time(tick)
+
+        # Update passenger status (new requests, failures)
+        update_passenger(self.state, self.passenger_arrivals, self.configs, time)
+        
+        # Update vehicle status (active to empty transitions)
+        update_vehicle(self.state, self.vehicle_arrivals, self.configs, time)
+        
+        # Execute dispatch when both requests and vehicles available
+        if (len(self.state.waiting) > 0) and (len(self.state.idle) > 0):
+            self.dispatch_main(self.state, self.configs, time)
+
+        # Record current simulation state
+        checking_progress(self.state, time, self.configs)
+
+    # Next tick at which the state can change (arrival, timer or pending dispatch)
+    def next_event_tick(self, tick):
+        # Unmatched requests and vehicles are retried every tick
+        if (len(self.state.waiting) > 0) and (len(self.state.idle) > 0):
+            return tick + 1
+
+        candidates = [
+            self.passenger_arrivals.next_arrival(tick + 1),
+            self.vehicle_arrivals.next_arrival(tick + 1),
+            self.state.timeouts.next_tick(),
+            self.state.dropoffs.next_tick(),
+            self.state.shift_ends.next_tick(),
+        ]
+        candidates = [tk for tk in candidates if tk is not None]
+        if not candidates:
+            return self.clock.n_ticks
+        return max(min(candidates), tick + 1)
+
+    # Failure count above which 'max_failure_rate' (% of requests) can no longer be met
+    def max_fail_count(self):
+        max_failure_rate = self.configs.get('max_failure_rate')
+        if max_failure_rate is None:
+            return None
+        return max_failure_rate / 100 * self.configs['total_requests']
+
     # Main simulation execution
     def run(self):
         start_time, end_time = self.configs['time_range'][0], self.configs['time_range'][1]
+        event_driven = self.configs.get('execution_mode', 'time_step') == 'event_driven'
+        checkpoint_interval = self.configs.get('checkpoint_interval')
+        max_fail_count = self.max_fail_count()
+        routing_client(self.configs).reset_stats()
         print(f"[Data]  passengers={len(self.passengers)} load completed")
         
-        with tqdm(total=end_time-start_time, 
-                  desc="시뮬레이션", 
-                  unit="분",
-                  ncols=80) as pbar:
-
-            for time in range(start_time, end_time):
-                # Update passenger status (new requests, failures)
-                self.requested_passenger, self.fail_passenger, self.passengers = update_passenger(
-                    self.requested_passenger, 
-                    self.fail_passenger,  
-                    self.passengers, 
-                    self.configs,
-                    time
-                )
-                
-                # Update vehicle status (active to empty transitions)
-                self.active_vehicle, self.empty_vehicle, self.vehicles = update_vehicle(
-                    self.active_vehicle,
-                    self.empty_vehicle, 
-                    self.vehicles,
-                    self.configs,
-                    time
-                )
-                
-                # Execute dispatch when both requests and vehicles available
-                if (len(self.requested_passenger) > 0) and (len(self.empty_vehicle) > 0):
-                    self.requested_passenger, self.active_vehicle, self.empty_vehicle = self.dispatch_main(
-                        self.requested_passenger, 
-                        self.active_vehicle, 
-                        self.empty_vehicle, 
-                        self.configs, 
-                        time
-                    )
-
-                # Record current simulation state
-                self.simulation_record = checking_progress(
-                    self.simulation_record, time, self.requested_passenger, 
-                    self.fail_passenger, self.empty_vehicle, self.active_vehicle, 
-                    self.configs
-                )
-
-                pbar.update(1)
\ No newline at end of file
+        # The prefetch is stopped and the result files are finished even when a tick fails
+        try:
+            prefetch = start_route_prefetch(routing_client(self.configs), self.passengers, self.configs,
+                                            self.clock.time(self.start_tick))
+
+            with tqdm(total=end_time-start_time, 
+                      desc="시뮬레이션", 
+                      unit="분",
+                      ncols=80,
+                      initial=self.start_tick * self.clock.tick_size) as pbar:
+
+                tick = self.start_tick
+                while tick < self.clock.n_ticks:
+                    if prefetch is not None:
+                        prefetch.advance(self.clock.time(tick))
+                    self.step(tick)
+
+                    # Failures only accumulate: stop as soon as the target is out of reach
+                    if max_fail_count is not None and self.state.fail_count > max_fail_count:
+                        self.aborted = True
+                        save_simulation_record(self.state, self.configs)
+                        print(f"[Abort] failures={self.state.fail_count} exceed max_failure_rate at minute {self.clock.minute(tick)}")
+                        break
+
+                    # Event-driven mode jumps over ticks in which nothing happens
+                    next_tick = self.next_event_tick(tick) if event_driven else tick + 1
+                    next_tick = min(next_tick, self.clock.n_ticks)
+                    if next_tick > tick + 1:
+                        carry_progress(self.state, next_tick, self.configs)
+
+                    # Checkpoint whenever an interval boundary is crossed
+                    if checkpoint_interval and next_tick < self.clock.n_ticks:
+                        passed = (self.clock.time(next_tick) - start_time) // checkpoint_interval
+                        if passed > (self.clock.time(tick) - start_time) // checkpoint_interval:
+                            self.save_checkpoint(next_tick)
+
+                    pbar.update((next_tick - tick) * self.clock.tick_size)
+                    tick = next_tick
+        finally:
+            self.close()
+
+        # Routing latency and route cache use of the run
+        client = routing_client(self.configs)
+        latency = client.latency_stats()
+        if latency['calls'] > 0:
+            print(f"[Routing] calls={latency['calls']} mean={latency['mean_ms']}ms "
+                  f"p95={latency['p95_ms']}ms max={latency['max_ms']}ms")
+        if client.cache is not None:
+            client.cache.flush()
+            cache = client.cache.stats()
+            if cache['hits'] + cache['disk_hits'] + cache['misses'] > 0:
+                print(f"[Routing] cache hits={cache['hits']} disk_hits={cache['disk_hits']} "
+                      f"misses={cache['misses']} hit_rate={cache['hit_rate']}%")
+
+        # Event log manifest of the finished run
+        if self.configs.get('event_log'):
+            save_event_manifest(self.state, self.configs, min(tick, self.clock.n_ticks - 1))
+
+        # Index the finished run in the results catalog
+        if catalog_path(self.configs) is not None:
+            register_run(catalog_path(self.configs), self.configs['save_path'], self.configs,
+                         data_fingerprint(*self.input_data), self.aborted)
@@ -0,0 +1,356 @@
+import numpy as np
+import pandas as pd
+
+from .timer_wheel import TimerWheel
+from .clock import SimulationClock
+
+
+# Status codes shared by the engine, dispatch and output writers
+FREE = 0        # Unused slot (on the free-list)
+WAITING = 1     # Passenger waiting for dispatch
+IDLE = 2        # Vehicle on shift without passenger
+ACTIVE = 3      # Vehicle serving a passenger
+
+
+# Passenger columns kept in the state store
+PASSENGER_COLUMNS = ['ID', 'ride_time', 'ride_lat', 'ride_lon', 'alight_lat', 'alight_lon', 'dispatch_time']
+
+# Vehicle columns kept in the state store ('cartype' is added when present in the data)
+VEHICLE_COLUMNS = ['vehicle_id', 'work_end', 'temporary_stopTime', 'lat', 'lon']
+
+# Passenger fields copied onto a vehicle when it is dispatched
+VEHICLE_PASSENGER_FIELDS = {
+    'P_ID': 'ID',
+    'P_ride_lat': 'ride_lat',
+    'P_ride_lon': 'ride_lon',
+    'P_alight_lat': 'alight_lat',
+    'P_alight_lon': 'alight_lon',
+    'P_request_time': 'ride_time',
+    'P_dispatch_time': 'dispatch_time',
+}
+
+
+# Preallocated struct-of-arrays table with a free-list of row slots
+class AgentTable:
+
+    def __init__(self, schema, capacity=256):
+        self.schema = dict(schema)
+        self.capacity = 0
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in self.schema.items()}
+        self.status = np.zeros(0, dtype=np.int8)
+        self.generation = np.zeros(0, dtype=np.int64)
+        self.free_slots = np.empty(0, dtype=np.int64)
+        self.free_count = 0
+        self.grow(capacity)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    # Number of occupied slots
+    def __len__(self):
+        return self.capacity - self.free_count
+
+    # Extend every column and push the new slots onto the free-list
+    def grow(self, capacity):
+        if capacity <= self.capacity:
+            return
+        for name, column in self.columns.items():
+            extended = np.empty(capacity, dtype=column.dtype)
+            extended[:self.capacity] = column
+            self.columns[name] = extended
+
+        status = np.zeros(capacity, dtype=np.int8)
+        status[:self.capacity] = self.status
+        self.status = status
+
+        generation = np.zeros(capacity, dtype=np.int64)
+        generation[:self.capacity] = self.generation
+        self.generation = generation
+
+        # Free-list is a stack; new slots are pushed so that the lowest slot pops first
+        new_slots = np.arange(capacity - 1, self.capacity - 1, -1, dtype=np.int64)
+        free_slots = np.empty(capacity, dtype=np.int64)
+        free_slots[:self.free_count] = self.free_slots[:self.free_count]
+        free_slots[self.free_count:self.free_count + len(new_slots)] = new_slots
+        self.free_slots = free_slots
+        self.free_count += len(new_slots)
+        self.capacity = capacity
+
+    # Take slots from the free-list and fill them with the given column values
+    def insert(self, values, status):
+        n = len(next(iter(values.values())))
+        if n > self.free_count:
+            self.grow(max(self.capacity * 2, self.capacity + n - self.free_count))
+
+        slots = self.free_slots[self.free_count - n:self.free_count][::-1].copy()
+        self.free_count -= n
+
+        for name, column in values.items():
+            self.columns[name][slots] = column
+        self.set_status(slots, status)
+        return slots
+
+    # Change slot status; bumping the generation invalidates pending timers
+    def set_status(self, slots, status):
+        self.status[slots] = status
+        self.generation[slots] += 1
+
+    # Return slots to the free-list
+    def release(self, slots):
+        slots = np.asarray(slots, dtype=np.int64)
+        self.set_status(slots, FREE)
+        self.free_slots[self.free_count:self.free_count + len(slots)] = slots[::-1]
+        self.free_count += len(slots)
+
+    # Column view over a list of slots
+    def view(self, slots):
+        return TableView(self, slots)
+
+
+# Read-only, lazily gathered view of selected table rows
+class TableView:
+
+    def __init__(self, table, slots):
+        self.table = table
+        self.slots = np.asarray(slots, dtype=np.int64)
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            self._cache[name] = self.table[name][self.slots]
+        return self._cache[name]
+
+    @property
+    def columns(self):
+        return list(self.table.columns)
+
+    # Sub-view by row positions within this view
+    def take(self, positions):
+        return TableView(self.table, self.slots[positions])
+
+    def to_frame(self, columns=None):
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({name: self[name] for name in columns})
+
+
+# Insertion-ordered set of table slots with O(1) add and remove
+class SlotPool:
+
+    def __init__(self, capacity=256):
+        self.members = np.empty(capacity, dtype=np.int64)
+        self.position = np.full(capacity, -1, dtype=np.int64)
+        self.order = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self.sequence = 0
+
+    def __len__(self):
+        return self.size
+
+    def _ensure(self, slot_capacity):
+        if slot_capacity <= len(self.position):
+            return
+        capacity = max(slot_capacity, len(self.position) * 2)
+        members = np.empty(capacity, dtype=np.int64)
+        members[:self.size] = self.members[:self.size]
+        position = np.full(capacity, -1, dtype=np.int64)
+        position[:len(self.position)] = self.position
+        order = np.zeros(capacity, dtype=np.int64)
+        order[:len(self.order)] = self.order
+        self.members, self.position, self.order = members, position, order
+
+    # Append slots at the end of the pool order
+    def add(self, slots):
+        slots = np.asarray(slots, dtype=np.int64)
+        if len(slots) == 0:
+            return
+        self._ensure(int(slots.max()) + 1)
+        n = len(slots)
+        self.members[self.size:self.size + n] = slots
+        self.position[slots] = np.arange(self.size, self.size + n)
+        self.order[slots] = np.arange(self.sequence, self.sequence + n)
+        self.size += n
+        self.sequence += n
+
+    # Remove slots by swapping each with the last member
+    def remove(self, slots):
+        members, position = self.members, self.position
+        for slot in np.asarray(slots, dtype=np.int64).tolist():
+            idx = position[slot]
+            last = members[self.size - 1]
+            members[idx] = last
+            position[last] = idx
+            position[slot] = -1
+            self.size -= 1
+
+    def __contains__(self, slot):
+        return slot < len(self.position) and self.position[slot] >= 0
+
+    # Members in insertion order
+    def slots(self):
+        members = self.members[:self.size]
+        return members[np.argsort(self.order[members], kind='stable')]
+
+    # Sort a subset of members into pool order
+    def sort(self, slots):
+        slots = np.asarray(slots, dtype=np.int64)
+        return slots[np.argsort(self.order[slots], kind='stable')]
+
+
+# Preallocated per-minute simulation record (last tick of each minute wins)
+class RecordBuffer:
+
+    columns = ['time', 'waiting_passenger_cnt', 'fail_passenger_cnt', 'empty_vehicle_cnt', 'driving_vehicle_cnt']
+
+    def __init__(self, time_range):
+        self.start = time_range[0]
+        length = time_range[1] - time_range[0]
+        self.data = {name: np.zeros(length, dtype=np.int64) for name in self.columns}
+        self.data['time'][:] = np.arange(time_range[0], time_range[1])
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, minute, waiting, fail, empty, driving):
+        row = minute - self.start
+        self.data['waiting_passenger_cnt'][row] = waiting
+        self.data['fail_passenger_cnt'][row] = fail
+        self.data['empty_vehicle_cnt'][row] = empty
+        self.data['driving_vehicle_cnt'][row] = driving
+        self.size = row + 1
+
+    # Repeat the last recorded counts up to (not including) the given minute
+    def carry_forward(self, minute):
+        last, until = self.size - 1, minute - self.start
+        if until <= self.size:
+            return
+        for name in self.columns[1:]:
+            self.data[name][last + 1:until] = self.data[name][last]
+        self.size = until
+
+    def __getitem__(self, name):
+        return self.data[name][:self.size]
+
+    def to_frame(self):
+        record = pd.DataFrame({name: self[name] for name in self.columns})
+        record['iter_time(second)'] = np.nan
+        return record
+
+
+# Complete mutable simulation state: agent tables, pools and the record buffer
+class SimulationState:
+
+    def __init__(self, passengers, vehicles, time_range, tick_size=1):
+        self.clock = SimulationClock(time_range, tick_size)
+
+        passenger_schema = {name: _column_dtype(passengers, name) for name in PASSENGER_COLUMNS}
+
+        vehicle_columns = list(VEHICLE_COLUMNS)
+        if 'cartype' in vehicles.columns:
+            vehicle_columns.insert(1, 'cartype')
+        vehicle_schema = {name: _column_dtype(vehicles, name) for name in vehicle_columns}
+        for field, source in VEHICLE_PASSENGER_FIELDS.items():
+            vehicle_schema[field] = passenger_schema[source]
+        vehicle_schema['P_disembark_time'] = np.float64
+
+        self.passengers = AgentTable(passenger_schema)
+        self.vehicles = AgentTable(vehicle_schema)
+
+        self.waiting = SlotPool()   # passenger slots waiting for dispatch
+        self.idle = SlotPool()      # vehicle slots on shift without passenger
+        self.active = SlotPool()    # vehicle slots serving a passenger
+
+        # Expiration timers: passenger timeouts, trip completions and shift ends
+        self.timeouts = TimerWheel(self.passengers)
+        self.dropoffs = TimerWheel(self.vehicles)
+        self.shift_ends = TimerWheel(self.vehicles)
+
+        self.fail_count = 0
+        self.record = RecordBuffer(time_range)
+
+    # Add arriving passengers to the waiting pool and schedule their timeout
+    # (dispatch_time grows with the time since the request; the passenger fails
+    # at the first later tick where it reaches fail_time)
+    def add_passengers(self, values, tick, fail_time):
+        slots = self.passengers.insert(values, WAITING)
+        self.waiting.add(slots)
+
+        passengers = self.passengers
+        fail_at = passengers['ride_time'][slots] + fail_time - passengers['dispatch_time'][slots]
+        self.timeouts.schedule(slots, np.maximum(self.clock.ticks_at_or_after(fail_at), tick + 1))
+        return slots
+
+    # Add vehicles starting their shift to the idle pool
+    def add_vehicles(self, values, tick):
+        slots = self.vehicles.insert(values, IDLE)
+        self.idle.add(slots)
+        self.schedule_shift_end(slots, tick)
+        return slots
+
+    # Schedule the end of shift of idle vehicles (work_end within 5 minutes)
+    def schedule_shift_end(self, slots, tick):
+        end_tick = self.clock.ticks_after(self.vehicles['work_end'][slots] - 5)
+        self.shift_ends.schedule(slots, np.maximum(end_tick, tick))
+
+    # Bring dispatch_time of waiting passengers up to the given tick
+    def accrue_waiting(self, slots, tick):
+        passengers = self.passengers
+        passengers['dispatch_time'][slots] += self.clock.time(tick) - passengers['ride_time'][slots]
+
+    # Move waiting passengers to the failed count and free their slots
+    def fail_passengers(self, slots):
+        self.waiting.remove(slots)
+        self.passengers.release(slots)
+        self.fail_count += len(slots)
+
+    # Pair passengers with idle vehicles and move the vehicles to the active pool
+    def assign(self, passenger_slots, vehicle_slots, tick):
+        self.accrue_waiting(passenger_slots, tick)
+        for field, source in VEHICLE_PASSENGER_FIELDS.items():
+            self.vehicles[field][vehicle_slots] = self.passengers[source][passenger_slots]
+        self.vehicles['P_disembark_time'][vehicle_slots] = 0
+
+        self.waiting.remove(passenger_slots)
+        self.passengers.release(passenger_slots)
+
+        self.idle.remove(vehicle_slots)
+        self.active.add(vehicle_slots)
+        self.vehicles.set_status(vehicle_slots, ACTIVE)
+
+    # Schedule drop-off of dispatched vehicles (first later tick at or after disembark time)
+    def schedule_dropoff(self, slots, tick):
+        dropoff_tick = self.clock.ticks_at_or_after(self.vehicles['P_disembark_time'][slots])
+        self.dropoffs.schedule(slots, np.maximum(dropoff_tick, tick + 1))
+
+    # Move vehicles that dropped off their passenger back to the idle pool
+    def release_vehicles(self, slots, tick):
+        self.active.remove(slots)
+        self.idle.add(slots)
+        self.vehicles.set_status(slots, IDLE)
+        self.schedule_shift_end(slots, tick)
+
+    # Remove vehicles ending their shift
+    def retire_vehicles(self, slots):
+        self.idle.remove(slots)
+        self.vehicles.release(slots)
+
+    # DataFrame snapshot of a pool (for inspection and notebooks)
+    def pool_frame(self, pool):
+        table = self.passengers if pool is self.waiting else self.vehicles
+        return table.view(pool.slots()).to_frame()
+
+
+# Storage dtype for a data column
+def _column_dtype(data, name):
+    dtype = data[name].dtype
+    if not np.issubdtype(dtype, np.number):
+        return object
+    if name in ('ID', 'vehicle_id', 'cartype'):
+        return dtype
+    return np.float64
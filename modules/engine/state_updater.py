@@ -1,145 +1,89 @@
-import pandas as pd
 import numpy as np
 
-from .io_manager import save_json_data
+from .io_manager import save_json_data, save_events, fail_passenger_markers, vehicle_markers
 
 
 # Update passenger status (new requests, failures)
-def update_passenger(requested_passenger, fail_passenger, passenger, simul_configs, time):
+def update_passenger(state, passenger_arrivals, simul_configs, time):
     fail_time = simul_configs['fail_time']
     save_path = simul_configs['save_path']
-    
-    # Extract passengers requesting at current time
-    current_requested_passenger = passenger[passenger['ride_time'] == time]
-    passenger = passenger[passenger['ride_time'] != time].reset_index(drop=True)
-    
-    if len(requested_passenger) > 0:
-        # Increment dispatch waiting time
-        requested_passenger['dispatch_time'] = requested_passenger['dispatch_time'] + 1
-        
-        # Move passengers exceeding fail time to failed status
-        current_fail_passenger = requested_passenger[requested_passenger['dispatch_time'] >= fail_time]
-        fail_passenger = pd.concat([fail_passenger, current_fail_passenger])
-        fail_passenger = fail_passenger.reset_index(drop=True)
-        
-        if len(current_fail_passenger) > 0:
-            # Keep only passengers under fail time threshold
-            requested_passenger = requested_passenger[requested_passenger['dispatch_time'] < fail_time]
-            
-            # Save failed passenger markers
-            current_fail_passenger = [
-                {
-                    'passenger_id': row['ID'], 
-                    'status': 0,
-                    'location': [row['ride_lon'], row['ride_lat']], 
-                    'timestamp': [row['ride_time'], row['ride_time'] + row['dispatch_time']]
-                }
-                for _, row in current_fail_passenger.iterrows()
-            ]
-            
-            save_json_data(current_fail_passenger, save_path, file_name='passenger_marker')
-            del current_fail_passenger
-    
-    # Add new requests to active passenger pool
-    requested_passenger = pd.concat([requested_passenger, current_requested_passenger])
-    requested_passenger = requested_passenger.reset_index(drop=True)
-    
-    return requested_passenger, fail_passenger, passenger
+    tick = state.clock.tick(time)
+
+    # Move passengers whose waiting time reached fail time to failed status
+    fail_slots = state.timeouts.pop_due(tick)
+
+    if len(fail_slots) > 0:
+        fail_slots = state.waiting.sort(fail_slots)
+        state.accrue_waiting(fail_slots, tick)
+
+        # Save failed passenger markers
+        save_json_data(fail_passenger_markers(state, fail_slots), save_path, file_name='passenger_marker')
+        passengers = state.passengers.view(fail_slots)
+        save_events(simul_configs, 'fail', time, passenger_id=passengers['ID'],
+                    time=passengers['ride_time'] + passengers['dispatch_time'], since=passengers['ride_time'],
+                    lon=passengers['ride_lon'], lat=passengers['ride_lat'])
+        state.fail_passengers(fail_slots)
+
+    # Add passengers requesting at current time to active passenger pool
+    if passenger_arrivals.count(tick) > 0:
+        slots = state.add_passengers(passenger_arrivals.arrivals(tick), tick, fail_time)
+        passengers = state.passengers.view(slots)
+        save_events(simul_configs, 'request', time, passenger_id=passengers['ID'], time=passengers['ride_time'],
+                    lon=passengers['ride_lon'], lat=passengers['ride_lat'])
 
 
 # Update vehicle status (work start, passenger drop-off, work end)
-def update_vehicle(active_vehicle, empty_vehicle, vehicle, simul_configs, time):
+def update_vehicle(state, vehicle_arrivals, simul_configs, time):
     save_path = simul_configs['save_path']
-    
+    vehicles = state.vehicles
+    tick = state.clock.tick(time)
+
     # Process vehicles starting work
-    current_start_vehicle = vehicle[vehicle['work_start'] == time]
-    
-    if len(current_start_vehicle) > 0:
-        # Select columns based on available data
-        if 'cartype' in current_start_vehicle.columns:
-            current_start_vehicle = current_start_vehicle[[
-                'vehicle_id', 'cartype', 'work_end', 'temporary_stopTime', 'lat', 'lon'
-            ]]
-        else:
-            current_start_vehicle = current_start_vehicle[[
-                'vehicle_id', 'work_end', 'temporary_stopTime', 'lat', 'lon'
-            ]]
-        
-        # Initialize passenger fields for empty vehicles
-        current_start_vehicle['temporary_stopTime'] = time
-        current_start_vehicle['P_ID'] = np.nan
-        current_start_vehicle['P_ride_lat'] = np.nan
-        current_start_vehicle['P_ride_lon'] = np.nan
-        current_start_vehicle['P_alight_lat'] = np.nan
-        current_start_vehicle['P_alight_lon'] = np.nan
-        current_start_vehicle['P_request_time'] = np.nan
-        current_start_vehicle['P_disembark_time'] = np.nan
-        
-        empty_vehicle = pd.concat([empty_vehicle, current_start_vehicle])
-        empty_vehicle = empty_vehicle.reset_index(drop=True)
-        
-        # Remove started vehicles from pending pool
-        vehicle = vehicle[vehicle['work_start'] != time].reset_index(drop=True)
-        
-    # Process passenger drop-offs
-    if len(active_vehicle) > 0:
-        current_empty_vehicle = active_vehicle[active_vehicle['P_disembark_time'] <= time].copy()
-        
-        if len(current_empty_vehicle) > 0:
-            # Update vehicle location to drop-off point
-            current_empty_vehicle['lat'] = current_empty_vehicle['P_alight_lat']
-            current_empty_vehicle['lon'] = current_empty_vehicle['P_alight_lon']
-            current_empty_vehicle['temporary_stopTime'] = current_empty_vehicle['P_disembark_time']
-            
-            # Clear passenger fields
-            current_empty_vehicle['P_ID'] = np.nan
-            current_empty_vehicle['P_ride_lat'] = np.nan
-            current_empty_vehicle['P_ride_lon'] = np.nan
-            current_empty_vehicle['P_alight_lat'] = np.nan
-            current_empty_vehicle['P_alight_lon'] = np.nan
-            current_empty_vehicle['P_disembark_time'] = np.nan
-        
-            empty_vehicle = pd.concat([empty_vehicle, current_empty_vehicle])
-            empty_vehicle = empty_vehicle.reset_index(drop=True)
-            
-            # Keep only vehicles still in transit
-            active_vehicle = active_vehicle[active_vehicle['P_disembark_time'] > time]
-            active_vehicle = active_vehicle.reset_index(drop=True)
-            
-    # Process vehicles ending work
-    if len(empty_vehicle) > 0:
-        # Find vehicles approaching work end (within 5 minutes)
-        end_vehicle = empty_vehicle[empty_vehicle['work_end'] < time + 5]
-        end_vehicle = end_vehicle[end_vehicle['temporary_stopTime'] != time]
-    
-        empty_vehicle = empty_vehicle[empty_vehicle['work_end'] >= time + 5]
-        empty_vehicle = empty_vehicle.reset_index(drop=True)
-        
-        if len(end_vehicle) > 0:
-            # Save vehicle markers (excluding NaN stopTime cases)
-            if 'cartype' in current_start_vehicle.columns:
-                end_vehicle = [
-                    {
-                        'vehicle_id': row['vehicle_id'], 
-                        'cartype': row['cartype'],
-                        'location': [row['lon'], row['lat']], 
-                        'timestamp': [row['temporary_stopTime'], time]
-                    }
-                    for _, row in end_vehicle.iterrows() 
-                    if not np.isnan(row['temporary_stopTime'])
-                ]
-            else:
-                end_vehicle = [
-                    {
-                        'vehicle_id': row['vehicle_id'],
-                        'location': [row['lon'], row['lat']], 
-                        'timestamp': [row['temporary_stopTime'], time]
-                    }
-                    for _, row in end_vehicle.iterrows() 
-                    if not np.isnan(row['temporary_stopTime'])
-                ]
-            
-            save_json_data(end_vehicle, save_path, file_name='vehicle_marker')
-            del end_vehicle
-    
-    return active_vehicle, empty_vehicle, vehicle
\ No newline at end of file
+    start_count = vehicle_arrivals.count(tick)
+
+    if start_count > 0:
+        # Initialize empty vehicles at their start location
+        start_values = vehicle_arrivals.arrivals(tick)
+        start_values['temporary_stopTime'] = np.full(start_count, time, dtype=np.float64)
+        slots = state.add_vehicles(start_values, tick)
+        save_events(simul_configs, 'shift_start', time, time=time, **_vehicle_fields(state, slots))
+
+    # Process passenger drop-offs due at current time
+    dropped_slots = state.dropoffs.pop_due(tick)
+
+    if len(dropped_slots) > 0:
+        dropped_slots = state.active.sort(dropped_slots)
+
+        # Update vehicle location to drop-off point
+        vehicles['lat'][dropped_slots] = vehicles['P_alight_lat'][dropped_slots]
+        vehicles['lon'][dropped_slots] = vehicles['P_alight_lon'][dropped_slots]
+        vehicles['temporary_stopTime'][dropped_slots] = vehicles['P_disembark_time'][dropped_slots]
+
+        state.release_vehicles(dropped_slots, tick)
+
+    # Process vehicles ending work (idle with work end within 5 minutes)
+    end_slots = state.shift_ends.pop_due(tick)
+
+    if len(end_slots) > 0:
+        end_slots = state.idle.sort(end_slots)
+
+        # Save vehicle markers (vehicles that started this tick leave no marker)
+        stop_time = vehicles['temporary_stopTime'][end_slots]
+        marker_slots = end_slots[(stop_time != time) & ~np.isnan(stop_time)]
+
+        if len(marker_slots) > 0:
+            save_json_data(vehicle_markers(state, marker_slots, time), save_path, file_name='vehicle_marker')
+
+        save_events(simul_configs, 'shift_end', time, time=time, since=stop_time, **_vehicle_fields(state, end_slots))
+        state.retire_vehicles(end_slots)
+
+
+# Event fields of vehicles: id, cartype (NaN without cartype data) and location
+def _vehicle_fields(state, slots):
+    vehicles = state.vehicles.view(slots)
+    return {
+        'vehicle_id': vehicles['vehicle_id'],
+        'cartype': vehicles['cartype'] if 'cartype' in state.vehicles else np.nan,
+        'lon': vehicles['lon'],
+        'lat': vehicles['lat'],
+    }
@@ -0,0 +1,189 @@
+"""
+Parameter sweep over simul_configs overrides
+
+Runs every configuration of a grid concurrently on shared preprocessed inputs
+and writes one summary table. Each configuration is stored in a folder named
+after its config hash, so configurations that already ran are reused.
+
+Usage:
+    python -m modules.engine.sweep --grid '{"num_taxis": [600, 800, 950], "fail_time": [10, 15]}'
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import itertools
+import pandas as pd
+from multiprocess import Pool
+
+from .simulator import Simulator
+from .config_manager import base_configs
+from ..preprocess.data_preprocessor import get_preprocessed_data
+from ..analytics.results_catalog import RUNTIME_KEYS, CATALOG_FILE, data_fingerprint, config_hash, run_summary as summarize_result
+
+
+# Sweep-only override: number of vehicles taken from the head of the vehicle data
+FLEET_SIZE_KEY = 'num_taxis'
+
+# Summary file of a finished configuration (marks the folder as reusable)
+SUMMARY_FILE = 'summary.json'
+
+
+# Expand a grid {key: [values]} (or a list of override dicts) into override dicts
+def expand_grid(grid):
+    if isinstance(grid, dict):
+        keys = list(grid.keys())
+        values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+        return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+    return [dict(overrides) for overrides in grid]
+
+
+# Preprocessed inputs shared by every configuration of a worker process
+_shared_data = {}
+
+
+def _init_worker(passengers, vehicles):
+    _shared_data['passengers'] = passengers
+    _shared_data['vehicles'] = vehicles
+
+
+# Run one configuration (or reuse its finished folder) and return its summary
+def _run_configuration(job):
+    configs, folder_path = job
+    summary_path = os.path.join(folder_path, SUMMARY_FILE)
+    if os.path.isfile(summary_path):
+        with open(summary_path, 'r') as f:
+            return json.load(f)
+
+    # Remove leftovers of an interrupted run
+    if os.path.isdir(folder_path):
+        shutil.rmtree(folder_path)
+
+    configs = dict(configs)
+    vehicles = fleet_vehicles(_shared_data['vehicles'], configs.pop(FLEET_SIZE_KEY, None))
+
+    simulator = Simulator(passengers=_shared_data['passengers'], vehicles=vehicles, configs=configs)
+    simulator.run()
+
+    summary = summarize_result(configs['save_path'])
+    summary['aborted'] = simulator.aborted
+    with open(os.path.join(configs['save_path'], SUMMARY_FILE), 'w') as f:
+        json.dump(summary, f)
+    return summary
+
+
+# Vehicles of a fleet size (all vehicles if None)
+def fleet_vehicles(vehicles, fleet_size):
+    if fleet_size is None:
+        return vehicles
+    return vehicles.head(fleet_size).reset_index(drop=True)
+
+
+# Worker pool holding the shared inputs (None runs jobs in this process)
+def sweep_pool(passengers, vehicles, processes):
+    if processes == 1:
+        _init_worker(passengers, vehicles)
+        return None
+    return Pool(processes, initializer=_init_worker, initargs=(passengers, vehicles))
+
+
+# Run jobs (configs, folder_path) and return their summaries in order
+# Jobs sharing a result folder (duplicate configurations) run once and share the summary.
+def run_jobs(jobs, pool=None):
+    unique_jobs = list({folder_path: (configs, folder_path) for configs, folder_path in jobs}.values())
+    if pool is None:
+        summaries = [_run_configuration(job) for job in unique_jobs]
+    else:
+        summaries = pool.map(_run_configuration, unique_jobs, chunksize=1)
+    summaries = {folder_path: summary for (_, folder_path), summary in zip(unique_jobs, summaries)}
+    return [summaries[folder_path] for _, folder_path in jobs]
+
+
+# Build the jobs of a list of overrides: configs plus the hashed result folder of each
+# The hash covers what the job's Simulator receives (configs without 'num_taxis' and the
+# fleet-limited vehicles), so folder names match the config_hash of the results catalog.
+def sweep_jobs(configs, overrides_list, passengers, vehicles):
+    sweep_name = configs.get('additional_path') or 'sweep'
+    base_path = os.path.join(os.getcwd(), 'simul_result', sweep_name)
+    os.makedirs(base_path, exist_ok=True)
+
+    fingerprints = {}
+    jobs = []
+    for overrides in overrides_list:
+        run_configs = dict(configs)
+        run_configs.update(overrides)
+        run_configs['view_operation_graph'] = False
+        run_configs['additional_path'] = sweep_name
+        run_configs['results_catalog'] = run_configs.get('results_catalog') or CATALOG_FILE
+
+        fleet_size = run_configs.get(FLEET_SIZE_KEY)
+        if fleet_size not in fingerprints:
+            fingerprints[fleet_size] = data_fingerprint(passengers, fleet_vehicles(vehicles, fleet_size))
+        simulated_configs = {key: value for key, value in run_configs.items() if key != FLEET_SIZE_KEY}
+
+        folder_name = f"config_{config_hash(simulated_configs, fingerprints[fleet_size])}"
+        run_configs['path'] = folder_name
+        jobs.append((run_configs, os.path.join(base_path, folder_name)))
+    return base_path, jobs
+
+
+# Run a parameter sweep and return the consolidated summary table
+# grid: {key: [values]} or a list of override dicts applied on top of configs;
+#       'num_taxis' limits the fleet to the first N vehicles
+def run_sweep(passengers, vehicles, configs, grid, processes=None, summary_file='sweep_summary.csv'):
+    overrides_list = expand_grid(grid)
+    base_path, jobs = sweep_jobs(configs, overrides_list, passengers, vehicles)
+
+    n_configurations = len({folder_path for _, folder_path in jobs})
+    processes = processes or min(n_configurations, os.cpu_count() or 1)
+    print(f"[Sweep] {n_configurations} configurations on {processes} processes")
+
+    pool = sweep_pool(passengers, vehicles, processes)
+    try:
+        summaries = run_jobs(jobs, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    rows = []
+    for overrides, (_, folder_path), summary in zip(overrides_list, jobs, summaries):
+        rows.append({**overrides, 'folder': os.path.basename(folder_path), **summary})
+    summary_table = pd.DataFrame(rows)
+
+    if summary_file is not None:
+        summary_table.to_csv(os.path.join(base_path, summary_file), index=False)
+    return summary_table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parameter sweep over simulation configs')
+    parser.add_argument('--grid', required=True,
+                        help='JSON grid {"key": [values]} or list of override dicts')
+    parser.add_argument('--configs', default='{}', help='JSON overrides applied to every configuration')
+    parser.add_argument('--time-range', nargs=2, type=int, default=None, metavar=('START', 'END'))
+    parser.add_argument('--additional-path', default='sweep', help='Folder under simul_result')
+    parser.add_argument('--passengers', default='./data/agents/passenger/passenger_data.csv')
+    parser.add_argument('--vehicles', default='./data/agents/vehicle/vehicle_data.csv')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    configs = base_configs.copy()
+    configs.update(json.loads(args.configs))
+    configs['additional_path'] = args.additional_path
+    if args.time_range is not None:
+        configs['time_range'] = args.time_range
+
+    # Read and preprocess the inputs once for every configuration
+    passengers = pd.read_csv(args.passengers)
+    vehicles = pd.read_csv(args.vehicles)
+    passengers, vehicles = get_preprocessed_data(passengers, vehicles, configs)
+
+    summary_table = run_sweep(passengers, vehicles, configs, json.loads(args.grid), args.processes)
+    print(summary_table.to_string(index=False))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
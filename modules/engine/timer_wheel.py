@@ -0,0 +1,52 @@
+import heapq
+import numpy as np
+
+
+# Calendar-style timer wheel for agent expirations
+# Each occupied tick owns a bucket of (slot, generation) entries and a min-heap
+# keeps the occupied ticks in order, so firing a tick only touches the timers
+# that are due. Timers are cancelled lazily: an entry is stale when the slot's
+# generation in the owning AgentTable has moved on since it was scheduled.
+class TimerWheel:
+
+    def __init__(self, table):
+        self.table = table
+        self.buckets = {}
+        self.ticks = []
+
+    def __len__(self):
+        return sum(len(slots) for bucket in self.buckets.values() for slots, _ in bucket)
+
+    # Schedule timers for slots at the given (integer) ticks
+    def schedule(self, slots, ticks):
+        slots = np.asarray(slots, dtype=np.int64)
+        if len(slots) == 0:
+            return
+        ticks = np.broadcast_to(np.asarray(ticks, dtype=np.int64), slots.shape)
+        generation = self.table.generation[slots]
+
+        for tick in np.unique(ticks).tolist():
+            mask = ticks == tick
+            if tick not in self.buckets:
+                self.buckets[tick] = []
+                heapq.heappush(self.ticks, tick)
+            self.buckets[tick].append((slots[mask], generation[mask]))
+
+    # Remove and return the live slots of every bucket due at or before tick
+    def pop_due(self, tick):
+        due_slots, due_generation = [], []
+        while self.ticks and self.ticks[0] <= tick:
+            for slots, generation in self.buckets.pop(heapq.heappop(self.ticks)):
+                due_slots.append(slots)
+                due_generation.append(generation)
+
+        if not due_slots:
+            return np.empty(0, dtype=np.int64)
+
+        slots = np.concatenate(due_slots)
+        generation = np.concatenate(due_generation)
+        return slots[self.table.generation[slots] == generation]
+
+    # Earliest occupied tick (None when no timer is pending)
+    def next_tick(self):
+        return self.ticks[0] if self.ticks else None
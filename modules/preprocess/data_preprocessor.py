@@ -5,7 +5,7 @@ import copy
 import warnings
 from datetime import datetime
 
-from modules.utils.distance_utils import filter_outside_region
+from modules.utils.distance_utils import filter_outside_region, METERS_PER_DEGREE
 
 warnings.filterwarnings('ignore')
 
@@ -63,6 +63,48 @@ def get_preprocessed_data(passengers, vehicles, configs):
     return passengers, vehicles
 
 
+# Settings through which perturb_data varies the inputs of replications
+JITTER_KEYS = ['demand_jitter', 'shift_jitter', 'placement_jitter']
+
+
+# Whether perturb_data changes the inputs (any jitter set), i.e. seeds differ in anything
+def has_jitter(configs):
+    return any(configs.get(key, 0) for key in JITTER_KEYS)
+
+
+# Randomly perturb agent data for one replication (seeded)
+# demand_jitter: shift each request time uniformly within +-N minutes
+# shift_jitter: shift each vehicle shift (start and end) uniformly within +-N minutes
+# placement_jitter: move each vehicle start position uniformly within +-N meters
+def perturb_data(passengers, vehicles, configs, seed=None):
+    rng = np.random.default_rng(configs.get('random_seed') if seed is None else seed)
+    tick_size = configs.get('tick_size', 1)
+    passengers, vehicles = passengers.copy(), vehicles.copy()
+
+    demand_jitter = configs.get('demand_jitter', 0)
+    if demand_jitter:
+        offset = rng.uniform(-demand_jitter, demand_jitter, len(passengers))
+        ride_time = np.floor((passengers['ride_time'] + offset) / tick_size) * tick_size
+        if float(tick_size).is_integer():
+            ride_time = ride_time.astype('int')
+        passengers['ride_time'] = ride_time
+
+    shift_jitter = configs.get('shift_jitter', 0)
+    if shift_jitter:
+        offset = rng.uniform(-shift_jitter, shift_jitter, len(vehicles))
+        vehicles['work_start'] = vehicles['work_start'] + offset
+        vehicles['work_end'] = vehicles['work_end'] + offset
+
+    placement_jitter = configs.get('placement_jitter', 0)
+    if placement_jitter:
+        lat_offset = rng.uniform(-placement_jitter, placement_jitter, len(vehicles)) / METERS_PER_DEGREE
+        lon_offset = rng.uniform(-placement_jitter, placement_jitter, len(vehicles)) / METERS_PER_DEGREE
+        vehicles['lon'] = vehicles['lon'] + lon_offset / np.cos(np.deg2rad(vehicles['lat']))
+        vehicles['lat'] = vehicles['lat'] + lat_offset
+
+    return passengers, vehicles
+
+
 # Crop data to simulation time range
 def crop_data_by_timerange(passengers, vehicles, inform):
     start_time, end_time = inform['time_range']
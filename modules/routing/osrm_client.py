@@ -1,54 +1,206 @@
+import os
+import time
 import numpy as np
 import itertools
+from array import array
 import requests
 import polyline
 import warnings 
+from concurrent.futures import ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 from modules.utils.distance_utils import calculate_straight_distance
+from .route_cache import RouteCache, ROUTE_CACHE_MB
 
 warnings.filterwarnings('ignore')
 
-# Main OSRM routing function
-def osrm_routing_machine(OD_coords):
-    osrm_base, status = get_res(OD_coords)
-    
-    if status == 'defined':
-        duration, distance = extract_duration_distance(osrm_base)
-        route = extract_route(osrm_base)
-        timestamp = extract_timestamp(route, duration)
-        
-        result = {'route': route, 'timestamp': timestamp, 'duration': duration, 'distance': distance}
-        
-        # Handle edge case with NaN timestamp
-        if np.isnan(result['timestamp'][-1]):
-            result['timestamp'][-1] = 0.01
-            result['duration'] = 0.01
-            
+# Routing client defaults (shared with base_configs)
+OSRM_BASE_URL = 'http://127.0.0.1:8000'
+OSRM_POOL_SIZE = 10
+OSRM_CONCURRENCY = 1
+
+
+# Long-lived OSRM routing client
+# One requests.Session with a keep-alive connection pool (pool_size connections to
+# the server) is reused for every request; timeout is passed to requests (seconds,
+# or a (connect, read) pair; None waits indefinitely). route_many sends up to
+# concurrency requests at once from a persistent thread pool. Routes are looked up
+# in the optional RouteCache first. The latency of every call is kept so that runs
+# can report it.
+class OSRMClient:
+
+    def __init__(self, base_url=OSRM_BASE_URL, timeout=None, pool_size=OSRM_POOL_SIZE, concurrency=OSRM_CONCURRENCY, cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cache = cache
+        self.concurrency = max(int(concurrency or 1), 1)
+        self.executor = None
+        if self.concurrency > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='osrm')
+        pool_size = max(pool_size, self.concurrency)
+        self.session = requests.Session()
+        retry = Retry(connect=10, backoff_factor=1)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.latencies = array('d')
+
+    # GET a service path, recording its latency
+    def get(self, path):
+        started = time.perf_counter()
+        try:
+            return self.session.get(self.base_url + path, timeout=self.timeout)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    # Route between two points (OD_coords: [lat, lon, lat, lon])
+    def route(self, OD_coords):
+        if self.cache is None:
+            return self.fetch_route(OD_coords)
+
+        OD_coords = self.cache.snap(OD_coords)
+        result = self.cache.get(OD_coords)
+        if result is None:
+            result = self.fetch_route(OD_coords)
+            if result is None:
+                return None
+            self.cache.put(OD_coords, result)
         return result
-    else: 
+
+    # Route from the OSRM server (None if the request failed)
+    def fetch_route(self, OD_coords):
+        osrm_base, status = get_res(OD_coords, self)
+
+        if status == 'defined':
+            duration, distance = extract_duration_distance(osrm_base)
+            route = extract_route(osrm_base)
+            timestamp = extract_timestamp(route, duration)
+
+            result = {'route': route, 'timestamp': timestamp, 'duration': duration, 'distance': distance}
+
+            # Handle edge case with NaN timestamp
+            if np.isnan(result['timestamp'][-1]):
+                result['timestamp'][-1] = 0.01
+                result['duration'] = 0.01
+
+            return result
+        else:
+            return None
+
+    # Route several OD pairs concurrently (results in input order)
+    def route_many(self, OD_list):
+        OD_list = list(OD_list)
+        return self.map(self.route, OD_list)
+
+    # Distance matrix in meters from sources to destinations ([lat, lon] points) through
+    # the table service (no geometry); requests hold at most max_size coordinates
+    def table(self, sources, destinations, max_size=100):
+        sources, destinations = list(sources), list(destinations)
+        distances = np.zeros((len(sources), len(destinations)))
+        if len(sources) == 0 or len(destinations) == 0:
+            return distances
+
+        # Split the larger side first so that every block fits into max_size coordinates
+        max_size = max(int(max_size), 2)
+        dst_step = min(len(destinations), max(max_size - min(len(sources), max_size // 2), 1))
+        src_step = max(max_size - dst_step, 1)
+        blocks = [(i, j) for i in range(0, len(sources), src_step) for j in range(0, len(destinations), dst_step)]
+
+        def block_distances(block):
+            i, j = block
+            return get_table(sources[i:i + src_step], destinations[j:j + dst_step], self)
+
+        for (i, j), block in zip(blocks, self.map(block_distances, blocks)):
+            distances[i:i + src_step, j:j + dst_step] = block
+        return distances
+
+    # Apply func to items on the thread pool (results in input order)
+    def map(self, func, items):
+        items = list(items)
+        if self.executor is None or len(items) <= 1:
+            return [func(item) for item in items]
+        return list(self.executor.map(func, items))
+
+    # Per-call latency summary in milliseconds
+    def latency_stats(self):
+        if len(self.latencies) == 0:
+            return {'calls': 0}
+        latencies = np.frombuffer(self.latencies, dtype='float64') * 1000
+        return {
+            'calls': len(latencies),
+            'mean_ms': round(float(latencies.mean()), 3),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'max_ms': round(float(latencies.max()), 3),
+        }
+
+    def reset_latency(self):
+        self.latencies = array('d')
+
+    # Reset latencies and cache counts (start of a run)
+    def reset_stats(self):
+        self.reset_latency()
+        if self.cache is not None:
+            self.cache.reset_stats()
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.session.close()
+
+
+# Shared clients by process and settings (connections are never shared across forks)
+_clients = {}
+
+
+# Routing client of a simulation ('osrm_url', 'osrm_timeout', 'osrm_pool_size', 'osrm_concurrency'
+# and the route cache settings 'route_cache_mb', 'route_cache', 'route_cache_precision')
+def routing_client(simul_configs=None):
+    simul_configs = simul_configs or {}
+    timeout = simul_configs.get('osrm_timeout')
+    key = (
+        os.getpid(),
+        simul_configs.get('osrm_url') or OSRM_BASE_URL,
+        tuple(timeout) if isinstance(timeout, (list, tuple)) else timeout,
+        simul_configs.get('osrm_pool_size', OSRM_POOL_SIZE),
+        simul_configs.get('osrm_concurrency', OSRM_CONCURRENCY),
+        simul_configs.get('route_cache_mb', ROUTE_CACHE_MB),
+        route_cache_path(simul_configs),
+        simul_configs.get('route_cache_precision'),
+    )
+    if key not in _clients:
+        cache = RouteCache(key[1], *key[5:]) if key[5] or key[6] else None
+        _clients[key] = OSRMClient(*key[1:5], cache=cache)
+    return _clients[key]
+
+
+# Route cache file (route_cache is relative to simul_result; None keeps the cache in memory)
+def route_cache_path(simul_configs):
+    if not simul_configs.get('route_cache'):
         return None
+    return os.path.join(os.getcwd(), 'simul_result', simul_configs['route_cache'])
+
+
+# Main OSRM routing function
+def osrm_routing_machine(OD_coords, client=None):
+    return (client or routing_client()).route(OD_coords)
+
 
-        
 # Get routing response from OSRM server
-def get_res(point):
+def get_res(point, client=None):
     status = 'defined'
+    client = client or routing_client()
 
-    # Setup session with retry strategy
-    session = requests.Session()
-    retry = Retry(connect=10, backoff_factor=1)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    # Build OSRM request URL
+    # Build OSRM request path
     overview = '?overview=full'
     loc = f"{point[1]},{point[0]};{point[3]},{point[2]}"  # lon,lat;lon,lat format
-    url = "http://127.0.0.1:8000/route/v1/driving/"
-    
-    r = session.get(url + loc + overview) 
-    
+
+    r = client.get('/route/v1/driving/' + loc + overview)
+
     # Handle failed requests with fallback calculation
     if r.status_code != 200:
         status = 'undefined'
@@ -73,6 +225,31 @@ def get_res(point):
     return res, status
 
 
+# Get a distance block from the OSRM table service
+# Unroutable pairs (and failed requests) fall back to the straight-line distance.
+def get_table(sources, destinations, client=None):
+    client = client or routing_client()
+    points = list(sources) + list(destinations)
+    loc = ';'.join(f"{point[1]},{point[0]}" for point in points)  # lon,lat format
+    query = (
+        '?sources=' + ';'.join(map(str, range(len(sources))))
+        + '&destinations=' + ';'.join(map(str, range(len(sources), len(points))))
+        + '&annotations=distance'
+    )
+
+    r = client.get('/table/v1/driving/' + loc + query)
+    distances = r.json().get('distances') if r.status_code == 200 else None
+    distances = np.array(distances if distances is not None else np.nan, dtype='float64')
+    distances = np.broadcast_to(distances, (len(sources), len(destinations))).copy()
+
+    missing = np.isnan(distances)
+    if missing.any():
+        src = np.array(sources, dtype='float64')[np.nonzero(missing)[0]]
+        dst = np.array(destinations, dtype='float64')[np.nonzero(missing)[1]]
+        distances[missing] = calculate_straight_distance(src[:, 0], src[:, 1], dst[:, 0], dst[:, 1]) * 1000
+    return distances
+
+
 # Extract duration and distance from OSRM response
 def extract_duration_distance(res):
     duration = res['routes'][0]['duration'] / 60  # Convert to minutes
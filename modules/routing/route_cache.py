@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+ROUTE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    server TEXT NOT NULL,
+    od TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (server, od)
+) WITHOUT ROWID;
+"""
+
+# Default memory bound of the cache in MB (shared with base_configs; 0 disables the cache)
+ROUTE_CACHE_MB = 0
+
+# Pending disk writes before they are flushed to the cache file
+ROUTE_CACHE_FLUSH_SIZE = 1000
+
+
+# Route results by origin and destination: an in-memory LRU bounded to max_mb in
+# front of an optional SQLite file shared by runs, replications and sweep workers
+# Results are kept as their JSON text (the disk format) and decoded on every hit, so
+# the memory bound covers the whole entry and callers get results of their own.
+# Keys are the OD coordinates, rounded to precision decimals when precision is set
+# (the client then routes the rounded coordinates, so results never depend on which
+# nearby request filled the cache). Entries are per OSRM server.
+class RouteCache:
+
+    def __init__(self, server, max_mb=ROUTE_CACHE_MB, path=None, precision=None):
+        self.server = server
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.path = path
+        self.precision = precision
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.pending = {}
+        self.connection = None
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    # OD coordinates ([lat, lon, lat, lon]) that are routed and cached
+    def snap(self, OD_coords):
+        if self.precision is None:
+            return [float(value) for value in OD_coords]
+        return [round(float(value), self.precision) for value in OD_coords]
+
+    def key(self, OD_coords):
+        return ','.join(map(repr, OD_coords))
+
+    # Cached route result of snapped OD coordinates (None on a miss)
+    def get(self, OD_coords):
+        key = self.key(OD_coords)
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(self.memory[key])
+
+            text = self.pending.get(key)
+            if text is None and self.path is not None:
+                row = self._connect().execute(
+                    'SELECT result FROM routes WHERE server = ? AND od = ?', (self.server, key)
+                ).fetchone()
+                text = row[0] if row is not None else None
+
+            if text is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, text)
+            return json.loads(text)
+
+    def put(self, OD_coords, result):
+        key = self.key(OD_coords)
+        text = json.dumps(result)
+        with self.lock:
+            self._remember(key, text)
+            if self.path is not None:
+                self.pending[key] = text
+                if len(self.pending) >= ROUTE_CACHE_FLUSH_SIZE:
+                    self._flush()
+
+    # Write pending results to the cache file
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    # Hit and miss counts since the last reset
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.disk_hits) / lookups * 100, 2) if lookups else 0.0,
+            'entries': len(self.memory),
+            'memory_mb': round(self.memory_bytes / 1024 / 1024, 2),
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def _remember(self, key, text):
+        if key in self.memory:
+            self.memory_bytes -= _entry_bytes(key, self.memory.pop(key))
+        self.memory[key] = text
+        self.memory_bytes += _entry_bytes(key, text)
+        while self.memory_bytes > self.max_bytes and self.memory:
+            old_key, old_text = self.memory.popitem(last=False)
+            self.memory_bytes -= _entry_bytes(old_key, old_text)
+
+    def _connect(self):
+        if self.connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(ROUTE_CACHE_SCHEMA)
+        return self.connection
+
+    def _flush(self):
+        if not self.pending:
+            return
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO routes (server, od, result) VALUES (?, ?, ?)',
+                ((self.server, key, text) for key, text in self.pending.items())
+            )
+        self.pending = {}
+
+
+# Memory held by one cache entry (key and JSON text)
+def _entry_bytes(key, text):
+    return sys.getsizeof(key) + sys.getsizeof(text)
@@ -0,0 +1,71 @@
+import numpy as np
+import polyline
+
+from modules.utils.distance_utils import METERS_PER_DEGREE
+
+
+# Route geometry of trip output: 'full' ([lon, lat] list), 'simplified' (line
+# simplification within route_tolerance meters) or 'polyline' (encoded string)
+ROUTE_GEOMETRIES = ['full', 'simplified', 'polyline']
+
+# Precision of encoded routes (6 decimals keeps OSRM's 5-decimal geometry exact)
+ROUTE_POLYLINE_PRECISION = 6
+
+
+# Trip route and timestamps in the configured geometry
+def route_output(route, timestamp, simul_configs):
+    geometry = simul_configs.get('route_geometry', 'full')
+    if geometry == 'simplified':
+        return simplify_route(route, timestamp, simul_configs['route_tolerance'])
+    if geometry == 'polyline':
+        return encode_route(route), timestamp
+    if geometry != 'full':
+        raise ValueError(f"Unknown route_geometry '{geometry}', expected one of {ROUTE_GEOMETRIES}")
+    return route, timestamp
+
+
+def encode_route(route):
+    return polyline.encode(route, ROUTE_POLYLINE_PRECISION, geojson=True)
+
+
+# [lon, lat] points of a trip route (decodes encoded routes)
+def decode_route(route):
+    if isinstance(route, str):
+        return [list(point) for point in polyline.decode(route, ROUTE_POLYLINE_PRECISION, geojson=True)]
+    return route
+
+
+# Douglas-Peucker simplification of a [lon, lat] route within tolerance meters
+# Kept vertices carry their original timestamps (endpoints are always kept).
+def simplify_route(route, timestamp, tolerance):
+    if len(route) <= 2 or tolerance <= 0:
+        return route, timestamp
+
+    # Local equirectangular projection in meters
+    points = np.asarray(route, dtype=float)
+    lat_scale = np.cos(np.radians(points[:, 1].mean()))
+    xy = np.column_stack([points[:, 0] * lat_scale, points[:, 1]]) * METERS_PER_DEGREE
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        # Distance of the inner points to the segment first-last
+        inner = xy[first + 1:last] - xy[first]
+        segment = xy[last] - xy[first]
+        length = segment @ segment
+        t = np.clip(inner @ segment / length, 0, 1) if length > 0 else np.zeros(len(inner))
+        distance = np.hypot(*(inner - t[:, None] * segment).T)
+
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack.extend([(first, middle), (middle, last)])
+
+    kept = np.flatnonzero(keep).tolist()
+    return [route[i] for i in kept], [timestamp[i] for i in kept]
@@ -0,0 +1,116 @@
+import threading
+import numpy as np
+
+
+# Running prefetches by result folder
+_route_prefetches = {}
+
+
+# Background routing of the passengers' ride-to-alight legs (the D leg of a dispatch)
+# The legs only depend on passenger data, so a worker thread routes them in request
+# order in batches through the routing client, at most window minutes ahead of the
+# simulation clock (advance). Legs of passengers that can no longer be dispatched
+# (fail_time after their request) are dropped.
+class RoutePrefetch:
+
+    def __init__(self, client, passengers, window=30, fail_time=10, batch_size=256):
+        order = np.argsort(passengers['ride_time'].values, kind='stable')
+        self.client = client
+        self.ids = passengers['ID'].values[order].tolist()
+        self.ride_time = passengers['ride_time'].values[order].astype('float64')
+        self.legs = np.column_stack([
+            passengers[col].values[order] for col in ['ride_lat', 'ride_lon', 'alight_lat', 'alight_lon']
+        ]).tolist()
+        self.positions = {passenger_id: position for position, passenger_id in enumerate(self.ids)}
+        self.window = window
+        self.fail_time = fail_time
+        self.batch_size = batch_size
+
+        self.results = {}
+        self.horizon = -np.inf
+        self.done = 0           # Legs routed (in request order)
+        self.requested = 0      # Legs routed or in flight
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._work, name='route-prefetch', daemon=True)
+        self.thread.start()
+
+    # Let the worker route legs requested up to time + window and drop stale legs
+    def advance(self, time):
+        with self.condition:
+            self.horizon = time + self.window
+            stale = [passenger_id for passenger_id in self.results
+                     if self.ride_time[self.positions[passenger_id]] + self.fail_time < time]
+            for passenger_id in stale:
+                del self.results[passenger_id]
+            self.condition.notify_all()
+
+    # Prefetched routes of the given passengers' legs ([lat, lon, lat, lon]; None where
+    # a leg was not prefetched). Legs that are being routed right now are waited for.
+    def take(self, passenger_ids, legs):
+        with self.condition:
+            wanted = [self.positions.get(passenger_id, -1) for passenger_id in passenger_ids]
+            in_flight = max(wanted, default=-1)
+            while not self.stopped and self.done <= in_flight < self.requested:
+                self.condition.wait()
+
+            results = []
+            for passenger_id, leg in zip(passenger_ids, legs):
+                prefetched_leg, result = self.results.pop(passenger_id, (None, None))
+                results.append(result if prefetched_leg == list(leg) else None)
+            return results
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.stopped and (self.requested >= len(self.ids)
+                                            or self.ride_time[self.requested] > self.horizon):
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                start = self.requested
+                end = min(int(np.searchsorted(self.ride_time, self.horizon, side='right')),
+                          start + self.batch_size)
+                self.requested = end
+
+            # Failed batches are left to the dispatch, which routes (and reports) them itself
+            try:
+                results = self.client.route_many(self.legs[start:end])
+            except Exception:
+                results = [None] * (end - start)
+
+            with self.condition:
+                for passenger_id, leg, result in zip(self.ids[start:end], self.legs[start:end], results):
+                    if result is not None:
+                        self.results[passenger_id] = (leg, result)
+                self.done = end
+                self.condition.notify_all()
+
+
+# Start prefetching the D legs of a run (only when 'route_prefetch' is enabled)
+# Passengers that can still be dispatched at start_time are prefetched.
+def start_route_prefetch(client, passengers, simul_configs, start_time):
+    stop_route_prefetch(simul_configs['save_path'])
+    if not simul_configs.get('route_prefetch'):
+        return None
+    fail_time = simul_configs['fail_time']
+    passengers = passengers[passengers['ride_time'] + fail_time >= start_time]
+    prefetch = RoutePrefetch(client, passengers, simul_configs.get('route_prefetch_window', 30), fail_time)
+    _route_prefetches[simul_configs['save_path']] = prefetch
+    return prefetch
+
+
+def route_prefetch(save_path):
+    return _route_prefetches.get(save_path)
+
+
+def stop_route_prefetch(save_path):
+    prefetch = _route_prefetches.pop(save_path, None)
+    if prefetch is not None:
+        prefetch.stop()
@@ -1,8 +1,5 @@
 import numpy as np
-import geopandas as gpd
-import osmnx as ox
 from difflib import get_close_matches
-from shapely.ops import unary_union
 
 
 # Find similar words from candidate list
@@ -14,6 +11,10 @@ def select_similar_word(word_to_compare, candidates):
     return close_matches
 
 
+# Meters per degree of latitude
+METERS_PER_DEGREE = 111320
+
+
 # Calculate haversine distance between coordinates (returns km)
 def calculate_straight_distance(lat1, lon1, lat2, lon2):
     km_constant = 3959 * 1.609344
@@ -40,6 +41,8 @@ def calculate_route_distance(data):
 
 # Convert meters to euclidean distance in lat/lon coordinates
 def calculate_euclidean_distance(meter):
+    import osmnx as ox  # heavy, imported on use
+
     # Calculate euclidean distance between point pairs
     dis_1 = ox.distance.euclidean_dist_vec(36.367658, 127.447499, 36.443928, 127.419678)
     # Calculate great circle distance
@@ -50,6 +53,9 @@ def calculate_euclidean_distance(meter):
 
 # Filter vehicles outside region boundary
 def filter_outside_region(vehicles, region_key):
+    import geopandas as gpd  # heavy, imported on use
+    from shapely.ops import unary_union
+
     boundary_path = f"data/etc/{region_key}_boundary.geojson"
     region = gpd.read_file(boundary_path)
     union_poly = unary_union(region.geometry.values)
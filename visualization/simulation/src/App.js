@@ -38,6 +38,83 @@ const getRestData = async (dataName) => {
   }
 };
 
+const TYPED_ARRAYS = { Float32Array, Int32Array, Uint32Array, Uint8Array };
+
+// 바이너리 청크: manifest의 layout대로 typed array 뷰 생성 (복사 없음)
+const getBinaryData = async (dataName, layout) => {
+  try {
+    const res = await axios.get(`${process.env.PUBLIC_URL}/data/${dataName}.bin`, {
+      responseType: 'arraybuffer'
+    });
+    const arrays = {};
+    Object.entries(layout).forEach(([name, { type, offset, length }]) => {
+      arrays[name] = new TYPED_ARRAYS[type](res.data, offset, length);
+    });
+    return arrays;
+  } catch (error) {
+    console.error(`${dataName} 데이터 로드 실패:`, error);
+    return null;
+  }
+};
+
+// 바이너리 경로 → deck.gl TripsLayer binary data
+const binaryTrips = (arrays) => {
+  const length = arrays.board.length;
+  return {
+    length,
+    startIndices: arrays.start_indices.subarray(0, length),
+    attributes: {
+      getPath: { value: arrays.positions, size: 2 },
+      getTimestamps: { value: arrays.timestamps, size: 1 }
+    },
+    board: arrays.board
+  };
+};
+
+// 바이너리 마커 → { length, positions, start_time, end_time }
+const binaryMarkers = (arrays) => ({ length: arrays.start_time.length, ...arrays });
+
+// 시간 구간 청크 캐시 (manifest.json이 있으면 재생 중인 구간만 불러옴)
+const chunkCache = new Map();
+
+const getChunk = (manifest, index) => {
+  if (!chunkCache.has(index) && manifest.format === 'binary') {
+    const buffers = manifest.chunks[index].buffers;
+    chunkCache.set(index, Promise.all([
+      getBinaryData(`chunks/trip_${index}`, buffers.trip),
+      getBinaryData(`chunks/vehicle_marker_${index}`, buffers.vehicle_marker),
+      getBinaryData(`chunks/passenger_marker_${index}`, buffers.passenger_marker)
+    ]).then(([DRIVER_TRIP, DRIVER_MARKER, PASSENGER_MARKER]) => ({
+      DRIVER_TRIP: DRIVER_TRIP ? binaryTrips(DRIVER_TRIP) : [],
+      DRIVER_MARKER: DRIVER_MARKER ? binaryMarkers(DRIVER_MARKER) : [],
+      PASSENGER_MARKER: PASSENGER_MARKER ? binaryMarkers(PASSENGER_MARKER) : [],
+    })));
+  } else if (!chunkCache.has(index)) {
+    chunkCache.set(index, Promise.all([
+      getRestData(`chunks/trip_${index}`),
+      getRestData(`chunks/vehicle_marker_${index}`),
+      getRestData(`chunks/passenger_marker_${index}`)
+    ]).then(([DRIVER_TRIP, DRIVER_MARKER, PASSENGER_MARKER]) => ({
+      DRIVER_TRIP: Array.isArray(DRIVER_TRIP) ? DRIVER_TRIP : [],
+      DRIVER_MARKER: Array.isArray(DRIVER_MARKER) ? DRIVER_MARKER : [],
+      PASSENGER_MARKER: Array.isArray(PASSENGER_MARKER) ? PASSENGER_MARKER : [],
+    })));
+  }
+
+  // 이전·현재·다음 구간만 메모리에 유지
+  for (const key of Array.from(chunkCache.keys())) {
+    if (key < index - 1 || key > index + 1) {
+      chunkCache.delete(key);
+    }
+  }
+  return chunkCache.get(index);
+};
+
+const chunkIndexOf = (manifest, time) => {
+  const index = Math.floor((time - manifest.start) / manifest.window);
+  return Math.min(Math.max(index, 0), manifest.chunks.length - 1);
+};
+
 const App = () => {
   const minTime = 1380;
   const maxTime = 1560;
@@ -52,6 +129,8 @@ const App = () => {
     check: [],
   });
   const [loaded, setLoaded] = useState(false);
+  const [manifest, setManifest] = useState(null);
+  const [chunkIndex, setChunkIndex] = useState(-1);
   
   // init
   useEffect(() => {
@@ -66,6 +145,20 @@ const App = () => {
           startTimeArray = Array.from({ length: arrayLength }, (_, i) => i + minTime);
         }
         
+        // 청크 export가 있으면 결과만 먼저 받고 구간 데이터는 재생 위치에 따라 로드
+        const MANIFEST = await getRestData('manifest');
+        if (MANIFEST && Array.isArray(MANIFEST.chunks) && MANIFEST.chunks.length > 0) {
+          console.log(`청크 모드: ${MANIFEST.chunks.length}개 구간 (${MANIFEST.window}분 단위)`);
+          const RESULT = await getRestData('result');
+          setData(data => ({
+            ...data,
+            RESULT: Array.isArray(RESULT) ? RESULT : [],
+            check: startTimeArray || []
+          }));
+          setManifest(MANIFEST);
+          return;
+        }
+
         // 데이터 로드
         console.log('데이터 로딩 시작...');
         const DRIVER_TRIP = await getRestData('trip');
@@ -134,6 +227,30 @@ const App = () => {
   useEffect(() => {
     const requestTime = Math.floor(time) + initTripData;
   }, [time]);
+
+  // 재생 시간이 다른 구간으로 넘어가면 청크 교체
+  useEffect(() => {
+    if (manifest) {
+      setChunkIndex(chunkIndexOf(manifest, time));
+    }
+  }, [time, manifest]);
+
+  useEffect(() => {
+    if (!manifest || chunkIndex < 0) return;
+    let active = true;
+
+    getChunk(manifest, chunkIndex).then(chunk => {
+      if (active) {
+        setData(data => ({ ...data, ...chunk }));
+        setLoaded(true);
+      }
+    });
+    // 다음 구간 미리 받기
+    if (chunkIndex + 1 < manifest.chunks.length) {
+      getChunk(manifest, chunkIndex + 1);
+    }
+    return () => { active = false; };
+  }, [manifest, chunkIndex]);
   
   const SliderChange = value => {
     const time = value.target.value;
@@ -151,6 +268,7 @@ const App = () => {
             maxTime={maxTime}
             time={time}
             setTime={setTime}
+            trailLength={manifest ? manifest.trail : undefined}
           >
           </Trip>
           <Slider id="slider" value={time} min={minTime} max={maxTime} onChange={SliderChange} track="inverted"/>
@@ -49,6 +49,15 @@ const MAPBOX_TOKEN = `pk.eyJ1Ijoic3BlYXI1MzA2IiwiYSI6ImNremN5Z2FrOTI0ZGgycm45Mzh
 
 const currData = (data, time) => {
   const arr = [];
+  // 바이너리 청크 마커
+  if (data.positions) {
+    for (let i = 0; i < data.length; i++) {
+      if ((data.start_time[i] <= time) & (time <= data.end_time[i])) {
+        arr.push([data.positions[2 * i], data.positions[2 * i + 1]]);
+      }
+    }
+    return arr;
+  }
   data.forEach(v => {
     const [start, end] = v.timestamp;
     if ((start <= time) & (time <= end)) {
@@ -70,11 +79,13 @@ const ICON_MAPPING = {
 
 const Trip = (props) => {
   const animationSpeed = 5;
+  const trailLength = props.trailLength || 12;
   const time = props.time;
   const minTime = props.minTime;
   const maxTime = props.maxTime;
 
   const DRIVER = props.data.DRIVER_TRIP || [];
+  const BINARY_TRIP = DRIVER.attributes !== undefined;
   const D_MARKER = currData(props.data.DRIVER_MARKER, time) || [];
   const P_MARKER = currData(props.data.PASSENGER_MARKER, time) || [];
 
@@ -118,12 +129,18 @@ const Trip = (props) => {
     new TripsLayer({
       id: 'DRIVER', // 레이어의 고유 식별자
       data: DRIVER, // 경로 데이터 소스
-      getPath: d => d.trip, // 각 경로의 경로를 가져오는 함수
-      getTimestamps: d => d.timestamp, // 각 경로의 타임스탬프를 가져오는 함수
-      getColor: d => d.board === 1 ? [255, 255, 255] : [255, 20, 147], // 탑승 상태에 따른 색상// 'board' 값이 1이면 탑승차 경로, 그렇지 않으면 빈차 경로
+      ...(BINARY_TRIP
+        ? { _pathType: 'open' } // 바이너리 청크: 경로·타임스탬프는 attributes로 전달
+        : {
+          getPath: d => d.trip, // 각 경로의 경로를 가져오는 함수
+          getTimestamps: d => d.timestamp, // 각 경로의 타임스탬프를 가져오는 함수
+        }),
+      getColor: BINARY_TRIP
+        ? (_, { index }) => DRIVER.board[index] === 1 ? [255, 255, 255] : [255, 20, 147]
+        : d => d.board === 1 ? [255, 255, 255] : [255, 20, 147], // 탑승 상태에 따른 색상// 'board' 값이 1이면 탑승차 경로, 그렇지 않으면 빈차 경로
       opacity: 0.7, // 레이어의 불투명도
       widthMinPixels: 5, // 경로 선의 최소 너비
-      trailLength: 12, // 이동 객체 뒤의 경로 길이
+      trailLength: trailLength, // 이동 객체 뒤의 경로 길이 (청크 export의 trail과 같아야 함)
       currentTime: time, // 애니메이션을 위한 현재 시간
       shadowEnabled: false, // 그림자 비활성화
     }),